@@ -0,0 +1,72 @@
+"""Esquema inicial (el que creaba create_all al arrancar)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("password", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=False),
+        sa.Column("has_station", sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_index("ix_users_user_id", "users", ["user_id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "user_stations",
+        sa.Column("station_id", sa.String(), nullable=False),
+        sa.Column("location", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.user_id"]),
+        sa.PrimaryKeyConstraint("station_id"),
+    )
+    op.create_index("ix_user_stations_station_id", "user_stations", ["station_id"])
+
+    op.create_table(
+        "station_data",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("temperatura", sa.Float(), nullable=True),
+        sa.Column("humedad", sa.Float(), nullable=True),
+        sa.Column("presion", sa.Float(), nullable=True),
+        sa.Column("gas_detectado", sa.Boolean(), nullable=True),
+        sa.Column("voltaje_mq135", sa.Float(), nullable=True),
+        sa.Column("indice_uv", sa.Float(), nullable=True),
+        sa.Column("nivel_uv", sa.String(), nullable=True),
+        sa.Column("station_id", sa.String(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["station_id"], ["user_stations.station_id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_station_data_id", "station_data", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_station_data_id", table_name="station_data")
+    op.drop_table("station_data")
+    op.drop_index("ix_user_stations_station_id", table_name="user_stations")
+    op.drop_table("user_stations")
+    op.drop_index("ix_users_username", table_name="users")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_index("ix_users_user_id", table_name="users")
+    op.drop_table("users")
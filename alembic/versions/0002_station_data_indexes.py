@@ -0,0 +1,45 @@
+"""Índices para las consultas de station_data por estación y por tiempo
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # En PostgreSQL se crean con CONCURRENTLY para no bloquear las escrituras
+    # del ESP32 mientras se construyen sobre una tabla grande.
+    with op.get_context().autocommit_block():
+        # Lecturas por estación ordenadas por (timestamp, id) DESC (listados,
+        # /latest y paginación por cursor)
+        op.create_index(
+            "ix_station_data_station_id_timestamp",
+            "station_data",
+            ["station_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+            postgresql_concurrently=True,
+        )
+        # Limpieza por antigüedad y filtros por rango sin estación
+        op.create_index(
+            "ix_station_data_timestamp",
+            "station_data",
+            ["timestamp"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_station_data_timestamp", table_name="station_data", postgresql_concurrently=True)
+        op.drop_index("ix_station_data_station_id_timestamp", table_name="station_data", postgresql_concurrently=True)
@@ -0,0 +1,66 @@
+"""Trabajos de retención y resumen horario de station_data
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLLUP_METRICS = ("temperatura", "humedad", "presion", "indice_uv", "voltaje_mq135")
+
+
+def upgrade() -> None:
+    metric_columns = []
+    for metric in ROLLUP_METRICS:
+        metric_columns += [
+            sa.Column(f"{metric}_min", sa.Float(), nullable=True),
+            sa.Column(f"{metric}_max", sa.Float(), nullable=True),
+            sa.Column(f"{metric}_avg", sa.Float(), nullable=True),
+            sa.Column(f"{metric}_count", sa.Integer(), nullable=False),
+        ]
+    op.create_table(
+        "station_data_hourly",
+        sa.Column("station_id", sa.String(), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("readings", sa.Integer(), nullable=False),
+        *metric_columns,
+        sa.ForeignKeyConstraint(["station_id"], ["user_stations.station_id"]),
+        sa.PrimaryKeyConstraint("station_id", "bucket_start"),
+    )
+
+    op.create_table(
+        "retention_jobs",
+        sa.Column("job_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("cutoff", sa.DateTime(), nullable=False),
+        sa.Column("rollup", sa.Boolean(), nullable=False),
+        sa.Column("batch_size", sa.Integer(), nullable=False),
+        sa.Column("start_id", sa.Integer(), nullable=True),
+        sa.Column("next_id", sa.Integer(), nullable=True),
+        sa.Column("max_id", sa.Integer(), nullable=True),
+        sa.Column("deleted", sa.Integer(), nullable=False),
+        sa.Column("rolled_up", sa.Integer(), nullable=False),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("job_id"),
+    )
+    op.create_index("ix_retention_jobs_job_id", "retention_jobs", ["job_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_retention_jobs_job_id", table_name="retention_jobs")
+    op.drop_table("retention_jobs")
+    op.drop_table("station_data_hourly")
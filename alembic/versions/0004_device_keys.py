@@ -0,0 +1,44 @@
+"""Claves de API por dispositivo
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "device_keys",
+        sa.Column("key_id", sa.Integer(), nullable=False),
+        sa.Column("key_hash", sa.String(length=64), nullable=False),
+        sa.Column("label", sa.String(), nullable=True),
+        sa.Column("station_id", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("revoked_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["station_id"], ["user_stations.station_id"]),
+        sa.PrimaryKeyConstraint("key_id"),
+        sa.UniqueConstraint("key_hash"),
+    )
+    op.create_index("ix_device_keys_key_id", "device_keys", ["key_id"])
+    op.create_index("ix_device_keys_station_id", "device_keys", ["station_id"])
+    op.create_index("ix_device_keys_updated_at", "device_keys", ["updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_device_keys_updated_at", table_name="device_keys")
+    op.drop_index("ix_device_keys_station_id", table_name="device_keys")
+    op.drop_index("ix_device_keys_key_id", table_name="device_keys")
+    op.drop_table("device_keys")
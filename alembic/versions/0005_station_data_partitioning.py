@@ -0,0 +1,45 @@
+"""Particionado opcional de station_data por rango de timestamp
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app import partitions
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "retention_jobs",
+        sa.Column("dropped_partitions", sa.Integer(), nullable=False, server_default="0"),
+    )
+    # Solo PostgreSQL y con STATION_DATA_PARTITIONING activado; si no, la
+    # conversión puede hacerse más tarde con `python -m app.partitions convert`.
+    # Crea también la partición DEFAULT (station_data_default): sin ella, si el
+    # mantenimiento deja de crear particiones, toda inserción fallaría
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql" and settings.STATION_DATA_PARTITIONING != "none":
+        partitions.convert_to_partitioned(
+            bind, settings.STATION_DATA_PARTITIONING, settings.STATION_DATA_PARTITIONS_AHEAD
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if partitions.is_partitioned(bind):
+        partitions.convert_to_plain(bind)
+    with op.batch_alter_table("retention_jobs") as batch_op:
+        batch_op.drop_column("dropped_partitions")
@@ -0,0 +1,77 @@
+"""Reglas de alerta por estación y alertas disparadas
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "alert_rules",
+        sa.Column("rule_id", sa.Integer(), nullable=False),
+        sa.Column("station_id", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("metric", sa.String(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("operator", sa.String(), nullable=False),
+        sa.Column("value", sa.Float(), nullable=False),
+        sa.Column("window", sa.Integer(), nullable=True),
+        sa.Column("min_count", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["station_id"], ["user_stations.station_id"]),
+        sa.PrimaryKeyConstraint("rule_id"),
+    )
+    op.create_index("ix_alert_rules_rule_id", "alert_rules", ["rule_id"])
+    op.create_index("ix_alert_rules_station_id", "alert_rules", ["station_id"])
+    op.create_index("ix_alert_rules_updated_at", "alert_rules", ["updated_at"])
+
+    op.create_table(
+        "alerts",
+        sa.Column("alert_id", sa.Integer(), nullable=False),
+        sa.Column("rule_id", sa.Integer(), nullable=False),
+        sa.Column("station_id", sa.String(), nullable=False),
+        sa.Column("metric", sa.String(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("observed", sa.Float(), nullable=True),
+        sa.Column("threshold", sa.Float(), nullable=False),
+        sa.Column("detail", sa.String(), nullable=True),
+        sa.Column("reading_id", sa.Integer(), nullable=True),
+        sa.Column("triggered_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["rule_id"], ["alert_rules.rule_id"]),
+        sa.PrimaryKeyConstraint("alert_id"),
+    )
+    op.create_index("ix_alerts_alert_id", "alerts", ["alert_id"])
+    op.create_index("ix_alerts_rule_id", "alerts", ["rule_id"])
+    # Alertas por estación, las más recientes primero (GET /alerts)
+    op.create_index(
+        "ix_alerts_station_id_triggered_at",
+        "alerts",
+        ["station_id", sa.text("triggered_at DESC"), sa.text("alert_id DESC")],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_alerts_station_id_triggered_at", table_name="alerts")
+    op.drop_index("ix_alerts_rule_id", table_name="alerts")
+    op.drop_index("ix_alerts_alert_id", table_name="alerts")
+    op.drop_table("alerts")
+    op.drop_index("ix_alert_rules_updated_at", table_name="alert_rules")
+    op.drop_index("ix_alert_rules_station_id", table_name="alert_rules")
+    op.drop_index("ix_alert_rules_rule_id", table_name="alert_rules")
+    op.drop_table("alert_rules")
@@ -0,0 +1,31 @@
+"""Índice único de alertas por (regla, lectura)
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Quitar los duplicados que dejaron varios workers evaluando a la vez
+    op.execute(sa.text(
+        "DELETE FROM alerts WHERE reading_id IS NOT NULL AND alert_id NOT IN ("
+        "SELECT MIN(alert_id) FROM alerts WHERE reading_id IS NOT NULL GROUP BY rule_id, reading_id)"
+    ))
+    op.create_index("ux_alerts_rule_id_reading_id", "alerts", ["rule_id", "reading_id"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ux_alerts_rule_id_reading_id", table_name="alerts")
@@ -0,0 +1,469 @@
+"""
+Reglas de alerta evaluadas sobre cada lectura en la ingesta
+(crud.notify_station_data_inserted), sin volver a consultar station_data.
+
+Tipos de regla, por estación y métrica:
+
+- threshold: la lectura cumple `valor <operador> umbral`;
+- rate: el cambio por minuto desde la lectura anterior de la estación cumple
+  la condición (p. ej. temperatura sube más de 2 °C/min: rate > 2);
+- count: al menos N de las últimas M lecturas cumplen la condición.
+
+Cada regla guarda su estado en memoria: un anillo de M bytes con el número
+de aciertos (count) o el último valor y su hora (rate), así que evaluar una
+lectura cuesta O(1) por regla de su estación. La alerta salta cuando la
+condición pasa de falsa a verdadera y no se repite hasta que deja de cumplirse.
+
+Las alertas se encolan y un hilo de fondo las guarda por lotes en la tabla
+alerts, sin añadir escrituras a la transacción de la ingesta; el mismo hilo
+recarga las reglas creadas o borradas desde otros workers.
+
+El estado solo es correcto si un único proceso ve todas las lecturas:
+
+- Con LIVE_BROKER=memory (un worker) se evalúa en la ingesta de ese worker.
+- Con LIVE_BROKER=postgres evalúa un solo worker, el que tiene el advisory
+  lock ALERT_LEADER_LOCK_KEY, con las lecturas de todos que llegan por el
+  canal LISTEN/NOTIFY. Si cae, otro worker toma el lock y sigue.
+- Al arrancar o tomar el relevo, el estado (anillos, último valor, 'active')
+  se reconstruye con las últimas lecturas de cada estación, sin disparar
+  alertas, para no repetir las ya guardadas.
+- El índice único (rule_id, reading_id) de alerts descarta los duplicados que
+  aún pudieran llegar durante un relevo.
+"""
+import asyncio
+import logging
+import operator
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, insert, select
+
+from . import models
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+RULE_REFRESH_OVERLAP = timedelta(seconds=5)
+
+# Clave del pg_advisory_lock del worker que evalúa las reglas (LIVE_BROKER=postgres)
+ALERT_LEADER_LOCK_KEY = 7_206_002
+# Estaciones por consulta al reconstruir el estado
+PRIME_CHUNK_SIZE = 500
+
+
+class RuleState:
+    """Una regla compilada y su estado incremental."""
+
+    __slots__ = (
+        "rule_id", "station_id", "metric", "kind", "operator", "compare", "value", "window", "min_count",
+        "ring", "position", "hits", "active", "last_value", "last_time",
+    )
+
+    def __init__(self, rule):
+        self.rule_id = rule.rule_id
+        self.station_id = rule.station_id
+        self.metric = rule.metric
+        self.kind = rule.kind
+        self.operator = rule.operator
+        self.compare = OPERATORS[rule.operator]
+        self.value = rule.value
+        self.window = rule.window
+        self.min_count = rule.min_count
+        # count: 1 si la lectura cumplió la condición; hits = suma del anillo
+        self.ring = bytearray(rule.window) if rule.kind == "count" else None
+        self.position = 0
+        self.hits = 0
+        self.active = False
+        self.last_value: Optional[float] = None
+        self.last_time: Optional[datetime] = None
+
+    def definition(self) -> tuple:
+        return self.metric, self.kind, self.operator, self.value, self.window, self.min_count
+
+    def history(self) -> int:
+        """Lecturas anteriores que determinan el estado de la regla."""
+        if self.kind == "count":
+            return self.window
+        return 2 if self.kind == "rate" else 1
+
+    def evaluate(self, value: float, timestamp: datetime, reading_id: Optional[int]) -> Optional[dict]:
+        """Actualiza el estado con una lectura; devuelve la alerta si la condición acaba de cumplirse."""
+        if self.kind == "threshold":
+            observed = value
+            matched = self.compare(value, self.value)
+        elif self.kind == "rate":
+            previous, previous_time = self.last_value, self.last_time
+            self.last_value, self.last_time = value, timestamp
+            if previous is None or timestamp <= previous_time:
+                return None
+            observed = (value - previous) * 60 / (timestamp - previous_time).total_seconds()
+            matched = self.compare(observed, self.value)
+        else:
+            observed = value
+            hit = 1 if self.compare(value, self.value) else 0
+            self.hits += hit - self.ring[self.position]
+            self.ring[self.position] = hit
+            self.position = (self.position + 1) % self.window
+            matched = self.hits >= self.min_count
+
+        fired = matched and not self.active
+        self.active = matched
+        if not fired:
+            return None
+        return {
+            "rule_id": self.rule_id,
+            "station_id": self.station_id,
+            "metric": self.metric,
+            "kind": self.kind,
+            "observed": observed,
+            "threshold": self.value,
+            "detail": self.describe(observed),
+            "reading_id": reading_id,
+            "triggered_at": timestamp,
+        }
+
+    def describe(self, observed: float) -> str:
+        if self.kind == "rate":
+            return f"{self.metric} changed {observed:+.4g}/min ({self.operator} {self.value:g})"
+        if self.kind == "count":
+            return f"{self.hits} of the last {self.window} readings with {self.metric} {self.operator} {self.value:g}"
+        return f"{self.metric} = {observed:g} ({self.operator} {self.value:g})"
+
+
+class AlertEngine:
+    """
+    Reglas activas indexadas por estación. Se cargan enteras al arrancar y
+    luego solo se aplican las filas creadas o borradas desde la última carga
+    (updated_at), como el índice de claves de dispositivo.
+    """
+
+    def __init__(self, refresh_seconds: float = 30.0):
+        self.refresh_seconds = refresh_seconds
+        self._rules: Dict[str, Dict[int, RuleState]] = {}
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self.watermark: Optional[datetime] = None  # updated_at más reciente aplicado
+        self.evaluated = 0
+        self.fired = 0
+
+    def is_stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        return self.refresh_seconds > 0 and time.monotonic() - self._loaded_at > self.refresh_seconds
+
+    def apply(self, rows: Iterable) -> None:
+        """Aplica filas de alert_rules nuevas, modificadas o borradas; una regla que no cambia conserva su estado."""
+        with self._lock:
+            for row in rows:
+                station_rules = self._rules.setdefault(row.station_id, {})
+                if row.deleted_at is not None:
+                    station_rules.pop(row.rule_id, None)
+                else:
+                    current = station_rules.get(row.rule_id)
+                    compiled = RuleState(row)
+                    if current is None or current.definition() != compiled.definition():
+                        station_rules[row.rule_id] = compiled
+                if not station_rules:
+                    del self._rules[row.station_id]
+                if self.watermark is None or row.updated_at > self.watermark:
+                    self.watermark = row.updated_at
+            self._loaded_at = time.monotonic()
+
+    def evaluate(self, readings: Iterable[dict]) -> List[dict]:
+        """Evalúa lecturas ya guardadas (con id y timestamp) y devuelve las alertas disparadas."""
+        fired = []
+        with self._lock:
+            for reading in readings:
+                self._evaluate_reading(reading, fired)
+            self.fired += len(fired)
+        return fired
+
+    def replay(self, readings: Iterable[dict]) -> None:
+        """Aplica lecturas ya evaluadas antes (en orden) solo para reconstruir el estado."""
+        with self._lock:
+            for reading in readings:
+                self._evaluate_reading(reading, None)
+
+    def _evaluate_reading(self, reading, fired: Optional[List[dict]]) -> None:
+        rules = self._rules.get(reading["station_id"])
+        if not rules:
+            return
+        for rule in rules.values():
+            value = reading.get(rule.metric)
+            if value is None:
+                continue
+            alert = rule.evaluate(float(value), reading["timestamp"], reading.get("id"))
+            if fired is not None:
+                self.evaluated += 1
+                if alert is not None:
+                    fired.append(alert)
+
+    def history(self) -> Dict[str, int]:
+        """Lecturas recientes necesarias por estación para reconstruir el estado de sus reglas."""
+        with self._lock:
+            return {
+                station_id: max(rule.history() for rule in rules.values())
+                for station_id, rules in self._rules.items()
+            }
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._rules = {}
+            self._loaded_at = None
+            self.watermark = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "stations": len(self._rules),
+                "rules": sum(len(rules) for rules in self._rules.values()),
+                "evaluated": self.evaluated,
+                "fired": self.fired,
+                "watermark": self.watermark,
+            }
+
+
+def refresh_rules(db, engine: AlertEngine) -> None:
+    """Aplica al motor las reglas creadas o borradas desde la última carga (todas en frío)."""
+    rules = models.AlertRule
+    query = select(rules)
+    if engine.watermark is not None:
+        # Solape para no perder filas confirmadas tarde con un updated_at anterior
+        query = query.where(rules.updated_at >= engine.watermark - RULE_REFRESH_OVERLAP)
+    engine.apply(db.scalars(query).all())
+
+
+def prime_rules(db, engine: AlertEngine) -> Dict[str, int]:
+    """
+    Reconstruye el estado de las reglas cargadas con las últimas lecturas de
+    cada estación, sin disparar alertas. Devuelve el id de la última lectura
+    aplicada por estación.
+    """
+    history = engine.history()
+    if not history:
+        return {}
+    data = models.StationData
+    depth = max(history.values())
+    stations = list(history)
+    primed: Dict[str, int] = {}
+    for start in range(0, len(stations), PRIME_CHUNK_SIZE):
+        row_number = func.row_number().over(
+            partition_by=data.station_id, order_by=(data.timestamp.desc(), data.id.desc())
+        ).label("row_number")
+        ranked = select(data.__table__, row_number).where(
+            data.station_id.in_(stations[start:start + PRIME_CHUNK_SIZE])
+        ).subquery()
+        rows = db.execute(
+            select(ranked).where(ranked.c.row_number <= depth).order_by(ranked.c.timestamp, ranked.c.id)
+        ).mappings().all()
+        engine.replay(rows)
+        for row in rows:
+            primed[row["station_id"]] = max(primed.get(row["station_id"], 0), row["id"])
+    return primed
+
+
+def insert_alerts(db, alerts: List[dict]) -> None:
+    """Inserta alertas ignorando las que ya existen para la misma (regla, lectura)."""
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        db.execute(insert(models.Alert), alerts)
+        return
+    statement = dialect_insert(models.Alert).on_conflict_do_nothing(index_elements=["rule_id", "reading_id"])
+    db.execute(statement, alerts)
+
+
+class AlertWorker:
+    """Hilo de fondo que guarda las alertas disparadas por lotes y mantiene las reglas al día."""
+
+    def __init__(self, engine: AlertEngine, max_queue: int = 10000, batch_size: int = 500):
+        self.engine = engine
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="alert-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Guarda las alertas pendientes y detiene el hilo."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, alerts: List[dict]) -> None:
+        for alert in alerts:
+            try:
+                self._queue.put_nowait(alert)
+            except queue.Full:
+                self.dropped += 1
+
+    def _next_batch(self) -> List[dict]:
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=0.5))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if not batch and not self.engine.is_stale():
+                continue
+            db = SessionLocal()
+            try:
+                if batch:
+                    insert_alerts(db, batch)
+                    db.commit()
+                    self.written += len(batch)
+                if self.engine.is_stale():
+                    refresh_rules(db, self.engine)
+            except Exception:
+                self.failed += len(batch)
+                logger.exception("Alert worker failed to store %s alerts", len(batch))
+            finally:
+                db.close()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+class AlertLeader:
+    """
+    Evaluación compartida entre workers (LIVE_BROKER=postgres): el worker que
+    obtiene el advisory lock en la conexión del broker evalúa las lecturas del
+    canal; el lock se libera solo si el worker cae y su conexión se cierra.
+    """
+
+    def __init__(self, engine: AlertEngine, worker: AlertWorker, enabled: bool, poll_seconds: float = 5.0):
+        self.engine = engine
+        self.worker = worker
+        self.enabled = enabled
+        self.poll_seconds = poll_seconds
+        self.leader = False
+        self._broker = None
+        self._pending: Optional[List[dict]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, broker) -> None:
+        self._broker = broker
+        broker.add_reader(self.on_readings)
+        broker.add_disconnect_listener(self._on_disconnect)
+        self._task = asyncio.create_task(self._campaign())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.leader = False
+
+    async def _campaign(self) -> None:
+        while True:
+            try:
+                if await self._broker.try_advisory_lock(ALERT_LEADER_LOCK_KEY):
+                    break
+            except Exception:
+                logger.exception("Alert leader election failed")
+            await asyncio.sleep(self.poll_seconds)
+        # Las lecturas que llegan mientras se reconstruye el estado esperan en _pending
+        self._pending = []
+        self.leader = True
+        primed: Dict[str, int] = {}
+        try:
+            primed = await asyncio.to_thread(self._prime)
+        except Exception:
+            logger.exception("Rebuilding alert rule state failed")
+        pending, self._pending = self._pending, None
+        self._evaluate([reading for reading in pending if reading["id"] > primed.get(reading["station_id"], 0)])
+        logger.info("This worker now evaluates the alert rules")
+
+    def _on_disconnect(self) -> None:
+        """La conexión del broker se cayó y con ella el lock: dejar de evaluar y volver a competir."""
+        if self._task is None:
+            return
+        if self.leader:
+            logger.warning("Lost the alert leader lock with the live broker connection")
+        self.leader = False
+        self._pending = None
+        self._task.cancel()
+        self._task = asyncio.create_task(self._campaign())
+
+    def _prime(self) -> Dict[str, int]:
+        db = SessionLocal()
+        try:
+            refresh_rules(db, self.engine)
+            return prime_rules(db, self.engine)
+        finally:
+            db.close()
+
+    def on_readings(self, readings: List[dict]) -> None:
+        """Lecturas decodificadas del canal compartido (hilo del event loop)."""
+        if not self.leader:
+            return
+        if self._pending is not None:
+            self._pending.extend(readings)
+        else:
+            self._evaluate(readings)
+
+    def _evaluate(self, readings: List[dict]) -> None:
+        fired = self.engine.evaluate(readings)
+        if fired:
+            self.worker.submit(fired)
+
+    def stats(self) -> dict:
+        return {"shared": self.enabled, "leader": self.leader if self.enabled else True}
+
+
+alert_engine = AlertEngine(refresh_seconds=settings.ALERT_RULE_REFRESH_SECONDS)
+alert_worker = AlertWorker(alert_engine, max_queue=settings.ALERT_QUEUE_SIZE)
+alert_leader = AlertLeader(
+    alert_engine, alert_worker, enabled=settings.LIVE_BROKER == "postgres",
+    poll_seconds=settings.ALERT_LEADER_POLL_SECONDS,
+)
+
+
+def evaluate_readings(readings: List[dict]) -> None:
+    """Hook de la ingesta: evalúa las lecturas y encola las alertas para guardarlas."""
+    if alert_leader.enabled:
+        # Las evalúa el worker líder al recibirlas del broker
+        return
+    fired = alert_engine.evaluate(readings)
+    if fired:
+        alert_worker.submit(fired)
@@ -0,0 +1,516 @@
+"""
+Archivo frío de station_data en Parquet (opt-in con ARCHIVE_ENABLED).
+
+Las lecturas con más de ARCHIVE_AFTER_DAYS días salen de la base de datos a
+un archivo Parquet por estación y mes, comprimido por columnas:
+
+    {ARCHIVE_DIR}/{station_id}/{YYYY}-{MM}.parquet
+
+Dentro de cada archivo las filas van ordenadas por (timestamp, id) en row
+groups de ARCHIVE_ROW_GROUP_SIZE filas con estadísticas min/max. Al leer,
+los archivos se descartan por estación y mes (la ruta), se abren con
+memory_map y el filtro de tiempo se evalúa contra las estadísticas de cada
+row group, así que solo se descomprime lo que puede cumplirlo; el resto
+(agregados, series) se calcula con pyarrow/NumPy sobre columnas enteras.
+
+El archivo solo contiene lecturas más antiguas que las que quedan en la DB,
+así que GET /station-data (y /latest, /aggregate, /series, /export) siguen
+en él cuando la DB se queda sin filas. La retención (DELETE
+/station-data/cleanup) también lo recorta: purge_expired borra los meses
+anteriores al corte. Para archivar fuera de la app:
+
+    python -m app.archive run --days 365
+    python -m app.archive status
+"""
+import argparse
+import fcntl
+import functools
+import itertools
+import json
+import logging
+import operator
+import os
+import re
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .config import settings
+from .database import SessionLocal
+from .response_cache import bump_station_data_purge
+
+logger = logging.getLogger(__name__)
+
+# Mismas columnas y orden que crud.STATION_DATA_COLUMNS
+ARCHIVE_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("station_id", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+    ("temperatura", pa.float64()),
+    ("humedad", pa.float64()),
+    ("presion", pa.float64()),
+    ("gas_detectado", pa.bool_()),
+    ("voltaje_mq135", pa.float64()),
+    ("indice_uv", pa.float64()),
+    ("nivel_uv", pa.string()),
+])
+COLUMNS = tuple(ARCHIVE_SCHEMA.names)
+# Filas con atributos, como las Row de SQLAlchemy (el cursor lee .timestamp y .id)
+ArchivedRow = namedtuple("ArchivedRow", COLUMNS)
+ASCENDING = [("timestamp", "ascending"), ("id", "ascending")]
+DESCENDING = [("timestamp", "descending"), ("id", "descending")]
+
+_STATION_DIR = re.compile(r"[0-9a-fA-F]+")
+_MONTH_FILE = re.compile(r"(\d{4})-(\d{2})\.parquet")
+
+# (min, max, avg, lecturas no nulas) de una métrica en un bucket
+MetricSummary = Tuple[Optional[float], Optional[float], Optional[float], int]
+
+
+def is_enabled() -> bool:
+    return settings.ARCHIVE_ENABLED
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """Las fechas se guardan en UTC sin zona, como en station_data."""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(start: datetime) -> datetime:
+    return (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def archive_path(station_id: str, month: datetime) -> str:
+    return os.path.join(settings.ARCHIVE_DIR, station_id, f"{month.year}-{month.month:02d}.parquet")
+
+
+def archive_files(station_id: Optional[str] = None, start_time: Optional[datetime] = None,
+                  end_time: Optional[datetime] = None) -> List[Tuple[datetime, str]]:
+    """(mes, ruta) de los archivos que pueden tener lecturas del filtro, del mes más reciente al más antiguo."""
+    root = settings.ARCHIVE_DIR
+    if not os.path.isdir(root) or (station_id is not None and not _STATION_DIR.fullmatch(station_id)):
+        return []
+    stations = [station_id] if station_id else [name for name in os.listdir(root) if _STATION_DIR.fullmatch(name)]
+    files = []
+    for station in stations:
+        directory = os.path.join(root, station)
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            match = _MONTH_FILE.fullmatch(name)
+            if match is None:
+                continue
+            month = datetime(int(match[1]), int(match[2]), 1)
+            if (start_time is not None and next_month(month) <= start_time) or (end_time is not None and month > end_time):
+                continue
+            files.append((month, os.path.join(directory, name)))
+    return sorted(files, reverse=True)
+
+
+def _filter_expression(start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                       after: Optional[tuple] = None):
+    """Filtro de pyarrow equivalente a crud.filter_station_data (la estación ya la fija la ruta)."""
+    timestamp = pc.field("timestamp")
+    conditions = []
+    if start_time is not None:
+        conditions.append(timestamp >= start_time)
+    if end_time is not None:
+        conditions.append(timestamp <= end_time)
+    if after is not None:
+        after_timestamp, after_id = after
+        conditions.append((timestamp < after_timestamp) | ((timestamp == after_timestamp) & (pc.field("id") < after_id)))
+    return functools.reduce(operator.and_, conditions) if conditions else None
+
+
+def _time_filter(start_time: Optional[datetime], end_time: Optional[datetime], after: Optional[tuple]):
+    """(inicio, fin, expresión) en UTC sin zona; el cursor también acota el fin."""
+    start_time, end_time = _naive_utc(start_time), _naive_utc(end_time)
+    if after is not None:
+        after = (_naive_utc(after[0]), after[1])
+        end_time = min(end_time, after[0]) if end_time is not None else after[0]
+    return start_time, end_time, _filter_expression(start_time, end_time, after)
+
+
+def _month_groups(station_id: Optional[str], start_time: Optional[datetime], end_time: Optional[datetime]):
+    """Rutas de los archivos agrupadas por mes, del más reciente al más antiguo."""
+    files = archive_files(station_id, start_time, end_time)
+    for _, group in itertools.groupby(files, key=operator.itemgetter(0)):
+        yield [path for _, path in group]
+
+
+def _read_newest(path: str, need: int, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                 expression=None, columns: Optional[List[str]] = None) -> Optional[pa.Table]:
+    """
+    Al menos `need` de las filas más recientes de un archivo que cumplen el
+    filtro (todas si hay menos). El archivo va ordenado por (timestamp, id): se
+    leen sus row groups del último al primero, saltando los que sus
+    estadísticas min/max dejan fuera del rango, y se para al tener bastantes.
+    """
+    parquet = pq.ParquetFile(path, memory_map=True)
+    timestamp_column = parquet.schema_arrow.get_field_index("timestamp")
+    tables: List[pa.Table] = []
+    found = 0
+    for index in reversed(range(parquet.num_row_groups)):
+        statistics = parquet.metadata.row_group(index).column(timestamp_column).statistics
+        if statistics is not None and statistics.has_min_max and (
+            (end_time is not None and statistics.min > end_time)
+            or (start_time is not None and statistics.max < start_time)
+        ):
+            continue
+        table = parquet.read_row_group(index, columns=columns)
+        if expression is not None:
+            table = table.filter(expression)
+        if table.num_rows:
+            tables.append(table)
+            found += table.num_rows
+        if found >= need:
+            break
+    if not tables:
+        return None
+    return pa.concat_tables(tables[::-1]) if len(tables) > 1 else tables[0]
+
+
+def _scan_months(station_id: Optional[str], start_time: Optional[datetime], end_time: Optional[datetime],
+                 columns: Optional[List[str]] = None, after: Optional[tuple] = None) -> Iterator[pa.Table]:
+    """
+    Una tabla por mes (todas las estaciones del filtro), del más reciente al
+    más antiguo, con solo las filas y columnas pedidas.
+    """
+    start_time, end_time, expression = _time_filter(start_time, end_time, after)
+    for group in _month_groups(station_id, start_time, end_time):
+        tables = [pq.read_table(path, columns=columns, filters=expression, memory_map=True) for path in group]
+        table = pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+        if table.num_rows:
+            yield table
+
+
+def _table_rows(table: pa.Table) -> List[tuple]:
+    return list(zip(*(column.to_pylist() for column in table.columns)))
+
+
+def read_station_data(station_id: Optional[str] = None, start_time: Optional[datetime] = None,
+                      end_time: Optional[datetime] = None, after: Optional[tuple] = None,
+                      skip: int = 0, limit: int = 100, as_tuples: bool = False) -> list:
+    """
+    Lecturas archivadas en el orden de GET /station-data: (timestamp, id) descendente.
+    De cada archivo solo se leen los row groups más recientes que hacen falta
+    para las skip + limit filas pendientes, no el mes entero.
+    """
+    start_time, end_time, expression = _time_filter(start_time, end_time, after)
+    rows = []
+    for group in _month_groups(station_id, start_time, end_time):
+        need = skip + limit - len(rows)
+        tables = [
+            table for table in (_read_newest(path, need, start_time, end_time, expression) for path in group)
+            if table is not None
+        ]
+        if not tables:
+            continue
+        table = pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+        # Con menos de `need` filas el mes se leyó entero: se puede saltar completo
+        if skip >= table.num_rows:
+            skip -= table.num_rows
+            continue
+        rows += _table_rows(table.sort_by(DESCENDING).slice(skip, limit - len(rows)))
+        skip = 0
+        if len(rows) >= limit:
+            break
+    if as_tuples:
+        return [ArchivedRow(*row) for row in rows]
+    return [schemas.StationData.model_construct(**dict(zip(COLUMNS, row))) for row in rows]
+
+
+def latest_per_station(station_ids: Optional[List[str]] = None, exclude=()) -> List[dict]:
+    """Última lectura archivada de cada estación (fuera de `exclude`); solo abre su mes más reciente."""
+    newest: Dict[str, str] = {}
+    if station_ids:
+        for station_id in station_ids:
+            files = archive_files(station_id) if station_id not in exclude else []
+            if files:
+                newest[station_id] = files[0][1]
+    else:
+        # Del mes más reciente al más antiguo: el primero de cada estación es el suyo
+        for _, path in archive_files():
+            station_id = os.path.basename(os.path.dirname(path))
+            if station_id not in exclude:
+                newest.setdefault(station_id, path)
+    readings = []
+    for path in newest.values():
+        table = _read_newest(path, 1)
+        if table is not None:
+            readings += table.sort_by(DESCENDING).slice(0, 1).to_pylist()
+    return readings
+
+
+def iter_station_data(station_id: Optional[str] = None, start_time: Optional[datetime] = None,
+                      end_time: Optional[datetime] = None, batch_size: int = 1000) -> Iterator[List[tuple]]:
+    """Como crud.stream_station_data: tuplas de columnas en bloques, orden descendente."""
+    for table in _scan_months(station_id, start_time, end_time):
+        for batch in table.sort_by(DESCENDING).to_batches(max_chunksize=batch_size):
+            yield _table_rows(batch)
+
+
+def read_series(station_id: str, metrics: List[str], start_time: Optional[datetime] = None,
+                end_time: Optional[datetime] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Segundos epoch y un array por métrica (NULL = NaN) en orden cronológico, como downsampling.columns_to_arrays."""
+    tables = list(_scan_months(station_id, start_time, end_time, columns=["id", "timestamp", *metrics]))
+    if not tables:
+        return np.array([], dtype=np.float64), {metric: np.array([], dtype=np.float64) for metric in metrics}
+    table = pa.concat_tables(tables).sort_by(ASCENDING)
+    epochs = table["timestamp"].cast(pa.int64()).to_numpy() / 1e6
+    values = {
+        metric: pc.fill_null(table[metric].cast(pa.float64()), np.nan).to_numpy()
+        for metric in metrics
+    }
+    return epochs, values
+
+
+def aggregate(bucket_seconds: int, metrics: List[str], station_id: Optional[str] = None,
+              start_time: Optional[datetime] = None,
+              end_time: Optional[datetime] = None) -> Dict[int, Tuple[int, Dict[str, MetricSummary]]]:
+    """
+    {inicio del bucket en segundos epoch: (lecturas, {métrica: (min, max, avg, no nulas)})}
+    agrupando con pyarrow, para combinarlo con los buckets de la DB.
+    """
+    buckets: Dict[int, Tuple[int, Dict[str, MetricSummary]]] = {}
+    for table in _scan_months(station_id, start_time, end_time, columns=["timestamp", *metrics]):
+        for key, summary in aggregate_table(table, bucket_seconds, metrics).items():
+            buckets[key] = combine_buckets(buckets[key], summary) if key in buckets else summary
+    return buckets
+
+
+def aggregate_table(table: pa.Table, bucket_seconds: int,
+                    metrics: Sequence[str]) -> Dict[int, Tuple[int, Dict[str, MetricSummary]]]:
+    """Buckets de una tabla ya leída (una estación), con el formato de aggregate."""
+    # División entera de microsegundos: mismo inicio de bucket que bucket_epoch_expression
+    bucket = pc.multiply(pc.divide(table["timestamp"].cast(pa.int64()), bucket_seconds * 1_000_000), bucket_seconds)
+    grouped = table.append_column("bucket", bucket).group_by("bucket").aggregate(
+        [("bucket", "count")] + [(metric, name) for metric in metrics for name in ("min", "max", "mean", "count")]
+    )
+    return {
+        row["bucket"]: (row["bucket_count"], {
+            metric: (row[f"{metric}_min"], row[f"{metric}_max"], row[f"{metric}_mean"], row[f"{metric}_count"])
+            for metric in metrics
+        })
+        for row in grouped.to_pylist()
+    }
+
+
+def combine_metric(left: MetricSummary, right: MetricSummary) -> MetricSummary:
+    """Une dos resúmenes de una métrica; la media se pondera por lecturas no nulas."""
+    count = left[3] + right[3]
+    if not left[3] or not right[3]:
+        return left if left[3] else right
+    return (
+        min(left[0], right[0]),
+        max(left[1], right[1]),
+        (left[2] * left[3] + right[2] * right[3]) / count,
+        count,
+    )
+
+
+def combine_buckets(left: Tuple[int, Dict[str, MetricSummary]],
+                    right: Tuple[int, Dict[str, MetricSummary]]) -> Tuple[int, Dict[str, MetricSummary]]:
+    return left[0] + right[0], {metric: combine_metric(summary, right[1][metric]) for metric, summary in left[1].items()}
+
+
+def rows_to_table(rows: Sequence[tuple]) -> pa.Table:
+    columns = list(zip(*rows)) or [()] * len(COLUMNS)
+    return pa.Table.from_arrays(
+        [pa.array(list(values), type=field.type) for values, field in zip(columns, ARCHIVE_SCHEMA)],
+        schema=ARCHIVE_SCHEMA
+    )
+
+
+def write_month(station_id: str, month: datetime, table: pa.Table) -> str:
+    """Escribe (o amplía) el archivo de un mes; el archivo nuevo sustituye al anterior con os.replace."""
+    path = archive_path(station_id, month)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(path):
+        table = pa.concat_tables([pq.read_table(path, memory_map=True), table])
+        # Un archivado interrumpido entre escribir y borrar de la DB deja filas repetidas
+        _, first = np.unique(table["id"].to_numpy(), return_index=True)
+        table = table.take(first)
+    _write_table(path, table)
+    return path
+
+
+def _write_table(path: str, table: pa.Table) -> None:
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        pq.write_table(
+            table.sort_by(ASCENDING), tmp_path,
+            compression=settings.ARCHIVE_COMPRESSION,
+            row_group_size=settings.ARCHIVE_ROW_GROUP_SIZE,
+            use_dictionary=["station_id", "nivel_uv"],
+        )
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def archive_station_data(db: Session, cutoff: datetime) -> dict:
+    """
+    Mueve al archivo las lecturas anteriores a `cutoff`, una estación y un mes
+    cada vez: primero escribe el Parquet y después borra esas filas de la DB,
+    así que una interrupción no pierde lecturas (como mucho las repite).
+    """
+    data = models.StationData
+    columns = [getattr(data, name) for name in COLUMNS]
+    cutoff = _naive_utc(cutoff)
+    oldest = db.execute(
+        select(data.station_id, func.min(data.timestamp)).where(data.timestamp < cutoff).group_by(data.station_id)
+    ).all()
+
+    archived = files = 0
+    for station_id, first in oldest:
+        if not _STATION_DIR.fullmatch(station_id):
+            logger.warning("Skipping station %r: not a valid archive directory name", station_id)
+            continue
+        month = month_start(first)
+        while month < cutoff:
+            condition = and_(
+                data.station_id == station_id, data.timestamp >= month, data.timestamp < min(next_month(month), cutoff)
+            )
+            rows = db.execute(select(*columns).where(condition).order_by(data.timestamp, data.id)).all()
+            if rows:
+                write_month(station_id, month, rows_to_table(rows))
+                # Solo las filas leídas: una lectura insertada mientras tanto tendría un id mayor
+                db.execute(delete(data).where(condition, data.id <= max(row.id for row in rows)))
+                db.commit()
+                archived += len(rows)
+                files += 1
+            month = next_month(month)
+
+    if archived:
+        bump_station_data_purge()
+    return {"cutoff": cutoff, "rows": archived, "files": files}
+
+
+@contextmanager
+def _archive_lock(blocking: bool = False):
+    """Un solo archivado (o purga) a la vez entre workers y procesos (flock en ARCHIVE_DIR/.lock)."""
+    os.makedirs(settings.ARCHIVE_DIR, exist_ok=True)
+    with open(os.path.join(settings.ARCHIVE_DIR, ".lock"), "w") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def run(days: Optional[int] = None) -> Optional[dict]:
+    """Archiva con su propia sesión (tarea periódica y CLI); None si otro proceso ya está archivando."""
+    cutoff = _utcnow() - timedelta(days=days if days is not None else settings.ARCHIVE_AFTER_DAYS)
+    with _archive_lock() as acquired:
+        if not acquired:
+            return None
+        db = SessionLocal()
+        try:
+            result = archive_station_data(db, cutoff)
+        finally:
+            db.close()
+    if result["rows"]:
+        logger.info("Archived %s readings older than %s into %s files", result["rows"], cutoff, result["files"])
+    return result
+
+
+def purge_expired(cutoff: datetime, on_expired: Optional[Callable[[str, pa.Table], None]] = None,
+                  on_file: Optional[Callable[[], None]] = None) -> int:
+    """
+    Borra del archivo las lecturas anteriores a `cutoff` (retención): los meses
+    enteros se eliminan y el mes del corte se reescribe con las filas que
+    quedan. on_expired(station_id, tabla) recibe antes las filas que se
+    borran (resúmenes horarios); on_file() se llama antes de cada archivo
+    (latido del trabajo de retención). Devuelve el número de lecturas borradas.
+    """
+    cutoff = _naive_utc(cutoff)
+    removed = 0
+    with _archive_lock(blocking=True):
+        for month, path in archive_files(end_time=cutoff):
+            if on_file:
+                on_file()
+            station_id = os.path.basename(os.path.dirname(path))
+            kept = None
+            if next_month(month) <= cutoff:
+                expired = pq.read_table(path, memory_map=True) if on_expired else None
+                count = pq.read_metadata(path, memory_map=True).num_rows
+            else:
+                table = pq.read_table(path, memory_map=True)
+                old = pc.less(table["timestamp"], pa.scalar(cutoff, type=pa.timestamp("us")))
+                expired, kept = table.filter(old), table.filter(pc.invert(old))
+                count = expired.num_rows
+                if not count:
+                    continue
+            if on_expired:
+                on_expired(station_id, expired)
+            if kept is None or not kept.num_rows:
+                os.remove(path)
+            else:
+                _write_table(path, kept)
+            removed += count
+    if removed:
+        bump_station_data_purge()
+    return removed
+
+
+def stats() -> dict:
+    files = archive_files()
+    return {
+        "enabled": is_enabled(),
+        "directory": settings.ARCHIVE_DIR,
+        "files": len(files),
+        "stations": len({os.path.basename(os.path.dirname(path)) for _, path in files}),
+        # Solo el pie de cada archivo: no lee los datos
+        "rows": sum(pq.read_metadata(path, memory_map=True).num_rows for _, path in files),
+        "bytes": sum(os.path.getsize(path) for _, path in files),
+        "oldest_month": files[-1][0].strftime("%Y-%m") if files else None,
+        "newest_month": files[0][0].strftime("%Y-%m") if files else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archivo Parquet de station_data")
+    parser.add_argument("command", choices=["run", "status"])
+    parser.add_argument("--days", type=int, default=None, help="Por defecto ARCHIVE_AFTER_DAYS")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        result = run(args.days)
+        if result is None:
+            parser.exit(1, "Another process is archiving\n")
+        result["cutoff"] = result["cutoff"].isoformat()
+        print(json.dumps(result))
+    print(json.dumps(stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
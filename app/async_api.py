@@ -0,0 +1,298 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from datetime import datetime, timedelta
+
+from . import schemas, crud_async
+from .database import get_async_db
+from .replicas import get_async_read_db
+from .config import settings
+from .ingest import enqueue_station_data, enqueue_station_data_batch
+from .payloads import is_binary, decode_readings, read_json_reading
+from .pagination import decode_cursor, set_next_cursor
+from .response_cache import (
+    response_cache, station_data_scopes, user_scope, USER_STATIONS,
+    STATION_DATA_LIST, USER_STATION_LIST, USER
+)
+from .serialization import encode_station_data
+from .security import (
+    create_access_token, verify_and_update_password_async, require_authorization, resolve_api_key,
+    check_device_station, USER_TOKEN_TYPE
+)
+
+# Endpoints async equivalentes a los de main.py (DB_MODE=async).
+# Se registran antes que los síncronos, así que tienen prioridad en las mismas rutas.
+# Los parámetros de ruta usan ':int' para no capturar rutas fijas como /station-data/aggregate.
+# Cubren usuarios, login, estaciones y la ingesta y lectura de station_data (con la validación
+# de API key también async). Siguen síncronas (Session en el threadpool) en ambos modos:
+# - aggregate, series, rollups, export y /stations/latest (consultas por dialecto y el archivo Parquet)
+# - reglas de alerta, alertas, claves de dispositivo y /auth/me (usan get_current_user, síncrono)
+# - DELETE /station-data/cleanup: la retención corre en su propio hilo con sesiones síncronas
+router = APIRouter(include_in_schema=False)
+
+
+async def verify_api_key(authorization: str = Header(None), db: AsyncSession = Depends(get_async_db)) -> Optional[str]:
+    """security.verify_api_key sobre AsyncSession: la ingesta no pasa por el threadpool ni abre una Session."""
+    require_authorization(authorization)
+    return resolve_api_key(authorization, await crud_async.lookup_device_key(db, authorization))
+
+## User endpoints
+@router.post("/users", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await crud_async.get_user_by_email(db, email=user.email)
+    if db_user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    return await crud_async.create_user(db=db, user=user)
+
+@router.get("/users", response_model=List[schemas.User])
+async def read_users(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header (replaces skip)"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    after = decode_cursor(cursor, int)
+    users = await crud_async.get_users(db, skip=skip, limit=limit, after_id=after[0] if after else None)
+    set_next_cursor(response, users, limit, key=lambda user: (user.user_id,))
+    return users
+
+@router.get("/users/{user_id:int}", response_model=schemas.User)
+async def read_user(user_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    cached = response_cache.lookup(request, (user_scope(user_id),))
+    if cached.response is not None:
+        return cached.response
+    db_user = await crud_async.get_user(db, user_id=user_id)
+    if db_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return cached.store(USER, db_user)
+
+@router.post("/auth/login")
+async def user_login(credentials: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await crud_async.get_user_by_email(db, email=credentials.email)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Credenciales inválidas"
+        )
+
+    valid, new_hash = await verify_and_update_password_async(credentials.password, user.password)
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Credenciales inválidas"
+        )
+    if new_hash:
+        await crud_async.update_user_password_hash(db, user, new_hash)
+
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.email, "typ": USER_TOKEN_TYPE}, expires_delta=access_token_expires
+    )
+
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user_id": user.user_id,
+        "email": user.email,
+        "full_name": user.full_name
+    }
+
+## UserStation endpoints
+@router.post("/user-stations", response_model=schemas.UserStation, status_code=status.HTTP_201_CREATED)
+async def create_user_station(
+    user_station: schemas.UserStationCreate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_user = await crud_async.get_user(db, user_id=user_station.user_id)
+    if not db_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+
+    db_station = await crud_async.get_user_station(db, station_id=user_station.station_id)
+    if db_station:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Station ID already exists"
+        )
+
+    return await crud_async.create_user_station(db=db, user_station=user_station)
+
+@router.get("/user-stations", response_model=List[schemas.UserStation])
+async def read_user_stations(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    user_id: Optional[int] = Query(None, description="Filter by user ID"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header (replaces skip)"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    cached = response_cache.lookup(request, (USER_STATIONS,))
+    if cached.response is not None:
+        return cached.response
+    after = decode_cursor(cursor, str)
+    after_station_id = after[0] if after else None
+    if user_id:
+        stations = await crud_async.get_user_stations_by_user(
+            db, user_id=user_id, skip=skip, limit=limit, after_station_id=after_station_id
+        )
+    else:
+        stations = await crud_async.get_all_user_stations(
+            db, skip=skip, limit=limit, after_station_id=after_station_id
+        )
+    set_next_cursor(response, stations, limit, key=lambda station: (station.station_id,))
+    return cached.store(USER_STATION_LIST, stations, response)
+
+@router.get("/user-stations/{station_id}", response_model=schemas.UserStation)
+async def read_user_station(station_id: str, db: AsyncSession = Depends(get_async_read_db)):
+    db_station = await crud_async.get_user_station(db, station_id=station_id)
+    if db_station is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Station not found"
+        )
+    return db_station
+
+## StationData endpoints
+async def _check_station(db: AsyncSession, station_id: str, device_station_id: Optional[str] = None):
+    if device_station_id is None and not await crud_async.station_exists(db, station_id=station_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Station with ID {station_id} not found"
+        )
+
+async def _store_station_data(db: AsyncSession, payload: schemas.StationDataCreate,
+                              device_station_id: Optional[str] = None):
+    await _check_station(db, payload.station_id, device_station_id)
+    try:
+        return await crud_async.create_station_data(db, payload)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error storing station data: {str(e)}"
+        )
+
+def _check_batch_size(count: int):
+    if count > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds the maximum of {settings.BATCH_MAX_ITEMS} items"
+        )
+
+async def _store_station_data_batch(db: AsyncSession, payload: List[schemas.StationDataCreate],
+                                    device_station_id: Optional[str] = None):
+    try:
+        return await crud_async.create_station_data_batch(db, payload, device_station_id)
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error storing station data batch: {str(e)}"
+        )
+
+async def _ingest(request: Request, db: AsyncSession, device_station_id: Optional[str]):
+    if is_binary(request):
+        readings = decode_readings(await request.body())
+        check_device_station(device_station_id, readings[0]["station_id"])
+        _check_batch_size(len(readings))
+        if settings.INGEST_WRITE_BEHIND:
+            await _check_station(db, readings[0]["station_id"], device_station_id)
+            return enqueue_station_data_batch(readings)
+        return await _store_station_data_batch(db, readings, device_station_id)
+
+    payload = await read_json_reading(request)
+    check_device_station(device_station_id, payload.station_id)
+    if settings.INGEST_WRITE_BEHIND:
+        await _check_station(db, payload.station_id, device_station_id)
+        return enqueue_station_data(payload)
+    return await _store_station_data(db, payload, device_station_id)
+
+@router.post(
+    "/station-data",
+    response_model=Union[schemas.StationData, schemas.StationDataBatchResult],
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_station_data(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    device_station_id: Optional[str] = Depends(verify_api_key)
+):
+    return await _ingest(request, db, device_station_id)
+
+@router.post("/station-data/batch", response_model=schemas.StationDataBatchResult, status_code=status.HTTP_201_CREATED)
+async def create_station_data_batch(
+    payload: List[schemas.StationDataCreate],
+    db: AsyncSession = Depends(get_async_db),
+    device_station_id: Optional[str] = Depends(verify_api_key)
+):
+    _check_batch_size(len(payload))
+    return await _store_station_data_batch(db, payload, device_station_id)
+
+@router.get("/station-data", response_model=List[schemas.StationData])
+async def read_station_data(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    station_id: Optional[str] = Query(None, description="Filter by station ID (hexadecimal)"),
+    start_time: Optional[datetime] = Query(None, description="Start time filter"),
+    end_time: Optional[datetime] = Query(None, description="End time filter"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header (replaces skip)"),
+    layout: schemas.StationDataLayout = Query("model", description="model (default), or rows/columns: column tuples encoded with orjson, no per-row validation"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    cached = response_cache.lookup(request, station_data_scopes(station_id))
+    if cached.response is not None:
+        return cached.response
+    after = decode_cursor(cursor, datetime.fromisoformat, int)
+    data = await crud_async.get_station_data(db, skip=skip, limit=limit, station_id=station_id,
+                                             start_time=start_time, end_time=end_time, after=after,
+                                             as_tuples=layout != "model")
+    set_next_cursor(response, data, limit, key=lambda row: (row.timestamp, row.id))
+    if layout != "model":
+        return cached.store_encoded(encode_station_data(layout, data), response)
+    return cached.store(STATION_DATA_LIST, data, response)
+
+@router.get("/station-data/latest", response_model=List[schemas.StationData])
+async def read_latest_station_data(
+    request: Request,
+    station_id: Optional[str] = Query(None, description="Specific station ID (hexadecimal)"),
+    limit: int = Query(10, ge=1, le=1000, description="Number of records to return"),
+    layout: schemas.StationDataLayout = Query("model", description="model (default), or rows/columns: column tuples encoded with orjson, no per-row validation"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    cached = response_cache.lookup(request, station_data_scopes(station_id))
+    if cached.response is not None:
+        return cached.response
+    data = await crud_async.get_latest_station_data(db, station_id=station_id, limit=limit, as_tuples=layout != "model")
+    if layout != "model":
+        return cached.store_encoded(encode_station_data(layout, data))
+    return cached.store(STATION_DATA_LIST, data)
+
+@router.get("/station-data/{data_id:int}", response_model=schemas.StationData)
+async def read_station_data_id(data_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    obj = await crud_async.get_station_data_by_id(db, data_id)
+    if not obj:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Record with ID {data_id} not found"
+        )
+    return obj
+
+@router.post("/")
+async def root_endpoint(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    device_station_id: Optional[str] = Depends(verify_api_key)
+):
+    """Endpoint alternativo para compatibilidad con el ESP32"""
+    return await _ingest(request, db, device_station_id)
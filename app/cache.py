@@ -0,0 +1,165 @@
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from .config import settings
+
+
+class StationRegistryCache:
+    """
+    Cache LRU acotado de IDs de UserStation conocidos.
+    Guarda resultados positivos (la estación existe) con un TTL largo y
+    negativos (no existe) con un TTL corto, para que la ruta de ingesta
+    pueda saltarse la consulta de existencia en la mayoría de lecturas.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0, negative_ttl: float = 5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # station_id -> (exists, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, station_id: str) -> Optional[bool]:
+        """Devuelve True/False si el resultado está en cache, o None si hay que consultar la DB."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(station_id)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[station_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(station_id)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, station_id: str, exists: bool) -> None:
+        ttl = self.ttl if exists else self.negative_ttl
+        with self._lock:
+            self._entries[station_id] = (exists, time.monotonic() + ttl)
+            self._entries.move_to_end(station_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, station_id: str) -> None:
+        with self._lock:
+            self._entries.pop(station_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class VerifiedTokenCache:
+    """
+    Cache LRU de JWT ya verificados, indexado por la firma del token.
+    Guarda los claims decodificados y la proyección del usuario; cada
+    entrada caduca en el 'exp' del token o tras `ttl` segundos, lo que
+    ocurra antes. Las entradas de un usuario se invalidan cuando cambia.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # firma -> (token, claims, user, subject, expires_at)
+        self._by_subject = {}  # subject (email) -> {firmas}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _signature(token: str) -> str:
+        return token.rsplit(".", 1)[-1]
+
+    def get(self, token: str) -> Optional[Tuple[dict, Any]]:
+        """Devuelve (claims, user) si el token está verificado en cache, o None."""
+        key = self._signature(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            # Se compara el token completo: la firma sola no cubre el payload presentado
+            if entry is None or entry[4] <= now or not hmac.compare_digest(entry[0], token):
+                if entry is not None and entry[4] <= now:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def set(self, token: str, claims: dict, user: Any, subject: str) -> None:
+        expires_at = time.time() + self.ttl
+        if claims.get("exp") is not None:
+            expires_at = min(expires_at, float(claims["exp"]))
+        key = self._signature(token)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (token, claims, user, subject, expires_at)
+            self._by_subject.setdefault(subject, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        keys = self._by_subject.get(entry[3])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_subject[entry[3]]
+
+    def invalidate_subject(self, subject: str) -> None:
+        """Descarta todos los tokens cacheados de un usuario (por su email)."""
+        with self._lock:
+            for key in list(self._by_subject.get(subject, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_subject.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+station_cache = StationRegistryCache(
+    maxsize=settings.STATION_CACHE_SIZE,
+    ttl=settings.STATION_CACHE_TTL,
+    negative_ttl=settings.STATION_CACHE_NEGATIVE_TTL,
+)
+
+token_cache = VerifiedTokenCache(
+    maxsize=settings.TOKEN_CACHE_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL,
+)
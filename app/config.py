@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
+from typing import Literal
 
 class Settings(BaseSettings):
     DATABASE_URL: str
@@ -9,6 +10,118 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     ALGORITHM: str = "HS256"
 
+    # Claves por dispositivo (tabla device_keys): segundos entre recargas incrementales
+    # del índice en memoria; la API_KEY global sigue aceptándose mientras esté habilitada
+    DEVICE_KEY_REFRESH_SECONDS: float = 30.0
+    SHARED_API_KEY_ENABLED: bool = True
+
+    # Cache de JWT verificados (la entrada caduca en el 'exp' del token o tras el TTL)
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL: float = 300.0
+
+    # Hashing de contraseñas: coste de bcrypt y pool donde se ejecuta
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_EXECUTOR: Literal["process", "thread"] = "process"
+    PASSWORD_HASH_WORKERS: int = 2
+
+    # Capa de base de datos: "sync" (Session + threadpool) o "async" (AsyncSession en usuarios,
+    # estaciones y la ingesta/lectura de station_data; el resto de rutas sigue síncrono, ver async_api.py)
+    DB_MODE: Literal["sync", "async"] = "sync"
+
+    # Aplicar migraciones de Alembic (alembic upgrade head) al arrancar
+    RUN_MIGRATIONS_ON_STARTUP: bool = True
+    # Workers (app/server.py; por defecto uno, --workers 0 usa uno por núcleo) y pool de cada engine. Con
+    # Workers (app/server.py; por defecto uno por núcleo) y pool de cada engine. Con
+    # DB_MAX_CONNECTIONS > 0 el pool de cada worker se recorta para que la suma de todos
+    # los workers quede por debajo de ese límite del servidor de base de datos
+    WEB_CONCURRENCY: int = 1
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_MAX_CONNECTIONS: int = 0
+
+    # Abrir las conexiones del pool y cargar los caches antes de dar el worker por listo
+    # (GET /health/ready)
+    PREWARM_ON_STARTUP: bool = True
+
+    # Ingesta por lotes (POST /station-data/batch)
+    BATCH_MAX_ITEMS: int = 1000
+
+    # Cache de estaciones registradas (segundos para los TTL)
+    STATION_CACHE_SIZE: int = 10000
+    STATION_CACHE_TTL: float = 300.0
+    STATION_CACHE_NEGATIVE_TTL: float = 5.0
+
+    # Cache de respuestas con ETag (GET /station-data, /latest, /user-stations, /users/{id});
+    # el TTL acota cuánto tarda un worker en ver las escrituras de otro (0 = sin límite)
+    RESPONSE_CACHE_SIZE: int = 1000
+    RESPONSE_CACHE_TTL: float = 5.0
+
+    # Snapshot de la última lectura por estación (GET /stations/latest); una tarea de fondo
+    # lo refresca cada N segundos para incluir lo escrito por otros workers (0 = nunca)
+    LATEST_SNAPSHOT_REFRESH_SECONDS: float = 60.0
+
+    # Feed en vivo (GET /station-data/stream y /station-data/ws): broker "memory"
+    # (un solo worker) o "postgres" (LISTEN/NOTIFY entre workers), tamaño de la
+    # cola de cada suscriptor, lotes pendientes de enviar con pg_notify (postgres),
+    # segundos entre pings de la conexión del broker postgres (reconecta si falla)
+    # y segundos entre heartbeats de SSE
+    LIVE_BROKER: Literal["memory", "postgres"] = "memory"
+    LIVE_QUEUE_SIZE: int = 100
+    LIVE_OUTBOX_SIZE: int = 1000
+    LIVE_PING_SECONDS: float = 10.0
+    LIVE_HEARTBEAT_SECONDS: float = 15.0
+
+    # Particionado de station_data por rango de timestamp (solo PostgreSQL): "none",
+    # "monthly" o "weekly"; particiones creadas por adelantado y cada cuántos segundos se revisan
+    STATION_DATA_PARTITIONING: Literal["none", "monthly", "weekly"] = "none"
+    STATION_DATA_PARTITIONS_AHEAD: int = 3
+    PARTITION_MAINTENANCE_SECONDS: float = 21600.0
+
+    # Archivo frío en Parquet (app/archive.py): las lecturas con más de ARCHIVE_AFTER_DAYS días
+    # pasan de la DB a un archivo por estación y mes en ARCHIVE_DIR, cada ARCHIVE_INTERVAL_SECONDS;
+    # los listados, agregados, series y exports leen DB + archivo
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_DIR: str = "archive"
+    ARCHIVE_AFTER_DAYS: int = 365
+    ARCHIVE_INTERVAL_SECONDS: float = 86400.0
+    ARCHIVE_COMPRESSION: Literal["zstd", "snappy", "gzip", "none"] = "zstd"
+    ARCHIVE_ROW_GROUP_SIZE: int = 65536
+
+    # Réplicas de lectura (app/replicas.py): URLs separadas por comas para las rutas GET de
+    # consulta, repartidas por turnos; las escrituras siguen en DATABASE_URL. Segundos entre
+    # chequeos de salud (y para reintentar una réplica caída), retraso máximo de replicación
+    # en PostgreSQL (0 = sin límite) y segundos en que un cliente que escribió lee del primario
+    READ_DATABASE_URL: str = ""
+    READ_REPLICA_HEALTH_SECONDS: float = 10.0
+    READ_REPLICA_MAX_LAG_SECONDS: float = 0.0
+    READ_YOUR_WRITES_SECONDS: float = 0.0
+
+    # Reglas de alerta evaluadas en la ingesta: segundos entre recargas incrementales de las
+    # reglas (cambios hechos en otros workers) y alertas pendientes de guardar como máximo
+    ALERT_RULE_REFRESH_SECONDS: float = 30.0
+    ALERT_QUEUE_SIZE: int = 10000
+    # Con LIVE_BROKER=postgres evalúa las reglas un solo worker (lock de PostgreSQL);
+    # los demás intentan tomar el relevo cada ALERT_LEADER_POLL_SECONDS
+    ALERT_LEADER_POLL_SECONDS: float = 5.0
+
+    # Retención en segundo plano (DELETE /station-data/cleanup)
+    RETENTION_BATCH_SIZE: int = 5000
+    RETENTION_PAUSE_SECONDS: float = 0.5
+    RETENTION_STALE_SECONDS: float = 120.0
+
+    # Métricas de Prometheus (GET /metrics) y middleware de latencia por ruta
+    METRICS_ENABLED: bool = True
+
+    # Escritura diferida (write-behind) para POST /station-data y POST /
+    INGEST_WRITE_BEHIND: bool = False
+    INGEST_QUEUE_SIZE: int = 10000
+    INGEST_FLUSH_SIZE: int = 500
+    INGEST_FLUSH_INTERVAL: float = 1.0
+    # Reintentos de un lote que falla por la conexión (espera inicial que se duplica);
+    # con otros errores el lote se parte en mitades para aislar la fila que falla
+    INGEST_FLUSH_RETRIES: int = 3
+    INGEST_RETRY_BACKOFF: float = 0.5
+
     # Para desarrollo local usa .env, para producción usa variables de entorno
     model_config = ConfigDict(env_file=".env", extra="ignore")
 
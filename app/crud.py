@@ -1,12 +1,22 @@
+from sqlalchemy import select, insert, func, cast, literal_column, or_, tuple_, Float, Integer
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import models, schemas, archive
 from .security import hash_password
+from .cache import station_cache, token_cache
+from .snapshot import latest_snapshot
+from .live import live_broker
+from .metrics import observe_ingest
+from .response_cache import bump_station_data, bump_user_station
+from .device_keys import device_key_index, generate_key, hash_key
+from .alerts import alert_engine, evaluate_readings
 from datetime import datetime, timezone, timedelta
-from typing import List, Optional
+from typing import List, Optional, Union
 
 # User CRUD operations
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = hash_password(user.password) 
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: Optional[str] = None):
+    # Los endpoints pasan el hash ya calculado en el pool de hashing
+    if hashed_password is None:
+        hashed_password = hash_password(user.password) 
     
     db_user = models.User(
         email=user.email,
@@ -20,14 +30,26 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
+def update_user_password_hash(db: Session, user: models.User, hashed_password: str):
+    user.password = hashed_password
+    db.commit()
+    token_cache.invalidate_subject(user.email)
+    return user
+
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.user_id == user_id).first()
 
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    query = db.query(models.User).order_by(models.User.user_id)
+    if after_id is not None:
+        # Paginación por cursor: coste constante sin importar la profundidad
+        query = query.filter(models.User.user_id > after_id)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 # UserStation CRUD operations
 def create_user_station(db: Session, user_station: schemas.UserStationCreate):
@@ -45,20 +67,182 @@ def create_user_station(db: Session, user_station: schemas.UserStationCreate):
     
     db.commit()
     db.refresh(db_user_station)
+    if user_with_station:
+        # has_station cambió: las proyecciones cacheadas del usuario quedan obsoletas
+        token_cache.invalidate_subject(user_with_station.email)
+    bump_user_station(db_user_station.user_id)
+    station_cache.set(db_user_station.station_id, True)
     return db_user_station
 
 def get_user_station(db: Session, station_id: str):
     return db.query(models.UserStation).filter(models.UserStation.station_id == station_id).first()
 
-def get_user_stations_by_user(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.UserStation).filter(
-        models.UserStation.user_id == user_id
-    ).offset(skip).limit(limit).all()
+def station_exists(db: Session, station_id: str) -> bool:
+    """Comprueba si la estación existe, usando el cache de estaciones antes que la DB."""
+    exists = station_cache.get(station_id)
+    if exists is None:
+        exists = db.scalar(
+            select(models.UserStation.station_id).where(models.UserStation.station_id == station_id)
+        ) is not None
+        station_cache.set(station_id, exists)
+    return exists
+
+def prewarm_station_cache(db: Session) -> int:
+    """Carga en el cache las estaciones registradas (hasta STATION_CACHE_SIZE) antes de recibir lecturas."""
+    station_ids = db.scalars(select(models.UserStation.station_id).limit(station_cache.maxsize)).all()
+    for station_id in station_ids:
+        station_cache.set(station_id, True)
+    return len(station_ids)
+
+def split_cached_stations(station_ids):
+    """Separa los station_ids en (conocidos según el cache, pendientes de consultar)."""
+    known_stations = set()
+    pending = set()
+    for station_id in station_ids:
+        exists = station_cache.get(station_id)
+        if exists is None:
+            pending.add(station_id)
+        elif exists:
+            known_stations.add(station_id)
+    return known_stations, pending
+
+def cache_station_lookup(pending, found) -> None:
+    for station_id in pending:
+        station_cache.set(station_id, station_id in found)
+
+def get_known_stations(db: Session, station_ids) -> set:
+    """Devuelve el subconjunto de station_ids que existen (una sola consulta para los no cacheados)."""
+    known_stations, pending = split_cached_stations(station_ids)
+    if pending:
+        found = set(db.scalars(
+            select(models.UserStation.station_id).where(models.UserStation.station_id.in_(pending))
+        ))
+        cache_station_lookup(pending, found)
+        known_stations |= found
+    return known_stations
+
+def page_user_stations(query, skip: int = 0, limit: int = 100, after_station_id: Optional[str] = None):
+    query = query.order_by(models.UserStation.station_id)
+    if after_station_id is not None:
+        query = query.filter(models.UserStation.station_id > after_station_id)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+def get_user_stations_by_user(db: Session, user_id: int, skip: int = 0, limit: int = 100,
+                              after_station_id: Optional[str] = None):
+    query = db.query(models.UserStation).filter(models.UserStation.user_id == user_id)
+    return page_user_stations(query, skip, limit, after_station_id).all()
+
+def get_all_user_stations(db: Session, skip: int = 0, limit: int = 100,
+                          after_station_id: Optional[str] = None):
+    return page_user_stations(db.query(models.UserStation), skip, limit, after_station_id).all()
+
+# DeviceKey CRUD operations
+DEVICE_KEY_REFRESH_OVERLAP = timedelta(seconds=5)
+
+def create_device_key(db: Session, station_id: str, label: Optional[str] = None):
+    """Crea una clave para la estación. Devuelve (fila, clave en claro); la clave no se guarda."""
+    api_key = generate_key()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    db_key = models.DeviceKey(
+        key_hash=hash_key(api_key), station_id=station_id, label=label, created_at=now, updated_at=now
+    )
+    db.add(db_key)
+    db.commit()
+    db.refresh(db_key)
+    device_key_index.apply([db_key])
+    return db_key, api_key
+
+def get_device_keys(db: Session, station_id: str):
+    return db.query(models.DeviceKey).filter(models.DeviceKey.station_id == station_id).order_by(models.DeviceKey.key_id).all()
+
+def get_device_key(db: Session, station_id: str, key_id: int):
+    return db.query(models.DeviceKey).filter(
+        models.DeviceKey.station_id == station_id, models.DeviceKey.key_id == key_id
+    ).first()
+
+def revoke_device_key(db: Session, db_key: models.DeviceKey):
+    if db_key.revoked_at is None:
+        db_key.revoked_at = db_key.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        db.commit()
+        device_key_index.apply([db_key])
+    return db_key
+
+def device_key_changes_query():
+    """Claves creadas o revocadas desde la última carga del índice (todas en frío)."""
+    keys = models.DeviceKey
+    query = select(keys.key_hash, keys.station_id, keys.revoked_at, keys.updated_at)
+    if device_key_index.watermark is not None:
+        # Solape para no perder filas confirmadas tarde con un updated_at anterior
+        query = query.where(keys.updated_at >= device_key_index.watermark - DEVICE_KEY_REFRESH_OVERLAP)
+    return query
+
+def refresh_device_keys(db: Session) -> None:
+    """Aplica al índice las claves creadas o revocadas desde la última carga (todas en frío)."""
+    device_key_index.apply(db.execute(device_key_changes_query()).all())
 
-def get_all_user_stations(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.UserStation).offset(skip).limit(limit).all()
+def lookup_device_key(db: Session, api_key: str) -> Optional[str]:
+    """station_id asociado a la clave, o None si no es una clave de dispositivo activa."""
+    if device_key_index.is_stale():
+        refresh_device_keys(db)
+    return device_key_index.lookup(api_key)
+
+# AlertRule / Alert CRUD operations
+def create_alert_rule(db: Session, station_id: str, rule: schemas.AlertRuleCreate):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    db_rule = models.AlertRule(**rule.model_dump(), station_id=station_id, created_at=now, updated_at=now)
+    db.add(db_rule)
+    db.commit()
+    db.refresh(db_rule)
+    alert_engine.apply([db_rule])
+    return db_rule
+
+def get_alert_rules(db: Session, station_id: str):
+    return db.query(models.AlertRule).filter(
+        models.AlertRule.station_id == station_id, models.AlertRule.deleted_at.is_(None)
+    ).order_by(models.AlertRule.rule_id).all()
+
+def get_alert_rule(db: Session, station_id: str, rule_id: int):
+    return db.query(models.AlertRule).filter(
+        models.AlertRule.station_id == station_id, models.AlertRule.rule_id == rule_id
+    ).first()
+
+def delete_alert_rule(db: Session, db_rule: models.AlertRule):
+    # Borrado lógico: los demás workers ven el cambio por updated_at y las alertas conservan su regla
+    if db_rule.deleted_at is None:
+        db_rule.deleted_at = db_rule.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        db.commit()
+        alert_engine.apply([db_rule])
+    return db_rule
+
+def get_alerts(db: Session, station_id: str = None, rule_id: int = None,
+               start_time: datetime = None, end_time: datetime = None,
+               skip: int = 0, limit: int = 100, after: Optional[tuple] = None):
+    """Alertas de la más reciente a la más antigua; `after` es (triggered_at, alert_id) de la página anterior."""
+    alerts = models.Alert
+    query = db.query(alerts)
+    if station_id:
+        query = query.filter(alerts.station_id == station_id)
+    if rule_id is not None:
+        query = query.filter(alerts.rule_id == rule_id)
+    if start_time:
+        query = query.filter(alerts.triggered_at >= start_time)
+    if end_time:
+        query = query.filter(alerts.triggered_at <= end_time)
+    query = query.order_by(alerts.triggered_at.desc(), alerts.alert_id.desc())
+    if after is not None:
+        query = query.filter(tuple_(alerts.triggered_at, alerts.alert_id) < after)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 # StationData CRUD operations (NUEVA ESTRUCTURA)
+STATION_DATA_COLUMNS = (
+    "id", "station_id", "timestamp", "temperatura", "humedad", "presion",
+    "gas_detectado", "voltaje_mq135", "indice_uv", "nivel_uv",
+)
+
 def create_station_data(db: Session, data: schemas.StationDataCreate):
     db_obj = models.StationData(
         # Nuevos campos
@@ -75,13 +259,99 @@ def create_station_data(db: Session, data: schemas.StationDataCreate):
     db.add(db_obj)
     db.commit()
     db.refresh(db_obj)
+    notify_station_data_inserted([station_data_dict(db_obj)])
     return db_obj
 
-def get_station_data(db: Session, skip: int = 0, limit: int = 100, 
-                   station_id: str = None, start_time: datetime = None,
-                   end_time: datetime = None):
-    query = db.query(models.StationData)
-    
+def station_data_dict(obj) -> dict:
+    return {name: getattr(obj, name) for name in STATION_DATA_COLUMNS}
+
+def notify_station_data_inserted(readings: List[dict]) -> None:
+    """Se llama tras cada commit de lecturas nuevas (una o un lote)."""
+    latest_snapshot.update(readings)
+    observe_ingest(readings)
+    bump_station_data(reading["station_id"] for reading in readings)
+    live_broker.publish(readings)
+    evaluate_readings(readings)
+
+def partition_batch(items: List[Union[schemas.StationDataCreate, dict]], known_stations: set,
+                    device_station_id: Optional[str] = None):
+    """
+    Devuelve las filas a insertar y el resultado por item (rechaza estaciones
+    desconocidas y, con una clave de dispositivo, las de otras estaciones).
+    Los items pueden ser esquemas o filas ya validadas (cuerpo binario).
+    """
+    results = []
+    rows = []
+    for index, item in enumerate(items):
+        row = item if isinstance(item, dict) else item.model_dump()
+        station_id = row["station_id"]
+        if device_station_id is not None and station_id != device_station_id:
+            results.append(schemas.StationDataBatchItemResult(
+                index=index, station_id=station_id, accepted=False,
+                detail=f"Device key is not valid for station {station_id}"
+            ))
+        elif station_id in known_stations:
+            rows.append(row)
+            results.append(schemas.StationDataBatchItemResult(
+                index=index, station_id=station_id, accepted=True
+            ))
+        else:
+            results.append(schemas.StationDataBatchItemResult(
+                index=index, station_id=station_id, accepted=False,
+                detail=f"Station with ID {station_id} not found"
+            ))
+    return rows, results
+
+def row_station_id(item: Union[schemas.StationDataCreate, dict]) -> str:
+    return item["station_id"] if isinstance(item, dict) else item.station_id
+
+def batch_insert_statement():
+    return insert(models.StationData).returning(
+        models.StationData.id, models.StationData.timestamp, sort_by_parameter_order=True
+    )
+
+def batch_result(rows: list, results: list, inserted) -> schemas.StationDataBatchResult:
+    """Completa los resultados con el id asignado y notifica las lecturas insertadas."""
+    accepted_results = (result for result in results if result.accepted)
+    readings = []
+    for result, row, (data_id, timestamp) in zip(accepted_results, rows, inserted):
+        result.id = data_id
+        readings.append({**row, "id": data_id, "timestamp": timestamp})
+    if readings:
+        notify_station_data_inserted(readings)
+    return schemas.StationDataBatchResult(
+        accepted=len(rows),
+        rejected=len(results) - len(rows),
+        results=results
+    )
+
+def create_station_data_batch(db: Session, items: List[Union[schemas.StationDataCreate, dict]],
+                              device_station_id: Optional[str] = None):
+    """
+    Inserta un lote de lecturas con un único INSERT ... RETURNING.
+    Las estaciones se validan con una sola consulta (ninguna si la clave del
+    dispositivo ya identifica la estación); las lecturas de estaciones
+    desconocidas se rechazan y el resto se guarda en una transacción.
+    """
+    if device_station_id is not None:
+        known_stations = {device_station_id}
+    else:
+        known_stations = get_known_stations(db, {row_station_id(item) for item in items})
+    rows, results = partition_batch(items, known_stations, device_station_id)
+
+    inserted = []
+    if rows:
+        inserted = db.execute(batch_insert_statement(), rows).all()
+        db.commit()
+
+    return batch_result(rows, results, inserted)
+
+def filter_station_data(query, station_id: str = None, start_time: datetime = None,
+                        end_time: datetime = None, after: Optional[tuple] = None):
+    """
+    Aplica los filtros de listado de station_data (sirve para Query y select()).
+    `after` es la clave (timestamp, id) de la última fila de la página anterior.
+    """
     if station_id:
         query = query.filter(models.StationData.station_id == station_id)
     
@@ -90,22 +360,245 @@ def get_station_data(db: Session, skip: int = 0, limit: int = 100,
     
     if end_time:
         query = query.filter(models.StationData.timestamp <= end_time)
-    
-    return query.order_by(models.StationData.timestamp.desc()).offset(skip).limit(limit).all()
+
+    if after is not None:
+        # Equivale a (timestamp, id) < after, pero con una cota directa sobre
+        # timestamp para que PostgreSQL descarte particiones (con la tupla no lo hace)
+        after_timestamp, after_id = after
+        query = query.filter(
+            models.StationData.timestamp <= after_timestamp,
+            or_(models.StationData.timestamp < after_timestamp, models.StationData.id < after_id)
+        )
+    return query.order_by(models.StationData.timestamp.desc(), models.StationData.id.desc())
+
+def station_data_entities(as_tuples: bool = False) -> list:
+    """Objetos ORM, o solo las columnas como tuplas (sin identity map) para la serialización rápida."""
+    if as_tuples:
+        return [getattr(models.StationData, name) for name in STATION_DATA_COLUMNS]
+    return [models.StationData]
+
+def get_station_data(db: Session, skip: int = 0, limit: int = 100, 
+                   station_id: str = None, start_time: datetime = None,
+                   end_time: datetime = None, after: Optional[tuple] = None,
+                   as_tuples: bool = False):
+    query = filter_station_data(db.query(*station_data_entities(as_tuples)), station_id, start_time, end_time, after)
+    if after is None:
+        query = query.offset(skip)
+    rows = query.limit(limit).all()
+    if archive.is_enabled() and len(rows) < limit:
+        skip = archive_skip(skip, after, rows, lambda: db.scalar(count_station_data(station_id, start_time, end_time)))
+        rows += archive.read_station_data(station_id, start_time, end_time, after=after, skip=skip,
+                                          limit=limit - len(rows), as_tuples=as_tuples)
+    return rows
+
+def count_station_data(station_id: str = None, start_time: datetime = None, end_time: datetime = None):
+    return filter_station_data(
+        select(func.count()).select_from(models.StationData), station_id, start_time, end_time
+    ).order_by(None)
+
+def archive_skip(skip: int, after: Optional[tuple], rows: list, count_rows) -> int:
+    """
+    Filas a saltar en el archivo cuando la página de la DB no se llenó. El
+    archivo solo tiene lecturas más antiguas que la DB, así que la página
+    sigue en él; con `skip` y sin filas en la DB hay que descontar las de la DB.
+    """
+    if after is not None or rows or not skip:
+        return 0
+    return max(skip - count_rows(), 0)
+
+def stream_station_data(db: Session, station_id: str = None, start_time: datetime = None,
+                        end_time: datetime = None, batch_size: int = 1000):
+    """
+    Recorre las lecturas con un cursor del servidor (stream_results/yield_per),
+    devolviendo tuplas de columnas en bloques de batch_size filas.
+    La memoria usada no depende del tamaño del resultado.
+    """
+    columns = [getattr(models.StationData, name) for name in STATION_DATA_COLUMNS]
+    query = filter_station_data(select(*columns), station_id, start_time, end_time)
+    result = db.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+    for partition in result.partitions():
+        yield partition
+    if archive.is_enabled():
+        yield from archive.iter_station_data(station_id, start_time, end_time, batch_size=batch_size)
+
+def epoch_seconds_expression(dialect_name: str, column):
+    """Segundos epoch (float) de un timestamp, calculados en SQL según el motor."""
+    if dialect_name == "sqlite":
+        # julianday() tiene precisión de milisegundos: se redondea a ms
+        return func.round((func.julianday(column) - 2440587.5) * 86400000.0) / 1000.0
+    return cast(func.extract('epoch', column), Float)
+
+def get_station_data_columns(db: Session, station_id: str, metrics: List[str],
+                             start_time: datetime = None, end_time: datetime = None) -> list:
+    """
+    Tuplas (segundos epoch, *métricas) de una estación en orden cronológico.
+    Se leen del cursor del DBAPI sin crear Row ni objetos ORM, y sin
+    convertir cada timestamp a datetime en Python.
+    """
+    column = models.StationData.timestamp
+    epoch = epoch_seconds_expression(db.bind.dialect.name, column)
+    query = select(epoch, *(getattr(models.StationData, metric) for metric in metrics)).where(
+        models.StationData.station_id == station_id
+    )
+    if start_time:
+        query = query.where(column >= start_time)
+    if end_time:
+        query = query.where(column <= end_time)
+    result = db.connection().execute(query.order_by(column, models.StationData.id))
+    try:
+        return result.cursor.fetchall()
+    finally:
+        result.close()
+
+BUCKET_SECONDS = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+
+def bucket_epoch_expression(dialect_name: str, bucket_seconds: int):
+    """Inicio del bucket en segundos epoch, calculado en SQL según el motor."""
+    column = models.StationData.timestamp
+    # Literal (no parámetro) para que SELECT y GROUP BY sean la misma expresión
+    bucket_seconds = literal_column(str(int(bucket_seconds)))
+    if dialect_name == "sqlite":
+        # SQLite no tiene extract(epoch): strftime('%s') + división entera
+        epoch = cast(func.strftime('%s', column), Integer)
+        return (epoch // bucket_seconds) * bucket_seconds
+    epoch = func.extract('epoch', column)
+    return func.floor(epoch / bucket_seconds) * bucket_seconds
+
+def aggregate_station_data(db: Session, bucket: str, metrics: List[str],
+                           station_id: str = None, start_time: datetime = None,
+                           end_time: datetime = None):
+    """
+    Devuelve min/max/avg/count por intervalo de tiempo (GROUP BY en la DB),
+    en lugar de cargar todas las filas para promediarlas en el cliente.
+    """
+    bucket_start = bucket_epoch_expression(db.bind.dialect.name, BUCKET_SECONDS[bucket]).label("bucket_start")
+    columns = [bucket_start, func.count().label("count")]
+    for metric in metrics:
+        column = getattr(models.StationData, metric)
+        columns += [
+            func.min(column).label(f"{metric}_min"),
+            func.max(column).label(f"{metric}_max"),
+            func.avg(column).label(f"{metric}_avg"),
+            func.count(column).label(f"{metric}_count"),
+        ]
+
+    query = select(*columns)
+    if station_id:
+        query = query.where(models.StationData.station_id == station_id)
+    if start_time:
+        query = query.where(models.StationData.timestamp >= start_time)
+    if end_time:
+        query = query.where(models.StationData.timestamp <= end_time)
+    query = query.group_by(bucket_start).order_by(bucket_start)
+
+    summaries = {
+        int(row["bucket_start"]): (row["count"], {
+            metric: (row[f"{metric}_min"], row[f"{metric}_max"], row[f"{metric}_avg"], row[f"{metric}_count"])
+            for metric in metrics
+        })
+        for row in db.execute(query).mappings()
+    }
+    if archive.is_enabled():
+        # Solo el bucket del límite DB/archivo puede tener lecturas de los dos lados
+        for bucket_start, summary in archive.aggregate(
+            BUCKET_SECONDS[bucket], metrics, station_id, start_time, end_time
+        ).items():
+            summaries[bucket_start] = (
+                archive.combine_buckets(summaries[bucket_start], summary) if bucket_start in summaries else summary
+            )
+
+    return [
+        schemas.StationDataBucket(
+            bucket_start=datetime.fromtimestamp(bucket_start, tz=timezone.utc),
+            count=count,
+            metrics={
+                metric: schemas.MetricAggregate(min=summary[0], max=summary[1], avg=summary[2])
+                for metric, summary in metric_summaries.items()
+            }
+        )
+        for bucket_start, (count, metric_summaries) in sorted(summaries.items())
+    ]
 
 def get_station_data_by_id(db: Session, data_id: int):
     return db.query(models.StationData).filter(models.StationData.id == data_id).first()
 
-def get_latest_station_data(db: Session, station_id: str = None, limit: int = 10):
-    query = db.query(models.StationData)
+def get_latest_station_data(db: Session, station_id: str = None, limit: int = 10, as_tuples: bool = False):
+    query = db.query(*station_data_entities(as_tuples))
     
     if station_id:
         query = query.filter(models.StationData.station_id == station_id)
     
-    return query.order_by(models.StationData.timestamp.desc()).limit(limit).all()
+    rows = query.order_by(models.StationData.timestamp.desc()).limit(limit).all()
+    if archive.is_enabled() and len(rows) < limit:
+        rows += archive.read_station_data(station_id, limit=limit - len(rows), as_tuples=as_tuples)
+    return rows
 
-def delete_old_station_data(db: Session, days: int = 30):
-    cutoff_date = datetime.now(timezone.utc) - timedelta(days=days) 
-    result = db.query(models.StationData).filter(models.StationData.timestamp < cutoff_date).delete()
-    db.commit()
-    return result
\ No newline at end of file
+def get_latest_per_station(db: Session, station_ids: Optional[List[str]] = None) -> List[dict]:
+    """
+    Última lectura de cada estación en una sola consulta: DISTINCT ON en
+    PostgreSQL, ROW_NUMBER() como alternativa para SQLite y otros motores.
+    Las estaciones sin lecturas en la DB pero con archivo usan la última archivada.
+    """
+    columns = [getattr(models.StationData, name) for name in STATION_DATA_COLUMNS]
+    order = (models.StationData.timestamp.desc(), models.StationData.id.desc())
+
+    if db.bind.dialect.name == "postgresql":
+        query = select(*columns).distinct(models.StationData.station_id).order_by(
+            models.StationData.station_id, *order
+        )
+        if station_ids:
+            query = query.where(models.StationData.station_id.in_(station_ids))
+    else:
+        row_number = func.row_number().over(
+            partition_by=models.StationData.station_id, order_by=order
+        ).label("row_number")
+        ranked = select(*columns, row_number)
+        if station_ids:
+            ranked = ranked.where(models.StationData.station_id.in_(station_ids))
+        ranked = ranked.subquery()
+        query = select(*[ranked.c[name] for name in STATION_DATA_COLUMNS]).where(ranked.c.row_number == 1)
+
+    readings = [dict(row) for row in db.execute(query).mappings()]
+    if archive.is_enabled():
+        readings += archive.latest_per_station(station_ids, exclude={reading["station_id"] for reading in readings})
+    return readings
+
+def refresh_latest_snapshot(db: Session) -> None:
+    """Carga o refresca el snapshot (arranque y tarea de fondo del lifespan)."""
+    latest_snapshot.load(get_latest_per_station(db))
+
+def get_latest_snapshot(db: Session, station_ids: Optional[List[str]] = None) -> List[dict]:
+    """Lee el snapshot en memoria; solo consulta la DB si aún no se ha cargado."""
+    if latest_snapshot.is_cold():
+        refresh_latest_snapshot(db)
+    return latest_snapshot.get(station_ids)
+
+def get_hourly_rollups(db: Session, metrics: List[str], station_id: str = None,
+                       start_time: datetime = None, end_time: datetime = None,
+                       skip: int = 0, limit: int = 1000):
+    """Resúmenes horarios guardados por la retención antes de borrar las lecturas."""
+    hourly = models.StationDataHourly
+    query = select(hourly)
+    if station_id:
+        query = query.where(hourly.station_id == station_id)
+    if start_time:
+        query = query.where(hourly.bucket_start >= start_time)
+    if end_time:
+        query = query.where(hourly.bucket_start <= end_time)
+    query = query.order_by(hourly.bucket_start, hourly.station_id).offset(skip).limit(limit)
+
+    return [
+        schemas.StationDataBucket(
+            bucket_start=summary.bucket_start.replace(tzinfo=timezone.utc),
+            count=summary.readings,
+            metrics={
+                metric: schemas.MetricAggregate(
+                    min=getattr(summary, f"{metric}_min"),
+                    max=getattr(summary, f"{metric}_max"),
+                    avg=getattr(summary, f"{metric}_avg"),
+                )
+                for metric in metrics
+            }
+        )
+        for summary in db.scalars(query)
+    ]
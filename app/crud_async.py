@@ -0,0 +1,183 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.concurrency import run_in_threadpool
+from . import models, schemas, archive
+from .crud import (
+    split_cached_stations, cache_station_lookup, partition_batch, batch_insert_statement,
+    batch_result, row_station_id, page_user_stations, filter_station_data, station_data_dict, notify_station_data_inserted,
+    station_data_entities, count_station_data, archive_skip, device_key_changes_query
+)
+from .security import hash_password_async
+from .cache import station_cache, token_cache
+from .device_keys import device_key_index
+from .response_cache import bump_user_station
+from datetime import datetime
+from typing import List, Optional, Union
+
+# Versiones async de las operaciones de crud.py (DB_MODE=async)
+
+# User CRUD operations
+async def create_user(db: AsyncSession, user: schemas.UserCreate, hashed_password: Optional[str] = None):
+    # bcrypt es CPU intensivo: fuera del event loop, en el pool de hashing
+    if hashed_password is None:
+        hashed_password = await hash_password_async(user.password)
+
+    db_user = models.User(
+        email=user.email,
+        username=user.username,
+        password=hashed_password,
+        full_name=user.full_name,
+        has_station=False
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def update_user_password_hash(db: AsyncSession, user: models.User, hashed_password: str):
+    user.password = hashed_password
+    await db.commit()
+    token_cache.invalidate_subject(user.email)
+    return user
+
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.scalar(select(models.User).where(models.User.user_id == user_id))
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(models.User).where(models.User.email == email))
+
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    query = select(models.User).order_by(models.User.user_id)
+    if after_id is not None:
+        query = query.where(models.User.user_id > after_id)
+    else:
+        query = query.offset(skip)
+    result = await db.scalars(query.limit(limit))
+    return result.all()
+
+# UserStation CRUD operations
+async def create_user_station(db: AsyncSession, user_station: schemas.UserStationCreate):
+    db_user_station = models.UserStation(
+        station_id=user_station.station_id,
+        location=user_station.location,
+        user_id=user_station.user_id
+    )
+    db.add(db_user_station)
+
+    # Update the user's has_station flag
+    user_with_station = await get_user(db, user_station.user_id)
+    if user_with_station:
+        user_with_station.has_station = True
+
+    await db.commit()
+    await db.refresh(db_user_station)
+    if user_with_station:
+        # has_station cambió: las proyecciones cacheadas del usuario quedan obsoletas
+        token_cache.invalidate_subject(user_with_station.email)
+    bump_user_station(db_user_station.user_id)
+    station_cache.set(db_user_station.station_id, True)
+    return db_user_station
+
+async def get_user_station(db: AsyncSession, station_id: str):
+    return await db.scalar(select(models.UserStation).where(models.UserStation.station_id == station_id))
+
+async def station_exists(db: AsyncSession, station_id: str) -> bool:
+    exists = station_cache.get(station_id)
+    if exists is None:
+        exists = await db.scalar(
+            select(models.UserStation.station_id).where(models.UserStation.station_id == station_id)
+        ) is not None
+        station_cache.set(station_id, exists)
+    return exists
+
+async def get_known_stations(db: AsyncSession, station_ids) -> set:
+    known_stations, pending = split_cached_stations(station_ids)
+    if pending:
+        result = await db.scalars(
+            select(models.UserStation.station_id).where(models.UserStation.station_id.in_(pending))
+        )
+        found = set(result)
+        cache_station_lookup(pending, found)
+        known_stations |= found
+    return known_stations
+
+async def get_user_stations_by_user(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100,
+                                    after_station_id: Optional[str] = None):
+    query = select(models.UserStation).where(models.UserStation.user_id == user_id)
+    result = await db.scalars(page_user_stations(query, skip, limit, after_station_id))
+    return result.all()
+
+async def get_all_user_stations(db: AsyncSession, skip: int = 0, limit: int = 100,
+                                after_station_id: Optional[str] = None):
+    result = await db.scalars(page_user_stations(select(models.UserStation), skip, limit, after_station_id))
+    return result.all()
+
+# DeviceKey operations (la gestión de claves sigue en crud.py: solo la validación es async)
+async def refresh_device_keys(db: AsyncSession) -> None:
+    device_key_index.apply((await db.execute(device_key_changes_query())).all())
+
+async def lookup_device_key(db: AsyncSession, api_key: str) -> Optional[str]:
+    if device_key_index.is_stale():
+        await refresh_device_keys(db)
+    return device_key_index.lookup(api_key)
+
+# StationData CRUD operations
+async def create_station_data(db: AsyncSession, data: schemas.StationDataCreate):
+    db_obj = models.StationData(**data.model_dump())
+    db.add(db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
+    notify_station_data_inserted([station_data_dict(db_obj)])
+    return db_obj
+
+async def create_station_data_batch(db: AsyncSession, items: List[Union[schemas.StationDataCreate, dict]],
+                                    device_station_id: Optional[str] = None):
+    if device_station_id is not None:
+        known_stations = {device_station_id}
+    else:
+        known_stations = await get_known_stations(db, {row_station_id(item) for item in items})
+    rows, results = partition_batch(items, known_stations, device_station_id)
+
+    inserted = []
+    if rows:
+        result = await db.execute(batch_insert_statement(), rows)
+        inserted = result.all()
+        await db.commit()
+
+    return batch_result(rows, results, inserted)
+
+async def get_station_data(db: AsyncSession, skip: int = 0, limit: int = 100,
+                           station_id: str = None, start_time: datetime = None,
+                           end_time: datetime = None, after: Optional[tuple] = None,
+                           as_tuples: bool = False):
+    query = filter_station_data(select(*station_data_entities(as_tuples)), station_id, start_time, end_time, after)
+    if after is None:
+        query = query.offset(skip)
+    result = await db.execute(query.limit(limit))
+    rows = result.all() if as_tuples else result.scalars().all()
+    if archive.is_enabled() and len(rows) < limit:
+        db_count = await db.scalar(count_station_data(station_id, start_time, end_time)) if not rows and skip else 0
+        # Lectura de archivos: en el threadpool para no bloquear el event loop
+        rows += await run_in_threadpool(
+            archive.read_station_data, station_id, start_time, end_time, after=after,
+            skip=archive_skip(skip, after, rows, lambda: db_count), limit=limit - len(rows), as_tuples=as_tuples
+        )
+    return rows
+
+async def get_station_data_by_id(db: AsyncSession, data_id: int):
+    return await db.scalar(select(models.StationData).where(models.StationData.id == data_id))
+
+async def get_latest_station_data(db: AsyncSession, station_id: str = None, limit: int = 10,
+                                  as_tuples: bool = False):
+    query = select(*station_data_entities(as_tuples))
+
+    if station_id:
+        query = query.where(models.StationData.station_id == station_id)
+
+    result = await db.execute(query.order_by(models.StationData.timestamp.desc()).limit(limit))
+    rows = result.all() if as_tuples else result.scalars().all()
+    if archive.is_enabled() and len(rows) < limit:
+        rows += await run_in_threadpool(
+            archive.read_station_data, station_id, limit=limit - len(rows), as_tuples=as_tuples
+        )
+    return rows
@@ -1,35 +1,87 @@
+import logging
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+from .config import settings
+from .metrics import TimedQueuePool, TimedAsyncAdaptedQueuePool
 
-# Render usa URLs que comienzan con postgres://, pero SQLAlchemy necesita postgresql://
-if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+logger = logging.getLogger(__name__)
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
-    connect_args={
-        'sslmode': 'require' if 'render.com' in DATABASE_URL else 'prefer'
+def normalize_url(url: str) -> str:
+    # Render usa URLs que comienzan con postgres://, pero SQLAlchemy necesita postgresql://
+    if url and url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
+DATABASE_URL = normalize_url(os.getenv("DATABASE_URL"))
+
+def to_async_url(url: str) -> str:
+    """Convierte la URL síncrona en su equivalente async (asyncpg / aiosqlite)."""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+def pool_limits() -> dict:
+    """
+    pool_size/max_overflow de cada engine. Con DB_MAX_CONNECTIONS el límite se
+    reparte entre los workers (WEB_CONCURRENCY) y sus engines (sync y, con
+    DB_MODE=async, async), reservando la conexión LISTEN del broker postgres.
+    """
+    if settings.DB_MAX_CONNECTIONS <= 0:
+        return {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW}
+    per_worker = settings.DB_MAX_CONNECTIONS // max(1, settings.WEB_CONCURRENCY)
+    if settings.LIVE_BROKER == "postgres":
+        per_worker -= 1
+    per_engine = per_worker // (2 if settings.DB_MODE == "async" else 1)
+    if per_engine < 1:
+        logger.warning(
+            "DB_MAX_CONNECTIONS=%s is too low for %s workers; using one connection per engine",
+            settings.DB_MAX_CONNECTIONS, settings.WEB_CONCURRENCY
+        )
+        per_engine = 1
+    pool_size = min(settings.DB_POOL_SIZE, per_engine)
+    return {"pool_size": pool_size, "max_overflow": per_engine - pool_size}
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """Opciones de pool y conexión según el motor de base de datos."""
+    if url.startswith("sqlite"):
+        # SQLite (desarrollo y pruebas locales): sin SSL ni tamaño de pool
+        return {"connect_args": {"check_same_thread": False}}
+
+    ssl_mode = 'require' if 'render.com' in url else 'prefer'
+    return {
+        "pool_pre_ping": True,
+        # QueuePool que registra la espera de cada checkout (métricas del pool)
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        **pool_limits(),
+        # asyncpg usa 'ssl' en lugar de 'sslmode'
+        "connect_args": {'ssl': ssl_mode} if is_async else {'sslmode': ssl_mode},
     }
-)
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-# Función para eliminar y recrear tablas
-def recreate_tables():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    print("Tablas recreadas exitosamente")
+# Capa async opcional (DB_MODE=async)
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_MODE == "async":
+    ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
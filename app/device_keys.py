@@ -0,0 +1,67 @@
+import hashlib
+import secrets
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from .config import settings
+
+
+def generate_key() -> str:
+    """Clave nueva para un dispositivo (solo se muestra una vez al crearla)."""
+    return secrets.token_urlsafe(32)
+
+
+def hash_key(api_key: str) -> str:
+    # Las claves son aleatorias de 256 bits: basta un hash rápido, sin sal ni bcrypt
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class DeviceKeyIndex:
+    """
+    Índice en memoria hash de clave -> station_id de las claves de dispositivo activas.
+    Validar una clave es un lookup O(1) por su hash, sin comparar el secreto
+    carácter a carácter ni consultar la DB. Se carga entero al arrancar y
+    luego solo se leen las filas creadas o revocadas desde la última carga.
+    """
+
+    def __init__(self, refresh_seconds: float = 30.0):
+        self.refresh_seconds = refresh_seconds
+        self._stations: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self.watermark: Optional[datetime] = None  # updated_at más reciente aplicado
+
+    def is_stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        return self.refresh_seconds > 0 and time.monotonic() - self._loaded_at > self.refresh_seconds
+
+    def apply(self, rows: Iterable) -> None:
+        """Aplica filas (key_hash, station_id, revoked_at, updated_at) nuevas o modificadas."""
+        with self._lock:
+            for row in rows:
+                if row.revoked_at is None:
+                    self._stations[row.key_hash] = row.station_id
+                else:
+                    self._stations.pop(row.key_hash, None)
+                if self.watermark is None or row.updated_at > self.watermark:
+                    self.watermark = row.updated_at
+            self._loaded_at = time.monotonic()
+
+    def lookup(self, api_key: str) -> Optional[str]:
+        return self._stations.get(hash_key(api_key))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._stations = {}
+            self._loaded_at = None
+            self.watermark = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"active_keys": len(self._stations), "watermark": self.watermark}
+
+
+device_key_index = DeviceKeyIndex(refresh_seconds=settings.DEVICE_KEY_REFRESH_SECONDS)
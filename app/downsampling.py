@@ -0,0 +1,99 @@
+"""
+Reducción de series temporales para gráficas (GET /station-data/series) con
+Largest-Triangle-Three-Buckets (LTTB, Steinarsson 2013).
+
+LTTB conserva la forma visual de la serie (picos y valles) con un número
+fijo de puntos: divide la serie en buckets y en cada uno elige el punto que
+forma el triángulo de mayor área con el punto elegido en el bucket anterior
+y la media del bucket siguiente. El bucle recorre buckets (tantos como
+puntos pedidos), no filas: el trabajo por bucket se hace con NumPy.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import orjson
+
+from .serialization import ORJSON_OPTIONS
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Índices de los `points` puntos elegidos por LTTB (todos si la serie ya es más corta)."""
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    # points - 2 buckets sobre los puntos interiores; el primero y el último se conservan siempre
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    # Sumas acumuladas: la media de cualquier bucket en O(1)
+    sum_x = np.concatenate(([0.0], np.cumsum(x)))
+    sum_y = np.concatenate(([0.0], np.cumsum(y)))
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket < points - 3:
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+            count = next_end - next_start
+            avg_x = (sum_x[next_end] - sum_x[next_start]) / count
+            avg_y = (sum_y[next_end] - sum_y[next_start]) / count
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        # Doble del área del triángulo (a, candidato, media del bucket siguiente)
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[bucket + 1] = a
+    return selected
+
+
+def columns_to_arrays(rows: Sequence[tuple], metrics: List[str]):
+    """Filas (segundos epoch, *métricas) -> array de tiempos y un array float por métrica (NULL = NaN)."""
+    if not rows:
+        return np.array([], dtype=np.float64), {metric: np.array([], dtype=np.float64) for metric in metrics}
+    columns = list(zip(*rows))
+    epochs = np.array(columns[0], dtype=np.float64)
+    values = {metric: np.array(column, dtype=np.float64) for metric, column in zip(metrics, columns[1:])}
+    return epochs, values
+
+
+def concat_arrays(*parts) -> tuple:
+    """Une varios (tiempos, {métrica: valores}) de columns_to_arrays, en el orden dado."""
+    epochs = np.concatenate([part[0] for part in parts])
+    values = {metric: np.concatenate([part[1][metric] for part in parts]) for metric in parts[0][1]}
+    return epochs, values
+
+
+def to_datetime64(epochs: np.ndarray) -> np.ndarray:
+    return np.round(epochs * 1e6).astype(np.int64).astype("datetime64[us]")
+
+
+def downsample(epochs: np.ndarray, values: Dict[str, np.ndarray], points: int) -> Dict[str, dict]:
+    """Serie reducida por métrica; cada métrica descarta sus propios NULL antes de reducir."""
+    # Segundos desde la primera lectura: magnitudes pequeñas para el cálculo de áreas
+    x = epochs - epochs[0] if len(epochs) else epochs
+    series = {}
+    for metric, y in values.items():
+        present = ~np.isnan(y)
+        metric_x, metric_y = x[present], y[present]
+        indices = lttb_indices(metric_x, metric_y, points)
+        # Solo los puntos elegidos se convierten a fechas
+        series[metric] = {"timestamps": to_datetime64(epochs[present][indices]), "values": metric_y[indices]}
+    return series
+
+
+def encode_series(station_id: str, start_time: Optional[datetime], end_time: Optional[datetime],
+                  points: int, rows: int, series: Dict[str, dict]) -> bytes:
+    """JSON de schemas.StationDataSeries codificado con orjson directamente desde los arrays."""
+    return orjson.dumps({
+        "station_id": station_id,
+        "start_time": start_time,
+        "end_time": end_time,
+        "points": points,
+        "rows": rows,
+        "series": series,
+    }, option=ORJSON_OPTIONS | orjson.OPT_SERIALIZE_NUMPY)
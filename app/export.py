@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional
+
+from . import crud
+from .database import SessionLocal
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _csv_chunks(partitions: Iterable) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(crud.STATION_DATA_COLUMNS)
+    for rows in partitions:
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row]
+            for row in rows
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_chunks(partitions: Iterable) -> Iterator[str]:
+    columns = crud.STATION_DATA_COLUMNS
+    for rows in partitions:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=datetime.isoformat) + "\n"
+            for row in rows
+        )
+
+
+def _gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    # wbits=31 -> formato gzip (cabecera + CRC), comprimido de forma incremental
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_station_data(fmt: str, station_id: Optional[str] = None, start_time: Optional[datetime] = None,
+                        end_time: Optional[datetime] = None, compress: bool = False,
+                        batch_size: int = 1000, open_session: Callable = SessionLocal) -> Iterator[bytes]:
+    """
+    Genera el export en CSV o NDJSON por bloques. Abre su propia sesión (con
+    `open_session`, p. ej. en una réplica) porque el StreamingResponse se sigue
+    enviando después de cerrar la de get_db.
+    """
+    db = open_session()
+    try:
+        partitions = crud.stream_station_data(
+            db, station_id=station_id, start_time=start_time, end_time=end_time, batch_size=batch_size
+        )
+        chunks = _csv_chunks(partitions) if fmt == "csv" else _ndjson_chunks(partitions)
+        encoded = (chunk.encode("utf-8") for chunk in chunks if chunk)
+        yield from (_gzip(encoded) if compress else encoded)
+    finally:
+        db.close()
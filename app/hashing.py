@@ -0,0 +1,34 @@
+"""
+Funciones de hashing de contraseñas que se ejecutan en el pool de procesos.
+Solo dependen de passlib para que los procesos hijos arranquen rápido y
+puedan serializarse (pickle) sin importar el resto de la aplicación.
+"""
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+
+@lru_cache(maxsize=None)
+def crypt_context(rounds: int) -> CryptContext:
+    # min/max = rounds: cualquier hash con otro coste se marca para actualizar
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+def hash_password(password: str, rounds: int) -> str:
+    return crypt_context(rounds).hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str, rounds: int) -> bool:
+    return crypt_context(rounds).verify(plain_password, hashed_password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    """Verifica y, si el hash usa otro coste, devuelve el nuevo hash para guardarlo."""
+    return crypt_context(rounds).verify_and_update(plain_password, hashed_password)
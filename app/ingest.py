@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import exc
+
+from . import crud, schemas
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Errores de conexión o de bloqueo: el mismo lote puede entrar al reintentar
+TRANSIENT_ERRORS = (exc.OperationalError, exc.InterfaceError, exc.TimeoutError)
+
+
+class IngestBuffer:
+    """
+    Buffer de escritura diferida (write-behind) para lecturas de estaciones.
+    Los endpoints encolan la lectura ya validada (esquema, o fila si llegó en
+    el formato binario) y responden 202; un worker
+    asyncio la escribe en bloque cuando se alcanza flush_size lecturas o
+    cuando pasa flush_interval segundos desde la primera lectura del lote.
+    Los clientes ya recibieron 202: un lote que falla por la conexión se
+    reintenta con espera exponencial y, si falla por sus datos, se parte en
+    mitades hasta aislar las filas que no entran.
+    """
+
+    def __init__(self, max_queue: int = 10000, flush_size: int = 500, flush_interval: float = 1.0,
+                 flush_retries: int = 3, retry_backoff: float = 0.5):
+        self.max_queue = max_queue
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.flush_retries = flush_retries
+        self.retry_backoff = retry_backoff
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.enqueued = 0
+        self.rejected_full = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.rejected_rows = 0
+        self.failed_rows = 0
+        self.retries = 0
+        self.splits = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._closing = False
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Deja de aceptar lecturas y espera a que el worker vacíe la cola."""
+        if not self.running:
+            return
+        self._closing = True
+        await self._worker
+        self._worker = None
+
+    def submit(self, payload: schemas.StationDataCreate) -> bool:
+        """Encola una lectura. Devuelve False si la cola está llena o cerrándose."""
+        if not self.running or self._closing:
+            self.rejected_full += 1
+            return False
+        try:
+            self._queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.rejected_full += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def submit_many(self, payloads: List[dict]) -> bool:
+        """Encola todas las filas o ninguna (False si no caben en la cola)."""
+        if not self.running or self._closing or self.max_queue - self._queue.qsize() < len(payloads):
+            self.rejected_full += len(payloads)
+            return False
+        for payload in payloads:
+            self._queue.put_nowait(payload)
+        self.enqueued += len(payloads)
+        return True
+
+    async def _run(self) -> None:
+        while not (self._closing and self._queue.empty()):
+            batch = await self._collect()
+            if batch:
+                await self._flush(batch)
+
+    async def _collect(self) -> List[schemas.StationDataCreate]:
+        loop = asyncio.get_running_loop()
+        batch = []
+        deadline = None
+        while len(batch) < self.flush_size:
+            timeout = self.flush_interval if deadline is None else deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                if batch or self._closing:
+                    break
+                continue
+            batch.append(item)
+            if deadline is None:
+                deadline = loop.time() + self.flush_interval
+        return batch
+
+    async def _flush(self, batch: List[schemas.StationDataCreate]) -> None:
+        started = time.perf_counter()
+        await self._write_resilient(batch)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+    async def _write_resilient(self, batch: List[schemas.StationDataCreate]) -> None:
+        delay = self.retry_backoff
+        attempt = 0
+        while True:
+            try:
+                result = await asyncio.to_thread(self._write, batch)
+            except TRANSIENT_ERRORS as e:
+                if attempt >= self.flush_retries:
+                    self.failed_rows += len(batch)
+                    logger.exception("Error flushing %d buffered station readings after %d retries", len(batch), attempt)
+                    return
+                attempt += 1
+                self.retries += 1
+                logger.warning("Flushing %d buffered station readings failed, retrying in %.1fs: %s", len(batch), delay, e)
+                await asyncio.sleep(delay)
+                delay *= 2
+                continue
+            except Exception:
+                if len(batch) == 1:
+                    self.failed_rows += 1
+                    logger.exception("Error flushing buffered reading of station %s", _station_id(batch[0]))
+                    return
+                # Una fila mala no debe tumbar el lote: bisección hasta aislarla
+                self.splits += 1
+                middle = len(batch) // 2
+                await self._write_resilient(batch[:middle])
+                await self._write_resilient(batch[middle:])
+                return
+            self.flushed_rows += result.accepted
+            self.rejected_rows += result.rejected
+            return
+
+    @staticmethod
+    def _write(batch: List[schemas.StationDataCreate]) -> schemas.StationDataBatchResult:
+        db = SessionLocal()
+        try:
+            return crud.create_station_data_batch(db, batch)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "enqueued": self.enqueued,
+            "rejected_full": self.rejected_full,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "rejected_rows": self.rejected_rows,
+            "failed_rows": self.failed_rows,
+            "retries": self.retries,
+            "splits": self.splits,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+            "avg_flush_ms": self._total_flush_ms / self.flushes if self.flushes else 0.0,
+        }
+
+
+ingest_buffer = IngestBuffer(
+    max_queue=settings.INGEST_QUEUE_SIZE,
+    flush_size=settings.INGEST_FLUSH_SIZE,
+    flush_interval=settings.INGEST_FLUSH_INTERVAL,
+    flush_retries=settings.INGEST_FLUSH_RETRIES,
+    retry_backoff=settings.INGEST_RETRY_BACKOFF,
+)
+
+
+def _station_id(item) -> str:
+    return item["station_id"] if isinstance(item, dict) else item.station_id
+
+
+def _queue_full():
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Ingest queue is full, retry later",
+        headers={"Retry-After": str(max(1, int(settings.INGEST_FLUSH_INTERVAL)))}
+    )
+
+
+def enqueue_station_data(payload: schemas.StationDataCreate):
+    """Encola la lectura y responde 202, o 429 si la cola está llena."""
+    if not ingest_buffer.submit(payload):
+        raise _queue_full()
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"detail": "Reading queued", "station_id": payload.station_id}
+    )
+
+
+def enqueue_station_data_batch(rows: List[dict]):
+    """Encola las filas de un cuerpo binario (una estación) y responde 202, o 429."""
+    if not ingest_buffer.submit_many(rows):
+        raise _queue_full()
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"detail": "Readings queued", "station_id": rows[0]["station_id"], "queued": len(rows)}
+    )
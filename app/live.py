@@ -0,0 +1,387 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "station_data_live"
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_reading(reading: dict) -> str:
+    return json.dumps(reading, default=_json_default)
+
+
+def decode_reading(data: str) -> dict:
+    """Inversa de encode_reading para las lecturas de station_data (timestamp como datetime)."""
+    reading = json.loads(data)
+    reading["timestamp"] = datetime.fromisoformat(reading["timestamp"])
+    return reading
+
+
+class Subscription:
+    """
+    Cola acotada de un suscriptor (SSE o WebSocket). Si el cliente no lee a
+    tiempo se descartan las lecturas más antiguas: la cola nunca bloquea ni
+    hace crecer la memoria de la ruta de ingesta.
+    """
+
+    def __init__(self, station_ids: Optional[Iterable[str]], maxsize: int):
+        self.station_ids = frozenset(station_ids) if station_ids else None
+        self._items = deque(maxlen=maxsize)
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, data: str) -> None:
+        if len(self._items) == self._items.maxlen:
+            self.dropped += 1
+        self._items.append(data)
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Siguiente lectura (JSON), o None si pasa `timeout` o la suscripción se cierra."""
+        while not self._items:
+            if self.closed:
+                return None
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._items.popleft()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        data = await self.get()
+        if data is None:
+            raise StopAsyncIteration
+        return data
+
+
+class LiveBroker:
+    """
+    Pub/sub de lecturas nuevas hacia los suscriptores de este worker.
+    publish() se llama desde la ruta de ingesta (hilos del threadpool o el
+    event loop) y solo programa el reparto en el loop; el reparto por
+    station_id se hace en el hilo del loop, sin locks.
+    Las subclases cambian cómo llegan los eventos a cada worker.
+    """
+
+    # Un broker compartido publica aunque este worker no tenga suscriptores
+    shares_events = False
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._by_station: Dict[str, Set[Subscription]] = {}
+        self._all_stations: Set[Subscription] = set()
+        self.published = 0
+        self.delivered = 0
+        self._dropped_closed = 0  # descartes de suscripciones ya cerradas
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    @property
+    def connected(self) -> bool:
+        return self.running
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self) -> None:
+        self._loop = None
+        for subscription in self._subscriptions():
+            subscription.close()
+        self._by_station.clear()
+        self._all_stations.clear()
+
+    def subscribe(self, station_ids: Optional[List[str]] = None) -> Subscription:
+        subscription = Subscription(station_ids, self.queue_size)
+        if subscription.station_ids is None:
+            self._all_stations.add(subscription)
+        else:
+            for station_id in subscription.station_ids:
+                self._by_station.setdefault(station_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.close()
+        registered = subscription in self._all_stations
+        self._all_stations.discard(subscription)
+        for station_id in subscription.station_ids or ():
+            subscribers = self._by_station.get(station_id)
+            if subscribers is not None and subscription in subscribers:
+                registered = True
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_station[station_id]
+        if registered:
+            self._dropped_closed += subscription.dropped
+
+    def publish(self, readings: List[dict]) -> None:
+        """Publica lecturas recién guardadas. Sin loop (scripts, tests) no hace nada."""
+        loop = self._loop
+        if loop is None or not (self._by_station or self._all_stations or self.shares_events):
+            return
+        # Se serializa una vez por lectura, en el hilo que publica
+        events = [(reading["station_id"], encode_reading(reading)) for reading in readings]
+        self.published += len(events)
+        try:
+            loop.call_soon_threadsafe(self._deliver, events)
+        except RuntimeError:
+            # El loop ya se cerró (apagado)
+            pass
+
+    def _deliver(self, events) -> None:
+        self._fan_out(events)
+
+    def _fan_out(self, events) -> None:
+        for station_id, data in events:
+            for subscription in self._by_station.get(station_id, ()):
+                subscription.put(data)
+                self.delivered += 1
+            for subscription in self._all_stations:
+                subscription.put(data)
+                self.delivered += 1
+
+    def _subscriptions(self) -> Set[Subscription]:
+        subscriptions = set(self._all_stations)
+        for subscribers in self._by_station.values():
+            subscriptions |= subscribers
+        return subscriptions
+
+    def stats(self) -> dict:
+        subscriptions = self._subscriptions()
+        return {
+            "broker": type(self).__name__,
+            "running": self.running,
+            "connected": self.connected,
+            "subscribers": len(subscriptions),
+            "stations": len(self._by_station),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self._dropped_closed + sum(subscription.dropped for subscription in subscriptions),
+        }
+
+
+class InMemoryBroker(LiveBroker):
+    """Reparto dentro del proceso: cada worker solo ve las lecturas que él mismo guarda."""
+
+
+class PostgresBroker(LiveBroker):
+    """
+    Comparte los eventos entre workers con LISTEN/NOTIFY de PostgreSQL (asyncpg).
+    Cada worker envía sus lecturas con pg_notify y reparte las que recibe del
+    canal, incluidas las propias, a sus suscriptores locales.
+    Un supervisor vigila la conexión (aviso de cierre de asyncpg y un ping cada
+    ping_seconds) y, si se pierde, reconecta con espera exponencial y vuelve a
+    escuchar el canal; los advisory locks de la conexión perdida se liberan y
+    se avisa a add_disconnect_listener (AlertLeader vuelve a competir).
+    """
+
+    shares_events = True
+
+    def __init__(self, dsn: str, connect_args: Optional[dict] = None, queue_size: int = 100,
+                 outbox_size: int = 1000, channel: str = NOTIFY_CHANNEL, ping_seconds: float = 10.0,
+                 max_backoff_seconds: float = 30.0):
+        super().__init__(queue_size=queue_size)
+        self.dsn = dsn
+        self.connect_args = connect_args or {}
+        self.channel = channel
+        self.outbox_size = outbox_size
+        self.outbox_dropped = 0  # lecturas no enviadas por tener la cola de salida llena
+        self.ping_seconds = ping_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+        self._connection = None
+        self._connection_lock: Optional[asyncio.Lock] = None
+        self._connected: Optional[asyncio.Event] = None
+        self._lost: Optional[asyncio.Event] = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self._sender: Optional[asyncio.Task] = None
+        self._supervisor: Optional[asyncio.Task] = None
+        self._readers: List[Callable[[List[dict]], None]] = []
+        self._disconnect_listeners: List[Callable[[], None]] = []
+
+    @property
+    def connected(self) -> bool:
+        return self._connected is not None and self._connected.is_set()
+
+    async def start(self) -> None:
+        # asyncpg no admite dos operaciones a la vez en la misma conexión
+        self._connection_lock = asyncio.Lock()
+        self._connected = asyncio.Event()
+        self._lost = asyncio.Event()
+        await self._connect()
+        self._outbox = asyncio.Queue(maxsize=self.outbox_size)
+        self._sender = asyncio.create_task(self._send())
+        self._supervisor = asyncio.create_task(self._supervise())
+        await super().start()
+
+    async def stop(self) -> None:
+        await super().stop()
+        for task in (self._supervisor, self._sender):
+            if task is not None:
+                task.cancel()
+        self._supervisor = self._sender = None
+        if self._connected is not None:
+            self._connected.clear()
+        await self._close()
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        connection = await asyncpg.connect(self.dsn, **self.connect_args)
+        try:
+            await connection.add_listener(self.channel, self._on_notify)
+        except Exception:
+            await connection.close()
+            raise
+        connection.add_termination_listener(self._on_terminate)
+        self._connection = connection
+        self._lost.clear()
+        self._connected.set()
+
+    async def _close(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is not None and not connection.is_closed():
+            try:
+                await connection.close(timeout=5)
+            except Exception:
+                connection.terminate()
+
+    def _on_terminate(self, connection) -> None:
+        if connection is self._connection:
+            self._lost.set()
+
+    async def _supervise(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._lost.wait(), self.ping_seconds)
+            except asyncio.TimeoutError:
+                try:
+                    async with self._connection_lock:
+                        await self._connection.fetchval("SELECT 1", timeout=self.ping_seconds)
+                    continue
+                except Exception as e:
+                    self.last_error = str(e)
+            await self._reconnect()
+
+    async def _reconnect(self) -> None:
+        self._connected.clear()
+        logger.warning("Live broker connection lost (%s); reconnecting", self.last_error or "closed")
+        await self._close()
+        for listener in self._disconnect_listeners:
+            try:
+                listener()
+            except Exception:
+                logger.exception("Live broker disconnect listener failed")
+        delay = 0.5
+        while True:
+            try:
+                await self._connect()
+            except Exception as e:
+                self.last_error = str(e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_backoff_seconds)
+                continue
+            self.reconnects += 1
+            logger.info("Live broker reconnected")
+            return
+
+    def add_reader(self, callback: Callable[[List[dict]], None]) -> None:
+        """Recibe (en el hilo del loop) las lecturas de todos los workers, ya decodificadas."""
+        self._readers.append(callback)
+
+    def add_disconnect_listener(self, callback: Callable[[], None]) -> None:
+        """Se llama (en el hilo del loop) al perder la conexión: sus advisory locks ya no valen."""
+        self._disconnect_listeners.append(callback)
+
+    async def try_advisory_lock(self, key: int) -> bool:
+        """pg_try_advisory_lock en la conexión del broker: se mantiene mientras la conexión viva."""
+        if not self.connected:
+            return False
+        async with self._connection_lock:
+            return await self._connection.fetchval("SELECT pg_try_advisory_lock($1)", key)
+
+    def _deliver(self, events) -> None:
+        # Si PostgreSQL no da abasto se descartan lotes, como en Subscription, en vez de crecer sin límite
+        try:
+            self._outbox.put_nowait(events)
+        except asyncio.QueueFull:
+            self.outbox_dropped += len(events)
+
+    async def _send(self) -> None:
+        while True:
+            events = await self._outbox.get()
+            # Sin conexión los lotes esperan en la cola (acotada) hasta que el supervisor reconecte
+            await self._connected.wait()
+            try:
+                # Una notificación por lectura: el payload de NOTIFY admite < 8000 bytes
+                async with self._connection_lock:
+                    await self._connection.executemany(
+                        "SELECT pg_notify($1, $2)",
+                        [(self.channel, f"{station_id} {data}") for station_id, data in events],
+                    )
+            except Exception as e:
+                logger.exception("Error publishing %d live readings", len(events))
+                if self._connection is None or self._connection.is_closed():
+                    self.last_error = str(e)
+                    self._lost.set()
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        station_id, _, data = payload.partition(" ")
+        self._fan_out([(station_id, data)])
+        if self._readers:
+            readings = [decode_reading(data)]
+            for reader in self._readers:
+                try:
+                    reader(readings)
+                except Exception:
+                    logger.exception("Live reader failed")
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+            "outbox_queued": self._outbox.qsize() if self._outbox is not None else 0,
+            "outbox_dropped": self.outbox_dropped,
+        }
+
+
+def create_broker() -> LiveBroker:
+    if settings.LIVE_BROKER == "postgres":
+        from .database import DATABASE_URL, engine_options
+
+        return PostgresBroker(
+            DATABASE_URL,
+            connect_args=engine_options(DATABASE_URL, is_async=True)["connect_args"],
+            queue_size=settings.LIVE_QUEUE_SIZE,
+            outbox_size=settings.LIVE_OUTBOX_SIZE,
+            ping_seconds=settings.LIVE_PING_SECONDS,
+        )
+    return InMemoryBroker(queue_size=settings.LIVE_QUEUE_SIZE)
+
+
+live_broker = create_broker()
@@ -1,29 +1,250 @@
-import os
-from fastapi import FastAPI, Depends, HTTPException, Query, status, Header
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
 from datetime import datetime, timedelta, timezone
-from pydantic import BaseModel
 
-from . import models, schemas, crud
-from .database import SessionLocal, engine, get_db, recreate_tables
+from . import schemas, crud, async_api, export, retention, downsampling, partitions, archive
+from .database import SessionLocal, engine, async_engine, get_db
+from .migrations import setup_schema
 from .config import settings
-from .security import create_access_token, verify_password, verify_api_key
+from .cache import station_cache, token_cache
+from .device_keys import device_key_index
+from .alerts import alert_engine, alert_leader, alert_worker, prime_rules, refresh_rules
+from .replicas import ReadYourWritesMiddleware, get_read_db, read_router, wrote_recently
+from .live import live_broker
+from .snapshot import latest_snapshot
+from .metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, pool_status, register_engines, render as render_metrics
+from .response_cache import (
+    response_cache, station_data_scopes, user_scope, USER_STATIONS,
+    STATION_DATA_LIST, USER_STATION_LIST, USER
+)
+from .serialization import encode_station_data
+from .ingest import ingest_buffer, enqueue_station_data, enqueue_station_data_batch
+from .payloads import INGEST_OPENAPI, is_binary, decode_readings, read_json_reading
+from .retention import retention_runner
+from .pagination import decode_cursor, set_next_cursor, NEXT_CURSOR_HEADER
+from .security import (
+    create_access_token, verify_api_key, check_device_station, get_current_user, hash_password_async,
+    verify_and_update_password_async, shutdown_password_executor, USER_TOKEN_TYPE
+)
+
+logger = logging.getLogger(__name__)
+
+async def _maintain_partitions():
+    """Crea por adelantado las particiones futuras de station_data mientras la app está arriba"""
+    while True:
+        await asyncio.sleep(settings.PARTITION_MAINTENANCE_SECONDS)
+        try:
+            await run_in_threadpool(partitions.maintain, engine)
+        except Exception:
+            logger.exception("Partition maintenance failed")
+
+async def _archive_periodically():
+    """Mueve al archivo Parquet las lecturas antiguas (el primer pase, al arrancar)"""
+    while True:
+        try:
+            await run_in_threadpool(archive.run)
+        except Exception:
+            logger.exception("Archiving station data failed")
+        await asyncio.sleep(settings.ARCHIVE_INTERVAL_SECONDS)
+
+async def _resume_retention_periodically():
+    """Reanuda los trabajos de retención abandonados (worker caído o detenido)"""
+    while True:
+        await asyncio.sleep(settings.RETENTION_STALE_SECONDS)
+        try:
+            await run_in_threadpool(retention_runner.resume_interrupted)
+        except Exception:
+            logger.exception("Resuming retention jobs failed")
+
+def _refresh_latest_snapshot():
+    db = SessionLocal()
+    try:
+        crud.refresh_latest_snapshot(db)
+    finally:
+        db.close()
+
+async def _refresh_snapshot_periodically():
+    """Refresca el snapshot de /stations/latest fuera de las peticiones (lecturas de otros workers)"""
+    while True:
+        await asyncio.sleep(settings.LATEST_SNAPSHOT_REFRESH_SECONDS)
+        try:
+            await run_in_threadpool(_refresh_latest_snapshot)
+        except Exception:
+            logger.exception("Refreshing the latest-reading snapshot failed")
+
+def _load_device_keys():
+    db = SessionLocal()
+    try:
+        crud.refresh_device_keys(db)
+    finally:
+        db.close()
+
+async def _check_replicas_periodically():
+    """Chequeo de salud de las réplicas de lectura"""
+    while True:
+        await asyncio.sleep(settings.READ_REPLICA_HEALTH_SECONDS)
+        try:
+            await run_in_threadpool(read_router.check)
+        except Exception:
+            logger.exception("Read replica health check failed")
+
+def _load_alert_rules():
+    db = SessionLocal()
+    try:
+        refresh_rules(db, alert_engine)
+        if not alert_leader.enabled:
+            # Estado de las reglas desde las últimas lecturas: sin repetir alertas tras un reinicio
+            prime_rules(db, alert_engine)
+    finally:
+        db.close()
 
-# Verificar si debemos recrear las tablas (solo en desarrollo)
-if os.getenv("RECREATE_TABLES", "False").lower() == "true":
-    recreate_tables()
-else:
-    # Solo crear tablas si no existen
-    models.Base.metadata.create_all(bind=engine)
+def _fill_pool(target) -> int:
+    """Abre a la vez tantas conexiones como pool_size y las devuelve al pool"""
+    opened = []
+    try:
+        for _ in range(target.pool.size()):
+            conn = target.connect()
+            opened.append(conn)
+            conn.exec_driver_sql("SELECT 1")
+    finally:
+        for conn in opened:
+            conn.close()
+    return len(opened)
+
+async def _fill_async_pool(target) -> int:
+    opened = []
+    try:
+        for _ in range(target.sync_engine.pool.size()):
+            conn = await target.connect()
+            opened.append(conn)
+            await conn.exec_driver_sql("SELECT 1")
+    finally:
+        for conn in opened:
+            await conn.close()
+    return len(opened)
+
+def _prewarm_caches() -> dict:
+    db = SessionLocal()
+    try:
+        return {
+            "stations": crud.prewarm_station_cache(db),
+            "latest_snapshot": len(crud.get_latest_snapshot(db)),
+        }
+    finally:
+        db.close()
+
+async def _prewarm() -> dict:
+    """Llena los pools y carga los caches para que las primeras peticiones no paguen el arranque en frío"""
+    started = time.perf_counter()
+    connections = {"sync": await run_in_threadpool(_fill_pool, engine)}
+    if async_engine is not None:
+        connections["async"] = await _fill_async_pool(async_engine)
+    for replica in read_router.replicas:
+        if not replica.healthy:
+            continue
+        try:
+            connections[replica.name] = await run_in_threadpool(_fill_pool, replica.engine)
+        except Exception as e:
+            # Una réplica caída no bloquea el arranque: sus lecturas van al primario
+            read_router.mark_failed(replica, str(e))
+    caches = await run_in_threadpool(_prewarm_caches)
+    return {"connections": connections, "caches": caches, "seconds": time.perf_counter() - started}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    app.state.stopping = False
+    app.state.prewarm = None
+    # Migraciones (o RECREATE_TABLES) una sola vez, con un lock entre workers
+    await run_in_threadpool(setup_schema)
+    await live_broker.start()
+    if settings.INGEST_WRITE_BEHIND:
+        await ingest_buffer.start()
+    # Cargar el índice de claves de dispositivo antes de aceptar lecturas
+    await run_in_threadpool(_load_device_keys)
+    # Reglas de alerta evaluadas en la ingesta y el hilo que guarda las alertas
+    await run_in_threadpool(_load_alert_rules)
+    alert_worker.start()
+    if live_broker.shares_events:
+        # Snapshot de /stations/latest al día con las lecturas de todos los workers
+        live_broker.add_reader(latest_snapshot.update)
+    if alert_leader.enabled:
+        # Con LIVE_BROKER=postgres las evalúa un solo worker, con las lecturas del canal
+        await alert_leader.start(live_broker)
+    # Reanudar un trabajo de retención interrumpido (al arrancar y luego periódicamente)
+    await run_in_threadpool(retention_runner.resume_interrupted)
+    retention_task = asyncio.create_task(_resume_retention_periodically())
+    snapshot_task = None
+    if settings.LATEST_SNAPSHOT_REFRESH_SECONDS > 0:
+        snapshot_task = asyncio.create_task(_refresh_snapshot_periodically())
+    partition_task = None
+    if settings.STATION_DATA_PARTITIONING != "none":
+        await run_in_threadpool(partitions.maintain, engine)
+        partition_task = asyncio.create_task(_maintain_partitions())
+    archive_task = asyncio.create_task(_archive_periodically()) if settings.ARCHIVE_ENABLED else None
+    replica_task = None
+    if read_router.replicas:
+        await run_in_threadpool(read_router.check)
+        replica_task = asyncio.create_task(_check_replicas_periodically())
+    if settings.PREWARM_ON_STARTUP:
+        try:
+            app.state.prewarm = await _prewarm()
+            app.state.ready = True
+        except Exception:
+            logger.exception("Prewarming failed; GET /health/ready retries it")
+    else:
+        app.state.ready = True
+    yield
+    # Deja de anunciarse como listo mientras termina lo pendiente
+    app.state.ready = False
+    app.state.stopping = True
+    if replica_task is not None:
+        replica_task.cancel()
+    if partition_task is not None:
+        partition_task.cancel()
+    if archive_task is not None:
+        archive_task.cancel()
+    if snapshot_task is not None:
+        snapshot_task.cancel()
+    retention_task.cancel()
+    # Esperan a hilos y procesos: fuera del event loop para no bloquear lo que aún se atiende
+    await run_in_threadpool(retention_runner.stop)
+    await run_in_threadpool(shutdown_password_executor)
+    # Vaciar la cola de escritura diferida antes de apagar
+    await ingest_buffer.stop()
+    # Guardar las alertas disparadas por las últimas lecturas
+    await alert_leader.stop()
+    await run_in_threadpool(alert_worker.stop)
+    # Cierra las suscripciones abiertas (SSE/WebSocket) para poder apagar
+    await live_broker.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
+    await read_router.dispose()
 
 app = FastAPI(
     title="ESP32 Sensor API",
     description="API para recibir datos de sensores desde dispositivos ESP32",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Métricas: latencia por ruta, consultas SQL por petición y estado del pool
+if settings.METRICS_ENABLED:
+    register_engines({
+        "sync": engine,
+        **({"async": async_engine} if async_engine is not None else {}),
+        **read_router.engines(),
+    })
+    app.add_middleware(MetricsMiddleware)
+
 # CORS middleware
 origins = settings.CORS_ORIGINS.split(",") if settings.CORS_ORIGINS else []
 app.add_middleware(
@@ -32,8 +253,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Read-your-writes: tras escribir, el cliente lee del primario durante READ_YOUR_WRITES_SECONDS
+if read_router.replicas and settings.READ_YOUR_WRITES_SECONDS > 0:
+    app.add_middleware(ReadYourWritesMiddleware, window_seconds=settings.READ_YOUR_WRITES_SECONDS)
+
+# Con DB_MODE=async las rutas async se registran primero y atienden las mismas URLs
+if settings.DB_MODE == "async":
+    app.include_router(async_api.router)
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -42,59 +272,71 @@ def get_db():
     finally:
         db.close()
 
-# Esquema para login de usuarios
-class UserLogin(BaseModel):
-    email: str
-    password: str
-
 ## User endpoints
 @app.post("/users", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
+async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(crud.get_user_by_email, db, email=user.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    return crud.create_user(db=db, user=user)
+    # bcrypt en el pool de hashing, sin ocupar el event loop ni el threadpool
+    hashed_password = await hash_password_async(user.password)
+    return await run_in_threadpool(crud.create_user, db=db, user=user, hashed_password=hashed_password)
 
 @app.get("/users", response_model=List[schemas.User])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = crud.get_users(db, skip=skip, limit=limit)
+def read_users(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header (replaces skip)"),
+    db: Session = Depends(get_read_db)
+):
+    after = decode_cursor(cursor, int)
+    users = crud.get_users(db, skip=skip, limit=limit, after_id=after[0] if after else None)
+    set_next_cursor(response, users, limit, key=lambda user: (user.user_id,))
     return users
 
 @app.get("/users/{user_id}", response_model=schemas.User)
-def read_user(user_id: int, db: Session = Depends(get_db)):
+def read_user(user_id: int, request: Request, db: Session = Depends(get_read_db)):
+    cached = response_cache.lookup(request, (user_scope(user_id),))
+    if cached.response is not None:
+        return cached.response
     db_user = crud.get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    return db_user
+    return cached.store(USER, db_user)
 
 ## Nuevo endpoint para autenticación de usuarios
 @app.post("/auth/login")
-def user_login(credentials: UserLogin, db: Session = Depends(get_db)):
+async def user_login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
     # Buscar usuario por email
-    user = crud.get_user_by_email(db, email=credentials.email)
+    user = await run_in_threadpool(crud.get_user_by_email, db, email=credentials.email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciales inválidas"
         )
     
-    # Verificar contraseña
-    if not verify_password(credentials.password, user.password):
+    # Verificar contraseña (en el pool de hashing)
+    valid, new_hash = await verify_and_update_password_async(credentials.password, user.password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciales inválidas"
         )
+    if new_hash:
+        # El coste de bcrypt cambió: guardar el hash actualizado
+        await run_in_threadpool(crud.update_user_password_hash, db, user, new_hash)
     
     # Crear token JWT
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email, "typ": USER_TOKEN_TYPE}, expires_delta=access_token_expires
     )
     
     return {
@@ -105,6 +347,11 @@ def user_login(credentials: UserLogin, db: Session = Depends(get_db)):
         "full_name": user.full_name
     }
 
+@app.get("/auth/me", response_model=schemas.User)
+def read_current_user(current_user: schemas.User = Depends(get_current_user)):
+    """Usuario del token Bearer (servido desde el cache de tokens verificados)."""
+    return current_user
+
 ## UserStation endpoints
 @app.post("/user-stations", response_model=schemas.UserStation, status_code=status.HTTP_201_CREATED)
 def create_user_station(
@@ -131,17 +378,32 @@ def create_user_station(
 
 @app.get("/user-stations", response_model=List[schemas.UserStation])
 def read_user_stations(
-    skip: int = 0, 
-    limit: int = 100, 
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
     user_id: Optional[int] = Query(None, description="Filter by user ID"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header (replaces skip)"),
+    db: Session = Depends(get_read_db)
 ):
+    cached = response_cache.lookup(request, (USER_STATIONS,))
+    if cached.response is not None:
+        return cached.response
+    after = decode_cursor(cursor, str)
+    after_station_id = after[0] if after else None
     if user_id:
-        return crud.get_user_stations_by_user(db, user_id=user_id, skip=skip, limit=limit)
-    return crud.get_all_user_stations(db, skip=skip, limit=limit)
+        stations = crud.get_user_stations_by_user(
+            db, user_id=user_id, skip=skip, limit=limit, after_station_id=after_station_id
+        )
+    else:
+        stations = crud.get_all_user_stations(
+            db, skip=skip, limit=limit, after_station_id=after_station_id
+        )
+    set_next_cursor(response, stations, limit, key=lambda station: (station.station_id,))
+    return cached.store(USER_STATION_LIST, stations, response)
 
 @app.get("/user-stations/{station_id}", response_model=schemas.UserStation)
-def read_user_station(station_id: str, db: Session = Depends(get_db)):
+def read_user_station(station_id: str, db: Session = Depends(get_read_db)):
     db_station = crud.get_user_station(db, station_id=station_id)
     if db_station is None:
         raise HTTPException(
@@ -150,51 +412,392 @@ def read_user_station(station_id: str, db: Session = Depends(get_db)):
         )
     return db_station
 
-## StationData endpoints
-@app.post("/station-data", response_model=schemas.StationData, status_code=status.HTTP_201_CREATED)
-def create_station_data(
-    payload: schemas.StationDataCreate, 
+@app.get("/stations/latest", response_model=List[schemas.StationData])
+def read_latest_per_station(
+    station_id: Optional[List[str]] = Query(None, description="Station IDs to include (all stations if omitted)"),
+    db: Session = Depends(get_db)
+):
+    """Última lectura de cada estación, servida desde el snapshot en memoria"""
+    return crud.get_latest_snapshot(db, station_ids=station_id)
+
+## DeviceKey endpoints (solo el dueño de la estación)
+def _get_owned_station(db: Session, station_id: str, current_user: schemas.User):
+    db_station = crud.get_user_station(db, station_id=station_id)
+    if db_station is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Station not found"
+        )
+    if db_station.user_id != current_user.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Station belongs to another user"
+        )
+    return db_station
+
+@app.post("/user-stations/{station_id}/keys", response_model=schemas.DeviceKeyCreated, status_code=status.HTTP_201_CREATED)
+def create_device_key(
+    station_id: str,
+    payload: schemas.DeviceKeyCreate,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Crea una API key para el dispositivo; la clave solo se devuelve en esta respuesta."""
+    _get_owned_station(db, station_id, current_user)
+    db_key, api_key = crud.create_device_key(db, station_id=station_id, label=payload.label)
+    return schemas.DeviceKeyCreated(**schemas.DeviceKey.model_validate(db_key).model_dump(), api_key=api_key)
+
+@app.get("/user-stations/{station_id}/keys", response_model=List[schemas.DeviceKey])
+def read_device_keys(
+    station_id: str,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    _get_owned_station(db, station_id, current_user)
+    return crud.get_device_keys(db, station_id=station_id)
+
+@app.delete("/user-stations/{station_id}/keys/{key_id}", response_model=schemas.DeviceKey)
+def revoke_device_key(
+    station_id: str,
+    key_id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    _get_owned_station(db, station_id, current_user)
+    db_key = crud.get_device_key(db, station_id=station_id, key_id=key_id)
+    if db_key is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Device key not found"
+        )
+    return crud.revoke_device_key(db, db_key)
+
+## AlertRule endpoints (solo el dueño de la estación)
+@app.post("/user-stations/{station_id}/alert-rules", response_model=schemas.AlertRule, status_code=status.HTTP_201_CREATED)
+def create_alert_rule(
+    station_id: str,
+    rule: schemas.AlertRuleCreate,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Crea una regla; se evalúa desde la siguiente lectura de la estación."""
+    _get_owned_station(db, station_id, current_user)
+    return crud.create_alert_rule(db, station_id=station_id, rule=rule)
+
+@app.get("/user-stations/{station_id}/alert-rules", response_model=List[schemas.AlertRule])
+def read_alert_rules(
+    station_id: str,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    _get_owned_station(db, station_id, current_user)
+    return crud.get_alert_rules(db, station_id=station_id)
+
+@app.delete("/user-stations/{station_id}/alert-rules/{rule_id}", response_model=schemas.AlertRule)
+def delete_alert_rule(
+    station_id: str,
+    rule_id: int,
     db: Session = Depends(get_db),
-    authorization: str = Depends(verify_api_key)
+    current_user: schemas.User = Depends(get_current_user)
 ):
+    _get_owned_station(db, station_id, current_user)
+    db_rule = crud.get_alert_rule(db, station_id=station_id, rule_id=rule_id)
+    if db_rule is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Alert rule not found"
+        )
+    return crud.delete_alert_rule(db, db_rule)
+
+@app.get("/user-stations/{station_id}/alerts", response_model=List[schemas.Alert])
+def read_alerts(
+    station_id: str,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    rule_id: Optional[int] = Query(None, description="Filter by alert rule"),
+    start_time: Optional[datetime] = Query(None, description="Start time filter"),
+    end_time: Optional[datetime] = Query(None, description="End time filter"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header (replaces skip)"),
+    db: Session = Depends(get_read_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Alertas disparadas, de la más reciente a la más antigua."""
+    _get_owned_station(db, station_id, current_user)
+    after = decode_cursor(cursor, datetime.fromisoformat, int)
+    alerts = crud.get_alerts(db, station_id=station_id, rule_id=rule_id, start_time=start_time,
+                             end_time=end_time, skip=skip, limit=limit, after=after)
+    set_next_cursor(response, alerts, limit, key=lambda alert: (alert.triggered_at, alert.alert_id))
+    return alerts
+
+## StationData endpoints
+def _check_station(db: Session, station_id: str, device_station_id: Optional[str] = None):
+    # Con clave de dispositivo la estación ya está validada: sin consulta de existencia
+    if device_station_id is None and not crud.station_exists(db, station_id=station_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Station with ID {station_id} not found"
+        )
+
+def _store_station_data(db: Session, payload: schemas.StationDataCreate, device_station_id: Optional[str] = None):
+    _check_station(db, payload.station_id, device_station_id)
     try:
-        db_station = crud.get_user_station(db, station_id=payload.station_id)
-        if not db_station:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Station with ID {payload.station_id} not found"
-            )
-            
-        obj = crud.create_station_data(db, payload)
-        return obj
+        return crud.create_station_data(db, payload)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error storing station data: {str(e)}"
         )
 
+def _check_batch_size(count: int):
+    if count > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds the maximum of {settings.BATCH_MAX_ITEMS} items"
+        )
+
+def _store_station_data_batch(db: Session, payload: List[schemas.StationDataCreate],
+                              device_station_id: Optional[str] = None):
+    try:
+        return crud.create_station_data_batch(db, payload, device_station_id)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error storing station data batch: {str(e)}"
+        )
+
+async def _ingest(request: Request, db: Session, device_station_id: Optional[str]):
+    """Cuerpo JSON (una lectura) o binario (varias lecturas de una estación, ver payloads.py)."""
+    if is_binary(request):
+        readings = decode_readings(await request.body())
+        check_device_station(device_station_id, readings[0]["station_id"])
+        _check_batch_size(len(readings))
+        if settings.INGEST_WRITE_BEHIND:
+            # Mismo 404 que la escritura directa: no aceptar (202) lecturas que se descartarían al volcar
+            await run_in_threadpool(_check_station, db, readings[0]["station_id"], device_station_id)
+            return enqueue_station_data_batch(readings)
+        return await run_in_threadpool(_store_station_data_batch, db, readings, device_station_id)
+
+    payload = await read_json_reading(request)
+    check_device_station(device_station_id, payload.station_id)
+    if settings.INGEST_WRITE_BEHIND:
+        await run_in_threadpool(_check_station, db, payload.station_id, device_station_id)
+        return enqueue_station_data(payload)
+    return await run_in_threadpool(_store_station_data, db, payload, device_station_id)
+
+@app.post(
+    "/station-data",
+    response_model=Union[schemas.StationData, schemas.StationDataBatchResult],
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=INGEST_OPENAPI,
+)
+async def create_station_data(
+    request: Request,
+    db: Session = Depends(get_db),
+    device_station_id: Optional[str] = Depends(verify_api_key)
+):
+    return await _ingest(request, db, device_station_id)
+
+@app.post("/station-data/batch", response_model=schemas.StationDataBatchResult, status_code=status.HTTP_201_CREATED)
+def create_station_data_batch(
+    payload: List[schemas.StationDataCreate],
+    db: Session = Depends(get_db),
+    device_station_id: Optional[str] = Depends(verify_api_key)
+):
+    """
+    Guarda varias lecturas (de una o varias estaciones) en una sola transacción.
+    Con una clave de dispositivo solo se aceptan las lecturas de su estación.
+    """
+    _check_batch_size(len(payload))
+    return _store_station_data_batch(db, payload, device_station_id)
+
 @app.get("/station-data", response_model=List[schemas.StationData])
 def read_station_data(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     station_id: Optional[str] = Query(None, description="Filter by station ID (hexadecimal)"),
     start_time: Optional[datetime] = Query(None, description="Start time filter"),
     end_time: Optional[datetime] = Query(None, description="End time filter"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header (replaces skip)"),
+    layout: schemas.StationDataLayout = Query("model", description="model (default), or rows/columns: column tuples encoded with orjson, no per-row validation"),
+    db: Session = Depends(get_read_db)
 ):
-    return crud.get_station_data(db, skip=skip, limit=limit, station_id=station_id, 
-                               start_time=start_time, end_time=end_time)
+    cached = response_cache.lookup(request, station_data_scopes(station_id))
+    if cached.response is not None:
+        return cached.response
+    after = decode_cursor(cursor, datetime.fromisoformat, int)
+    data = crud.get_station_data(db, skip=skip, limit=limit, station_id=station_id,
+                                 start_time=start_time, end_time=end_time, after=after,
+                                 as_tuples=layout != "model")
+    set_next_cursor(response, data, limit, key=lambda row: (row.timestamp, row.id))
+    if layout != "model":
+        return cached.store_encoded(encode_station_data(layout, data), response)
+    return cached.store(STATION_DATA_LIST, data, response)
 
 @app.get("/station-data/latest", response_model=List[schemas.StationData])
 def read_latest_station_data(
+    request: Request,
     station_id: Optional[str] = Query(None, description="Specific station ID (hexadecimal)"),
     limit: int = Query(10, ge=1, le=1000, description="Number of records to return"),
-    db: Session = Depends(get_db)
+    layout: schemas.StationDataLayout = Query("model", description="model (default), or rows/columns: column tuples encoded with orjson, no per-row validation"),
+    db: Session = Depends(get_read_db)
+):
+    cached = response_cache.lookup(request, station_data_scopes(station_id))
+    if cached.response is not None:
+        return cached.response
+    data = crud.get_latest_station_data(db, station_id=station_id, limit=limit, as_tuples=layout != "model")
+    if layout != "model":
+        return cached.store_encoded(encode_station_data(layout, data))
+    return cached.store(STATION_DATA_LIST, data)
+
+@app.get("/station-data/aggregate", response_model=schemas.StationDataAggregate)
+def aggregate_station_data(
+    station_id: Optional[str] = Query(None, description="Filter by station ID (hexadecimal)"),
+    start_time: Optional[datetime] = Query(None, description="Start time filter"),
+    end_time: Optional[datetime] = Query(None, description="End time filter"),
+    bucket: schemas.AggregateBucket = Query("1h", description="Bucket size: 1m, 5m, 1h or 1d"),
+    metrics: List[schemas.AggregateMetric] = Query(
+        ["temperatura", "humedad", "presion", "indice_uv"], description="Metrics to aggregate"
+    ),
+    db: Session = Depends(get_read_db)
+):
+    """Agregados min/max/avg/count por intervalo, calculados con GROUP BY en la base de datos"""
+    buckets = crud.aggregate_station_data(
+        db, bucket=bucket, metrics=list(dict.fromkeys(metrics)), station_id=station_id,
+        start_time=start_time, end_time=end_time
+    )
+    return schemas.StationDataAggregate(
+        station_id=station_id, bucket=bucket, start_time=start_time,
+        end_time=end_time, buckets=buckets
+    )
+
+@app.get("/station-data/series", response_model=schemas.StationDataSeries)
+def read_station_data_series(
+    request: Request,
+    station_id: str = Query(..., pattern="^[0-9a-fA-F]+$", description="Station ID (hexadecimal)"),
+    start_time: Optional[datetime] = Query(None, description="Start time filter"),
+    end_time: Optional[datetime] = Query(None, description="End time filter"),
+    metrics: List[schemas.AggregateMetric] = Query(
+        ["temperatura", "humedad", "presion", "indice_uv"], description="Metrics to include"
+    ),
+    points: int = Query(1000, ge=3, le=10000, description="Target points per metric (about the chart width in pixels)"),
+    db: Session = Depends(get_read_db)
+):
+    """Serie por métrica reducida con LTTB a `points` puntos: la respuesta escala con el ancho de la gráfica, no con las filas"""
+    cached = response_cache.lookup(request, station_data_scopes(station_id))
+    if cached.response is not None:
+        return cached.response
+    metrics = list(dict.fromkeys(metrics))
+    rows = crud.get_station_data_columns(db, station_id, metrics, start_time=start_time, end_time=end_time)
+    epochs, values = downsampling.columns_to_arrays(rows, metrics)
+    if archive.is_enabled():
+        # Lo archivado es anterior a lo que queda en la DB: va delante
+        epochs, values = downsampling.concat_arrays(
+            archive.read_series(station_id, metrics, start_time, end_time), (epochs, values)
+        )
+    series = downsampling.downsample(epochs, values, points)
+    return cached.store_encoded(
+        downsampling.encode_series(station_id, start_time, end_time, points, len(epochs), series)
+    )
+
+@app.get("/station-data/export")
+def export_station_data(
+    request: Request,
+    export_format: Literal["csv", "ndjson"] = Query("csv", alias="format", description="Export format: csv or ndjson"),
+    station_id: Optional[str] = Query(None, description="Filter by station ID (hexadecimal)"),
+    start_time: Optional[datetime] = Query(None, description="Start time filter"),
+    end_time: Optional[datetime] = Query(None, description="End time filter"),
+):
+    """Exporta el historial en streaming (memoria constante); gzip si el cliente lo acepta"""
+    compress = "gzip" in request.headers.get("accept-encoding", "").lower()
+    headers = {"Content-Disposition": f'attachment; filename="station-data.{export_format}"'}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export.export_station_data(
+            export_format, station_id=station_id, start_time=start_time, end_time=end_time, compress=compress,
+            open_session=lambda: read_router.session(prefer_primary=wrote_recently(request))
+        ),
+        media_type=export.EXPORT_MEDIA_TYPES[export_format],
+        headers=headers
+    )
+
+@app.get("/station-data/stream")
+async def stream_live_station_data(
+    station_id: Optional[List[str]] = Query(None, description="Station IDs to follow (all stations if omitted)")
+):
+    """Server-Sent Events con cada lectura nueva de las estaciones pedidas, en vez de sondear /latest"""
+    subscription = live_broker.subscribe(station_id)
+
+    async def events():
+        try:
+            while not subscription.closed:
+                dropped = subscription.dropped
+                data = await subscription.get(timeout=settings.LIVE_HEARTBEAT_SECONDS)
+                if subscription.dropped > dropped:
+                    # Cliente lento: se le avisa de las lecturas descartadas
+                    yield f"event: dropped\ndata: {subscription.dropped - dropped}\n\n"
+                if data is None:
+                    # Heartbeat: mantiene viva la conexión y detecta clientes desconectados
+                    yield ": ping\n\n"
+                else:
+                    yield f"event: reading\ndata: {data}\n\n"
+        finally:
+            live_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/station-data/ws")
+async def websocket_live_station_data(
+    websocket: WebSocket,
+    station_id: Optional[List[str]] = Query(None)
 ):
-    return crud.get_latest_station_data(db, station_id=station_id, limit=limit)
+    """Equivalente WebSocket de /station-data/stream: un mensaje JSON por lectura"""
+    await websocket.accept()
+    subscription = live_broker.subscribe(station_id)
+
+    async def wait_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+        subscription.close()
+
+    receiver = asyncio.create_task(wait_disconnect())
+    try:
+        async for data in subscription:
+            await websocket.send_text(data)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        live_broker.unsubscribe(subscription)
+
+@app.get("/station-data/rollups", response_model=List[schemas.StationDataBucket])
+def read_station_data_rollups(
+    station_id: Optional[str] = Query(None, description="Filter by station ID (hexadecimal)"),
+    start_time: Optional[datetime] = Query(None, description="Start time filter"),
+    end_time: Optional[datetime] = Query(None, description="End time filter"),
+    metrics: List[schemas.AggregateMetric] = Query(
+        ["temperatura", "humedad", "presion", "indice_uv"], description="Metrics to include"
+    ),
+    skip: int = 0,
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_read_db)
+):
+    """Resúmenes horarios de las lecturas ya eliminadas por la retención"""
+    return crud.get_hourly_rollups(
+        db, metrics=list(dict.fromkeys(metrics)), station_id=station_id,
+        start_time=start_time, end_time=end_time, skip=skip, limit=limit
+    )
 
 @app.get("/station-data/{data_id}", response_model=schemas.StationData)
-def read_station_data_id(data_id: int, db: Session = Depends(get_db)):
+def read_station_data_id(data_id: int, db: Session = Depends(get_read_db)):
     obj = crud.get_station_data_by_id(db, data_id)
     if not obj:
         raise HTTPException(
@@ -203,13 +806,36 @@ def read_station_data_id(data_id: int, db: Session = Depends(get_db)):
         )
     return obj
 
-@app.delete("/station-data/cleanup")
+@app.delete("/station-data/cleanup", response_model=schemas.RetentionJob, status_code=status.HTTP_202_ACCEPTED)
 def cleanup_old_station_data(
     days: int = Query(30, ge=1, description="Delete data older than this many days"),
+    rollup: bool = Query(True, description="Write hourly min/max/avg rollups before deleting"),
+    batch_size: Optional[int] = Query(None, ge=100, le=100000, description="Rows per delete batch (by id range)"),
     db: Session = Depends(get_db)
 ):
-    deleted_count = crud.delete_old_station_data(db, days)
-    return {"detail": f"Deleted {deleted_count} old records"}
+    """Lanza la retención como trabajo en segundo plano (lotes por rango de ids); ver su progreso en GET /station-data/cleanup/{job_id}"""
+    if archive.is_enabled():
+        # No borrar lecturas que aún no se han archivado: el cutoff del trabajo refleja el efectivo
+        days = max(days, settings.ARCHIVE_AFTER_DAYS)
+    active_job = retention.get_active_job(db)
+    if active_job is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Retention job {active_job.job_id} is already {active_job.status}"
+        )
+    job = retention.create_job(db, days=days, rollup=rollup, batch_size=batch_size)
+    retention_runner.start(job.job_id)
+    return job
+
+@app.get("/station-data/cleanup/{job_id}", response_model=schemas.RetentionJob)
+def read_cleanup_job(job_id: int, db: Session = Depends(get_db)):
+    job = retention.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Retention job {job_id} not found"
+        )
+    return job
 
 ## Authentication endpoints
 @app.post("/token")
@@ -220,38 +846,125 @@ def create_token(device_id: str):
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+## Cache endpoints
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "station_registry": station_cache.stats(),
+        "verified_tokens": token_cache.stats(),
+        "device_keys": device_key_index.stats(),
+        "responses": response_cache.stats(),
+    }
+
+## Ingest endpoints
+@app.get("/ingest/stats")
+def ingest_stats():
+    return ingest_buffer.stats()
+
+## Alert endpoints
+@app.get("/alerts/stats")
+def alerts_stats():
+    """Reglas cargadas en este worker, evaluaciones, alertas pendientes y si este worker evalúa"""
+    return {"engine": alert_engine.stats(), "worker": alert_worker.stats(), "evaluation": alert_leader.stats()}
+
+## Archive endpoints
+@app.get("/archive/stats")
+def archive_stats():
+    """Archivos Parquet del archivo frío: estaciones, filas, bytes y meses cubiertos"""
+    return archive.stats()
+
+## Live feed endpoints
+@app.get("/live/stats")
+async def live_stats():
+    # En el event loop: los conjuntos de suscriptores solo se modifican en ese hilo
+    return live_broker.stats()
+
 ## Health check endpoint
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "timestamp": datetime.now(timezone.utc)}
 
+@app.get("/health/ready")
+async def readiness_check(response: Response):
+    """
+    Readiness para despliegues escalonados: 200 con el esquema al día y los pools
+    y caches precalentados; 503 si el precalentado falló (se reintenta) o al apagar
+    """
+    if not app.state.ready and not app.state.stopping:
+        try:
+            app.state.prewarm = await _prewarm()
+            app.state.ready = True
+        except Exception as e:
+            logger.warning("Prewarming failed: %s", e)
+    # Sin la conexión del broker compartido este worker no ve ni publica lecturas en vivo
+    broker_connected = not live_broker.shares_events or live_broker.connected
+    if not app.state.ready or not broker_connected:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "status": "ready" if app.state.ready else ("stopping" if app.state.stopping else "starting"),
+        "timestamp": datetime.now(timezone.utc),
+        "prewarm": app.state.prewarm,
+        "live_broker_connected": live_broker.connected,
+    }
+
+def _ping_database() -> dict:
+    started = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+    return {"status": "ok", "latency_ms": (time.perf_counter() - started) * 1000}
+
+async def _ping_async_database() -> dict:
+    started = time.perf_counter()
+    try:
+        async with async_engine.connect() as conn:
+            await conn.exec_driver_sql("SELECT 1")
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+    return {"status": "ok", "latency_ms": (time.perf_counter() - started) * 1000}
+
+@app.get("/health/deep")
+async def deep_health_check(response: Response):
+    """Comprueba la DB (SELECT 1 con su latencia) e informa del estado del pool y de la ingesta"""
+    database = {"sync": await run_in_threadpool(_ping_database)}
+    pools = {"sync": pool_status(engine.pool)}
+    if async_engine is not None:
+        database["async"] = await _ping_async_database()
+        pools["async"] = pool_status(async_engine.sync_engine.pool)
+    healthy = all(check["status"] == "ok" for check in database.values())
+    for name, replica_engine in read_router.engines().items():
+        pools[name] = pool_status(getattr(replica_engine, "sync_engine", replica_engine).pool)
+    ingest = ingest_buffer.stats()
+    if not healthy:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "status": "healthy" if healthy else "unhealthy",
+        "timestamp": datetime.now(timezone.utc),
+        "database": database,
+        "pools": pools,
+        # Una réplica caída no hace fallar el chequeo: sus lecturas pasan al primario
+        "read_replicas": read_router.stats(),
+        "ingest": {key: ingest[key] for key in ("enabled", "queue_depth", "max_queue")},
+    }
+
+@app.get("/metrics")
+def metrics():
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
 ## Endpoint simple para testing del ESP32
-@app.post("/")
-def root_endpoint(
-    payload: schemas.StationDataCreate, 
+@app.post("/", openapi_extra=INGEST_OPENAPI)
+async def root_endpoint(
+    request: Request,
     db: Session = Depends(get_db),
-    authorization: str = Depends(verify_api_key)
+    device_station_id: Optional[str] = Depends(verify_api_key)
 ):
     """Endpoint alternativo para compatibilidad con el ESP32"""
-    try:
-        db_station = crud.get_user_station(db, station_id=payload.station_id)
-        if not db_station:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Station with ID {payload.station_id} not found"
-            )
-            
-        obj = crud.create_station_data(db, payload)
-        return obj
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error storing station data: {str(e)}"
-        )
+    return await _ingest(request, db, device_station_id)
     
 # Render Section
 if __name__ == "__main__":
-    import uvicorn
-    import os
-    port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    # Lanzador de producción con varios workers (python -m app.server)
+    from .server import main
+    main()
\ No newline at end of file
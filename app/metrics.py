@@ -0,0 +1,234 @@
+"""
+Métricas de Prometheus (GET /metrics): latencia y errores por ruta, consultas
+SQL por petición, espera y saturación del pool de conexiones y lecturas
+ingeridas por estación.
+
+Con varios workers, PROMETHEUS_MULTIPROC_DIR activa el modo multiproceso de
+prometheus-client: cada worker escribe sus contadores e histogramas en ese
+directorio y cualquier scrape los devuelve sumados. Los gauges del pool son
+los del worker que atiende el scrape.
+"""
+import os
+import time
+from collections import Counter as Tally
+from contextvars import ContextVar
+from typing import Iterable, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+REQUESTS = Counter(
+    "http_requests_total", "Peticiones HTTP atendidas", ["method", "route", "status"]
+)
+REQUEST_ERRORS = Counter(
+    "http_request_errors_total", "Peticiones con respuesta 5xx o excepción no controlada", ["method", "route"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Tiempo hasta enviar las cabeceras de la respuesta",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Consultas SQL por petición", ["method", "route"], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Tiempo en consultas SQL por petición", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Duración de cada sentencia SQL", ["engine"], buckets=QUERY_BUCKETS
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Espera para obtener una conexión del pool", ["engine"], buckets=QUERY_BUCKETS
+)
+INGESTED = Counter(
+    "station_data_ingested_total", "Lecturas guardadas por estación (rate() = lecturas/s)", ["station_id"]
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Collectors propios (pool de conexiones), también publicados en modo multiproceso
+_collectors: list = []
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Estadísticas de la petición en curso. El threadpool copia el contexto, así
+# que los endpoints sync también suman aquí sus consultas.
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI (sin BaseHTTPMiddleware, que añade una tarea por petición).
+    La latencia se mide hasta enviar las cabeceras, para que los streams
+    largos (SSE, export) no distorsionen los histogramas. Las consultas SQL
+    se cuentan hasta el final de la respuesta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+        latency = None
+
+        async def send_wrapper(message):
+            nonlocal status_code, latency
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                latency = time.perf_counter() - started
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            method = scope["method"]
+            route = scope.get("route")
+            # La plantilla de la ruta (/users/{user_id}), no la URL: cardinalidad acotada
+            path = getattr(route, "path_format", UNMATCHED_ROUTE)
+            REQUESTS.labels(method, path, str(status_code)).inc()
+            if status_code >= 500:
+                REQUEST_ERRORS.labels(method, path).inc()
+            REQUEST_LATENCY.labels(method, path).observe(
+                latency if latency is not None else time.perf_counter() - started
+            )
+            REQUEST_QUERIES.labels(method, path).observe(stats.queries)
+            REQUEST_DB_TIME.labels(method, path).observe(stats.db_seconds)
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Cronometra cada sentencia del engine (sync, o el sync_engine de un AsyncEngine)."""
+    query_latency = QUERY_LATENCY.labels(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        query_latency.observe(elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+class _TimedCheckout:
+    """Mide cuánto espera cada checkout del pool (pool agotado = espera larga)."""
+
+    engine_name = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.labels(self.engine_name).observe(time.perf_counter() - started)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    engine_name = "async"
+
+
+def pool_status(pool) -> dict:
+    """Conexiones en uso, libres y saturación (en uso / máximo) de un QueuePool."""
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    checked_out = pool.checkedout()
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": checked_out,
+        "idle": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "saturation": checked_out / capacity if capacity else 0.0,
+    }
+
+
+class PoolCollector:
+    """Gauges del pool leídos en cada scrape (sin hilos ni sondeos periódicos)."""
+
+    def __init__(self, engines: dict):
+        self.engines = engines
+
+    def collect(self):
+        gauges = {
+            key: GaugeMetricFamily(f"db_pool_{key}", description, labels=["engine"])
+            for key, description in (
+                ("checked_out", "Conexiones del pool en uso"),
+                ("idle", "Conexiones libres en el pool"),
+                ("overflow", "Conexiones por encima de pool_size"),
+                ("saturation", "Conexiones en uso / (pool_size + max_overflow)"),
+            )
+        }
+        for name, engine in self.engines.items():
+            status = pool_status(engine.pool)
+            for key, gauge in gauges.items():
+                if key in status:
+                    gauge.add_metric([name], status[key])
+        return list(gauges.values())
+
+
+def register_engines(engines: dict) -> None:
+    """Instrumenta los engines {nombre: engine} y publica las métricas de su pool."""
+    for name, engine in engines.items():
+        sync_engine = getattr(engine, "sync_engine", engine)
+        instrument_engine(sync_engine, name)
+        # Etiqueta de la espera de checkout (réplicas: read-0, read-0-async...)
+        sync_engine.pool.engine_name = name
+    collector = PoolCollector({
+        name: getattr(engine, "sync_engine", engine) for name, engine in engines.items()
+    })
+    REGISTRY.register(collector)
+    _collectors.append(collector)
+
+
+def observe_ingest(readings: Iterable[dict]) -> None:
+    for station_id, count in Tally(reading["station_id"] for reading in readings).items():
+        INGESTED.labels(station_id).inc(count)
+
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def render() -> bytes:
+    if not multiprocess_enabled():
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in _collectors:
+        registry.register(collector)
+    return generate_latest(registry)
+
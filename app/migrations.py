@@ -0,0 +1,126 @@
+import fcntl
+import logging
+import multiprocessing
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+
+from .config import settings
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+# Revisión equivalente a las tablas que creaba create_all antes de usar Alembic
+BASELINE_REVISION = "0001"
+
+# Clave del pg_advisory_lock que serializa la preparación del esquema entre workers
+SCHEMA_LOCK_KEY = 7_206_001
+SCHEMA_LOCK_POLL_SECONDS = 0.5
+
+
+def alembic_config(connection=None) -> Config:
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    # No reconfigurar el logging de la aplicación al migrar desde el arranque
+    config.attributes["configure_logger"] = False
+    if connection is not None:
+        # alembic/env.py migra sobre esta conexión (la que tiene el lock)
+        config.attributes["connection"] = connection
+    return config
+
+
+def run_migrations(connection=None) -> None:
+    """
+    Aplica las migraciones pendientes (alembic upgrade head).
+    Las bases creadas con create_all (sin tabla alembic_version) se marcan
+    primero con la revisión inicial para no intentar recrear las tablas.
+    """
+    config = alembic_config(connection)
+    tables = inspect(connection if connection is not None else engine).get_table_names()
+    if connection is not None:
+        # Alembic debe abrir su propia transacción (0002 usa autocommit_block)
+        connection.commit()
+    if "alembic_version" not in tables and "users" in tables:
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
+
+
+def reset_database(connection=None) -> None:
+    """Elimina y recrea todo el esquema (solo desarrollo, RECREATE_TABLES=true)."""
+    config = alembic_config(connection)
+    command.downgrade(config, "base")
+    command.upgrade(config, "head")
+    print("Tablas recreadas exitosamente")
+
+
+@contextmanager
+def _schema_connection():
+    """
+    Conexión con un lock entre procesos: pg_advisory_lock en PostgreSQL,
+    flock sobre '<archivo>.schema.lock' en SQLite. Los demás workers esperan
+    y luego encuentran el esquema ya al día.
+    """
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            # Sondear con pg_try_advisory_lock en autocommit: CREATE INDEX CONCURRENTLY (0002)
+            # espera a toda transacción en curso, incluida una sentencia bloqueada en el lock
+            isolation_level = conn.default_isolation_level
+            conn.execution_options(isolation_level="AUTOCOMMIT")
+            while not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": SCHEMA_LOCK_KEY}).scalar():
+                time.sleep(SCHEMA_LOCK_POLL_SECONDS)
+            conn.commit()
+            conn.execution_options(isolation_level=isolation_level)
+            try:
+                yield conn
+            finally:
+                conn.rollback()
+                conn.execution_options(isolation_level="AUTOCOMMIT")
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEMA_LOCK_KEY})
+                conn.commit()
+            return
+        database = engine.url.database
+        if not database or database == ":memory:":
+            yield conn
+            return
+        with open(f"{database}.schema.lock", "w") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield conn
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def single_process() -> bool:
+    """False en un worker de `uvicorn --workers N` (proceso hijo) o con WEB_CONCURRENCY > 1."""
+    return multiprocessing.parent_process() is None and settings.WEB_CONCURRENCY <= 1
+
+
+def setup_schema(allow_reset: bool = False) -> None:
+    """
+    Paso único de arranque (lanzador o lifespan de cada worker): RECREATE_TABLES
+    o las migraciones pendientes, con el lock entre procesos para que varios
+    workers no ejecuten DDL a la vez.
+    RECREATE_TABLES solo se aplica en el lanzador (allow_reset) o con un único
+    proceso: cada worker borraría de nuevo lo que escribieron los anteriores.
+    """
+    recreate = os.getenv("RECREATE_TABLES", "False").lower() == "true"
+    if recreate and not (allow_reset or single_process()):
+        logger.warning(
+            "RECREATE_TABLES ignored in a multi-worker server; use python -m app.server to reset the schema once"
+        )
+        recreate = False
+    if not recreate and not settings.RUN_MIGRATIONS_ON_STARTUP:
+        return
+    with _schema_connection() as conn:
+        if recreate:
+            reset_database(conn)
+        else:
+            run_migrations(conn)
+        conn.commit()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from .database import Base
@@ -27,6 +27,24 @@ class UserStation(Base):
     user = relationship("User", back_populates="stations")
     
     station_data = relationship("StationData", back_populates="station")
+    device_keys = relationship("DeviceKey", back_populates="station")
+
+
+class DeviceKey(Base):
+    """API key de un dispositivo; solo se guarda el SHA-256 de la clave."""
+    __tablename__ = "device_keys"
+
+    key_id = Column(Integer, primary_key=True, index=True)
+    key_hash = Column(String(64), unique=True, nullable=False)
+    label = Column(String, nullable=True)
+
+    station_id = Column(String, ForeignKey("user_stations.station_id"), nullable=False, index=True)
+    station = relationship("UserStation", back_populates="device_keys")
+
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+    # Marca de la última creación/revocación: el índice en memoria se refresca por este campo
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False, index=True)
 
 
 class StationData(Base):
@@ -51,5 +69,114 @@ class StationData(Base):
     station_id = Column(String, ForeignKey("user_stations.station_id"), nullable=False)
     station = relationship("UserStation", back_populates="station_data")
     
-    # Timestamp
-    timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
\ No newline at end of file
+    # Timestamp (indexado para la limpieza por antigüedad y los filtros por rango)
+    timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False, index=True)
+
+    # Las lecturas se filtran por estación y se ordenan por (timestamp, id) DESC;
+    # el id desempata igual que el cursor de paginación
+    __table_args__ = (
+        Index("ix_station_data_station_id_timestamp", station_id, timestamp.desc(), id.desc()),
+    )
+
+class StationDataHourly(Base):
+    """Resumen horario de station_data, escrito por la retención antes de borrar las lecturas."""
+    __tablename__ = "station_data_hourly"
+
+    station_id = Column(String, ForeignKey("user_stations.station_id"), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    readings = Column(Integer, nullable=False, default=0)
+
+    # Por métrica: min/max/avg y número de valores no nulos (para combinar promedios)
+    temperatura_min = Column(Float, nullable=True)
+    temperatura_max = Column(Float, nullable=True)
+    temperatura_avg = Column(Float, nullable=True)
+    temperatura_count = Column(Integer, nullable=False, default=0)
+
+    humedad_min = Column(Float, nullable=True)
+    humedad_max = Column(Float, nullable=True)
+    humedad_avg = Column(Float, nullable=True)
+    humedad_count = Column(Integer, nullable=False, default=0)
+
+    presion_min = Column(Float, nullable=True)
+    presion_max = Column(Float, nullable=True)
+    presion_avg = Column(Float, nullable=True)
+    presion_count = Column(Integer, nullable=False, default=0)
+
+    indice_uv_min = Column(Float, nullable=True)
+    indice_uv_max = Column(Float, nullable=True)
+    indice_uv_avg = Column(Float, nullable=True)
+    indice_uv_count = Column(Integer, nullable=False, default=0)
+
+    voltaje_mq135_min = Column(Float, nullable=True)
+    voltaje_mq135_max = Column(Float, nullable=True)
+    voltaje_mq135_avg = Column(Float, nullable=True)
+    voltaje_mq135_count = Column(Integer, nullable=False, default=0)
+
+
+class RetentionJob(Base):
+    """Trabajo de retención por lotes; guarda el progreso para poder reanudarlo."""
+    __tablename__ = "retention_jobs"
+
+    job_id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, nullable=False, default="pending")  # pending, running, completed, failed
+    cutoff = Column(DateTime, nullable=False)
+    rollup = Column(Boolean, nullable=False, default=True)
+    batch_size = Column(Integer, nullable=False)
+
+    # Progreso por rango de ids: se procesa [next_id, next_id + batch_size) hasta max_id
+    start_id = Column(Integer, nullable=True)
+    next_id = Column(Integer, nullable=True)
+    max_id = Column(Integer, nullable=True)
+    deleted = Column(Integer, nullable=False, default=0)
+    rolled_up = Column(Integer, nullable=False, default=0)
+    # Particiones enteras eliminadas con DROP TABLE (station_data particionada)
+    dropped_partitions = Column(Integer, nullable=False, default=0, server_default="0")
+    error = Column(String, nullable=True)
+
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class AlertRule(Base):
+    """Regla de alerta de una estación, evaluada sobre cada lectura en la ingesta (app/alerts.py)."""
+    __tablename__ = "alert_rules"
+
+    rule_id = Column(Integer, primary_key=True, index=True)
+    station_id = Column(String, ForeignKey("user_stations.station_id"), nullable=False, index=True)
+    name = Column(String, nullable=True)
+    metric = Column(String, nullable=False)
+    kind = Column(String, nullable=False)  # threshold, rate, count
+    operator = Column(String, nullable=False)  # >, >=, <, <=, ==, !=
+    value = Column(Float, nullable=False)
+    # Solo en 'count': la alerta salta cuando min_count de las últimas `window` lecturas cumplen la condición
+    window = Column(Integer, nullable=True)
+    min_count = Column(Integer, nullable=True)
+
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    deleted_at = Column(DateTime, nullable=True)
+    # Como en device_keys: los workers recargan sus reglas en memoria por este campo
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False, index=True)
+
+
+class Alert(Base):
+    """Alerta disparada por una regla; reading_id sin FK (la lectura puede acabar en el archivo)."""
+    __tablename__ = "alerts"
+
+    alert_id = Column(Integer, primary_key=True, index=True)
+    rule_id = Column(Integer, ForeignKey("alert_rules.rule_id"), nullable=False, index=True)
+    station_id = Column(String, nullable=False)
+    metric = Column(String, nullable=False)
+    kind = Column(String, nullable=False)
+    observed = Column(Float, nullable=True)  # valor, o cambio por minuto en 'rate'
+    threshold = Column(Float, nullable=False)
+    detail = Column(String, nullable=True)
+    reading_id = Column(Integer, nullable=True)
+    triggered_at = Column(DateTime, nullable=False)  # timestamp de la lectura
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    __table_args__ = (
+        Index("ix_alerts_station_id_triggered_at", station_id, triggered_at.desc(), alert_id.desc()),
+        # Una alerta por regla y lectura aunque dos workers la evalúen durante un relevo
+        Index("ux_alerts_rule_id_reading_id", rule_id, reading_id, unique=True),
+    )
@@ -0,0 +1,291 @@
+"""
+Particionado por tiempo de station_data en PostgreSQL (opt-in con
+STATION_DATA_PARTITIONING=monthly|weekly).
+
+station_data pasa a ser una tabla particionada por rango de `timestamp`, con
+una partición por mes o por semana (station_data_y2026m01, station_data_y2026w03):
+
+- las consultas con filtro de tiempo solo leen las particiones del rango
+  (partition pruning) y /latest empieza por las particiones más recientes;
+- la retención elimina las particiones que quedan enteras antes del corte con
+  DROP TABLE (una operación de catálogo) en lugar de borrar fila a fila;
+- las particiones futuras se crean por adelantado al arrancar y periódicamente;
+- la partición DEFAULT (station_data_default) recoge las lecturas fuera de todo
+  rango (si el mantenimiento se detuvo o llegan lecturas muy antiguas) para que
+  la ingesta no falle; al crear un rango se le mueven sus filas.
+
+En SQLite, o sin activar la opción, station_data sigue siendo una tabla normal
+y las funciones de este módulo no hacen nada. Para convertir una base existente
+fuera de las migraciones:
+
+    python -m app.partitions convert --interval monthly
+    python -m app.partitions status
+"""
+import argparse
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+TABLE = "station_data"
+DEFAULT_PARTITION = f"{TABLE}_default"
+_BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+@dataclass
+class Partition:
+    name: str
+    lower: datetime
+    upper: datetime
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def period_start(moment: datetime, interval: str) -> datetime:
+    """Inicio del mes o de la semana (lunes) que contiene `moment`."""
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "monthly":
+        return day.replace(day=1)
+    return day - timedelta(days=day.weekday())
+
+
+def next_period(start: datetime, interval: str) -> datetime:
+    if interval == "monthly":
+        return (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return period_start(start, interval) + timedelta(days=7)
+
+
+def partition_name(start: datetime, interval: str) -> str:
+    if interval == "monthly":
+        return f"{TABLE}_y{start.year}m{start.month:02d}"
+    year, week, _ = start.isocalendar()
+    return f"{TABLE}_y{year}w{week:02d}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+    ), {"table": TABLE}).first() is not None
+
+
+def list_partitions(conn: Connection) -> List[Partition]:
+    """Particiones de station_data ordenadas por rango."""
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = CAST(:table AS regclass)"
+    ), {"table": TABLE}).all()
+    partitions = []
+    for name, bound in rows:
+        match = _BOUNDS.search(bound)
+        if match is None:  # partición DEFAULT
+            continue
+        partitions.append(Partition(name, datetime.fromisoformat(match[1]), datetime.fromisoformat(match[2])))
+    return sorted(partitions, key=lambda partition: partition.lower)
+
+
+def create_partition(conn: Connection, lower: datetime, upper: datetime, interval: str,
+                     parent: str = TABLE) -> Partition:
+    partition = Partition(partition_name(lower, interval), lower, upper)
+    # exec_driver_sql: los literales de fecha ("00:00:00") no son parámetros de text()
+    conn.exec_driver_sql(
+        f'CREATE TABLE IF NOT EXISTS "{partition.name}" PARTITION OF {parent} '
+        f"FOR VALUES FROM ('{lower.isoformat(' ')}') TO ('{upper.isoformat(' ')}')"
+    )
+    return partition
+
+
+def create_default_partition(conn: Connection, parent: str = TABLE) -> None:
+    conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" PARTITION OF {parent} DEFAULT'))
+
+
+def attach_range(conn: Connection, lower: datetime, upper: datetime, interval: str) -> Partition:
+    """
+    Crea la partición [lower, upper). PostgreSQL la rechaza si la partición
+    DEFAULT tiene filas de ese rango: se sacan antes y se reinsertan después
+    por la tabla padre, en la misma transacción.
+    """
+    bounds = {"lower": lower, "upper": upper}
+    in_range = f'FROM "{DEFAULT_PARTITION}" WHERE timestamp >= :lower AND timestamp < :upper'
+    stray = conn.execute(text(f"SELECT 1 {in_range} LIMIT 1"), bounds).first() is not None
+    if stray:
+        conn.execute(text(f"CREATE TEMPORARY TABLE {TABLE}_moved (LIKE {TABLE}) ON COMMIT DROP"))
+        conn.execute(text(
+            f"WITH moved AS (DELETE {in_range} RETURNING *) INSERT INTO {TABLE}_moved SELECT * FROM moved"
+        ), bounds)
+    partition = create_partition(conn, lower, upper, interval)
+    if stray:
+        moved = conn.execute(text(f"INSERT INTO {TABLE} SELECT * FROM {TABLE}_moved")).rowcount
+        conn.execute(text(f"DROP TABLE {TABLE}_moved"))
+        logger.warning("Moved %s rows from %s into %s", moved, DEFAULT_PARTITION, partition.name)
+    return partition
+
+
+def _ranges(cursor: datetime, until: datetime, interval: str, ahead: int):
+    """Rangos [inicio, fin) consecutivos desde `cursor` hasta `ahead` periodos después de `until`."""
+    target = until
+    for _ in range(ahead + 1):
+        target = next_period(period_start(target, interval), interval)
+    while cursor < target:
+        upper = next_period(cursor, interval)
+        yield cursor, upper
+        cursor = upper
+
+
+def ensure_partitions(conn: Connection, interval: str, ahead: int, until: Optional[datetime] = None) -> List[Partition]:
+    """
+    Crea las particiones que faltan desde el final de la última existente
+    hasta `ahead` periodos después de ahora (o de `until`). Empezar en el
+    límite superior existente evita solapes aunque cambie el intervalo.
+    También crea la partición DEFAULT si falta (bases convertidas antes de tenerla).
+    """
+    create_default_partition(conn)
+    existing = list_partitions(conn)
+    now = _utcnow()
+    cursor = existing[-1].upper if existing else period_start(now, interval)
+    return [
+        attach_range(conn, lower, upper, interval)
+        for lower, upper in _ranges(cursor, until or now, interval, ahead)
+    ]
+
+
+def expired_partitions(conn: Connection, cutoff: datetime) -> List[Partition]:
+    """Particiones cuyo rango completo es anterior al corte de retención."""
+    return [partition for partition in list_partitions(conn) if partition.upper <= cutoff]
+
+
+def drop_partition(conn: Connection, partition: Partition) -> None:
+    # Toma un lock exclusivo breve sobre la tabla padre: no borra fila a fila
+    conn.execute(text(f'DROP TABLE "{partition.name}"'))
+
+
+def drop_expired_partitions(conn: Connection, cutoff: datetime,
+                            before_drop: Optional[Callable[[Partition], None]] = None) -> List[Partition]:
+    if not is_partitioned(conn):
+        return []
+    dropped = []
+    for partition in expired_partitions(conn, cutoff):
+        if before_drop is not None:
+            before_drop(partition)
+        drop_partition(conn, partition)
+        dropped.append(partition)
+    return dropped
+
+
+def _station_data_constraints(conn: Connection, primary_key: str) -> None:
+    """Clave primaria, FK e índices de station_data (tras renombrar la tabla nueva)."""
+    conn.execute(text(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY ({primary_key})"))
+    conn.execute(text(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_station_id_fkey "
+        f"FOREIGN KEY (station_id) REFERENCES user_stations (station_id)"
+    ))
+    conn.execute(text(f"CREATE INDEX ix_{TABLE}_id ON {TABLE} (id)"))
+    conn.execute(text(f"CREATE INDEX ix_{TABLE}_timestamp ON {TABLE} (timestamp)"))
+    conn.execute(text(
+        f"CREATE INDEX ix_{TABLE}_station_id_timestamp ON {TABLE} (station_id, timestamp DESC, id DESC)"
+    ))
+
+
+def _swap_table(conn: Connection, partition_by: str, before_copy: Callable[[], None], primary_key: str) -> None:
+    """Copia station_data en una tabla nueva con la misma definición y la sustituye."""
+    sequence = conn.execute(text(f"SELECT pg_get_serial_sequence('{TABLE}', 'id')")).scalar()
+    conn.execute(text(f"CREATE TABLE {TABLE}_new (LIKE {TABLE} INCLUDING DEFAULTS){partition_by}"))
+    before_copy()
+    conn.execute(text(f"INSERT INTO {TABLE}_new SELECT * FROM {TABLE}"))
+    # La secuencia del id pertenece a la tabla vieja: se conserva al borrarla
+    conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    conn.execute(text(f"DROP TABLE {TABLE}"))
+    conn.execute(text(f"ALTER TABLE {TABLE}_new RENAME TO {TABLE}"))
+    conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id"))
+    _station_data_constraints(conn, primary_key)
+
+
+def convert_to_partitioned(conn: Connection, interval: str, ahead: int) -> List[Partition]:
+    """
+    Convierte station_data en tabla particionada por rango de timestamp,
+    copiando las filas existentes (en la transacción de `conn`: bloquea la
+    tabla durante la copia). La clave primaria pasa a ser (id, timestamp)
+    porque PostgreSQL exige que incluya la columna de partición.
+    """
+    lowest, highest = conn.execute(text(f"SELECT min(timestamp), max(timestamp) FROM {TABLE}")).one()
+    now = _utcnow()
+    created: List[Partition] = []
+
+    def create_partitions():
+        # Las particiones se adjuntan a station_data_new, que luego se renombra
+        cursor = period_start(min(lowest or now, now), interval)
+        created.extend(
+            create_partition(conn, lower, upper, interval, parent=f"{TABLE}_new")
+            for lower, upper in _ranges(cursor, max(highest or now, now), interval, ahead)
+        )
+        create_default_partition(conn, parent=f"{TABLE}_new")
+
+    _swap_table(conn, " PARTITION BY RANGE (timestamp)", create_partitions, "id, timestamp")
+    return created
+
+
+def convert_to_plain(conn: Connection) -> None:
+    """Vuelve a una tabla station_data normal (downgrade), copiando todas las particiones."""
+    _swap_table(conn, "", lambda: None, "id")
+
+
+def maintain(engine) -> List[Partition]:
+    """Crea las particiones futuras si station_data está particionada (al arrancar y periódicamente)."""
+    if settings.STATION_DATA_PARTITIONING == "none" or engine.dialect.name != "postgresql":
+        return []
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            logger.warning(
+                "STATION_DATA_PARTITIONING=%s but station_data is not partitioned; "
+                "run 'python -m app.partitions convert'", settings.STATION_DATA_PARTITIONING
+            )
+            return []
+        created = ensure_partitions(conn, settings.STATION_DATA_PARTITIONING, settings.STATION_DATA_PARTITIONS_AHEAD)
+    for partition in created:
+        logger.info("Created partition %s [%s, %s)", partition.name, partition.lower, partition.upper)
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Particionado por tiempo de station_data (PostgreSQL)")
+    parser.add_argument("command", choices=["status", "convert", "ensure", "unpartition"])
+    parser.add_argument("--interval", choices=["monthly", "weekly"], default=None,
+                        help="Por defecto STATION_DATA_PARTITIONING")
+    parser.add_argument("--ahead", type=int, default=settings.STATION_DATA_PARTITIONS_AHEAD)
+    args = parser.parse_args()
+
+    from .database import engine
+
+    if engine.dialect.name != "postgresql":
+        parser.error("Partitioning requires PostgreSQL; SQLite keeps a single station_data table")
+    interval = args.interval or settings.STATION_DATA_PARTITIONING
+    with engine.begin() as conn:
+        partitioned = is_partitioned(conn)
+        if args.command == "convert" and not partitioned:
+            if interval == "none":
+                parser.error("--interval is required when STATION_DATA_PARTITIONING=none")
+            convert_to_partitioned(conn, interval, args.ahead)
+        elif args.command == "ensure" and partitioned:
+            if interval == "none":
+                parser.error("--interval is required when STATION_DATA_PARTITIONING=none")
+            ensure_partitions(conn, interval, args.ahead)
+        elif args.command == "unpartition" and partitioned:
+            convert_to_plain(conn)
+        for partition in list_partitions(conn):
+            print(f"{partition.name}\t{partition.lower}\t{partition.upper}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Cuerpo de las rutas de ingesta (POST /station-data y POST /): JSON o un
+formato binario compacto para el ESP32.
+
+Formato binario (Content-Type: application/x-station-data, little-endian):
+
+    cabecera  <2sBB>     magic b"SD", versión (1), longitud N del station_id
+              N bytes    station_id en ASCII (hexadecimal)
+    registro  <BhHIHHB>  máscara, temperatura (centésimas de °C), humedad
+                         (centésimas de %), presion (centésimas de hPa),
+                         voltaje_mq135 (mV), indice_uv (centésimas), código de nivel_uv
+              ... tantos registros de 14 bytes como lecturas
+
+Bits de la máscara: 0-4 presencia de cada medida (en el orden anterior),
+5 gas_detectado presente, 6 valor de gas_detectado, 7 nivel_uv presente.
+Las medidas van en punto fijo y no en float32: al dividir por la escala se
+obtiene el decimal exacto (21.3, no 21.299999237) sin coste de redondeo.
+"""
+import re
+import struct
+from typing import List
+
+from fastapi import HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+from . import schemas
+
+BINARY_MEDIA_TYPE = "application/x-station-data"
+MAGIC = b"SD"
+VERSION = 1
+
+HEADER = struct.Struct("<2sBB")
+RECORD = struct.Struct("<BhHIHHB")
+
+# (campo, escala del punto fijo) en el orden del registro
+SCALED_FIELDS = (
+    ("temperatura", 100),
+    ("humedad", 100),
+    ("presion", 100),
+    ("voltaje_mq135", 1000),
+    ("indice_uv", 100),
+)
+GAS_PRESENT = 1 << 5
+GAS_VALUE = 1 << 6
+NIVEL_UV_PRESENT = 1 << 7
+NIVEL_UV_CODES = ("Bajo", "Moderado", "Alto", "Muy alto", "Extremo")
+
+_STATION_ID = re.compile(schemas.StationDataCreate.model_fields["station_id"].metadata[0].pattern)
+
+
+def _field_bounds(name: str):
+    """Rango (ge, le) del campo en StationDataBase: una sola fuente para JSON y binario."""
+    lower = upper = None
+    for constraint in schemas.StationDataBase.model_fields[name].metadata:
+        lower = getattr(constraint, "ge", lower)
+        upper = getattr(constraint, "le", upper)
+    return lower, upper
+
+
+# (bit, campo, escala, mínimo y máximo en unidades del registro, posición en la tupla)
+_FIELDS = tuple(
+    (1 << bit, name, scale, *(round(bound * scale) for bound in _field_bounds(name)), bit + 1)
+    for bit, (name, scale) in enumerate(SCALED_FIELDS)
+)
+
+# Ingestión binaria documentada en OpenAPI junto al esquema JSON
+INGEST_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": {"$ref": "#/components/schemas/StationDataCreate"}},
+            BINARY_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+        },
+    }
+}
+
+
+def is_binary(request: Request) -> bool:
+    return request.headers.get("content-type", "").split(";")[0].strip().lower() == BINARY_MEDIA_TYPE
+
+
+def encode_readings(station_id: str, readings: List[dict]) -> bytes:
+    """Codifica lecturas en el formato binario (referencia para el firmware y benchmarks)."""
+    station = station_id.encode("ascii")
+    parts = [HEADER.pack(MAGIC, VERSION, len(station)), station]
+    for reading in readings:
+        mask = 0
+        values = []
+        for bit, name, scale, _, _, _ in _FIELDS:
+            value = reading.get(name)
+            if value is not None:
+                mask |= bit
+            values.append(round((value or 0) * scale))
+        if reading.get("gas_detectado") is not None:
+            mask |= GAS_PRESENT | (GAS_VALUE if reading["gas_detectado"] else 0)
+        code = 0
+        if reading.get("nivel_uv") is not None:
+            mask |= NIVEL_UV_PRESENT
+            code = NIVEL_UV_CODES.index(reading["nivel_uv"])
+        parts.append(RECORD.pack(mask, *values, code))
+    return b"".join(parts)
+
+
+def _invalid(detail: str):
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid binary payload: {detail}")
+
+
+def decode_readings(body: bytes) -> List[dict]:
+    """
+    Decodifica y valida el cuerpo binario en una sola pasada (struct.iter_unpack).
+    Los rangos se comprueban sobre los enteros con los límites del esquema, y
+    cada registro se convierte directamente en la fila a insertar (sin crear
+    un StationDataCreate ni volver a validarlo con pydantic).
+    """
+    if len(body) < HEADER.size:
+        raise _invalid("truncated header")
+    magic, version, station_length = HEADER.unpack_from(body)
+    if magic != MAGIC or version != VERSION:
+        raise _invalid("unknown magic or version")
+    offset = HEADER.size + station_length
+    station_id = body[HEADER.size:offset].decode("ascii", errors="replace")
+    if len(body) < offset or not _STATION_ID.fullmatch(station_id):
+        raise _invalid("station_id must be a valid hexadecimal string")
+    if (len(body) - offset) % RECORD.size:
+        raise _invalid(f"record section is not a multiple of {RECORD.size} bytes")
+
+    rows = []
+    errors = []
+    for index, record in enumerate(RECORD.iter_unpack(memoryview(body)[offset:])):
+        mask = record[0]
+        row = {"station_id": station_id}
+        for bit, name, scale, lower, upper, position in _FIELDS:
+            if mask & bit:
+                raw = record[position]
+                if not lower <= raw <= upper:
+                    errors.append({
+                        "type": "value_error", "loc": ["body", index, name],
+                        "msg": f"Value must be between {lower / scale} and {upper / scale}", "input": raw / scale,
+                    })
+                row[name] = raw / scale
+            else:
+                row[name] = None
+        row["gas_detectado"] = bool(mask & GAS_VALUE) if mask & GAS_PRESENT else None
+        row["nivel_uv"] = None
+        if mask & NIVEL_UV_PRESENT:
+            if record[6] < len(NIVEL_UV_CODES):
+                row["nivel_uv"] = NIVEL_UV_CODES[record[6]]
+            else:
+                errors.append({
+                    "type": "value_error", "loc": ["body", index, "nivel_uv"],
+                    "msg": "Unknown nivel_uv code", "input": record[6],
+                })
+        rows.append(row)
+
+    if errors:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=errors)
+    if not rows:
+        raise _invalid("no records")
+    return rows
+
+
+async def read_json_reading(request: Request) -> schemas.StationDataCreate:
+    """Valida un cuerpo JSON con los mismos errores 422 que un parámetro de body de FastAPI."""
+    try:
+        return schemas.StationDataCreate.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)
+        ])
+
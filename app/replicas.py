@@ -0,0 +1,251 @@
+"""
+Réplicas de lectura opcionales para las rutas GET de consulta.
+
+Con READ_DATABASE_URL (una o varias URLs separadas por comas) cada réplica
+tiene su propio engine y pool, y get_read_db / get_async_read_db reparten
+las sesiones entre ellas por turnos (round-robin). Las escrituras, la
+autenticación y los procesos de fondo siguen usando DATABASE_URL.
+
+- Al entregar la sesión se abre ya la conexión: si la réplica no responde se
+  marca como caída, se prueba la siguiente y, si no queda ninguna, se lee del
+  primario. Una réplica caída se vuelve a probar tras READ_REPLICA_HEALTH_SECONDS.
+- Un chequeo periódico (SELECT 1 y, en PostgreSQL, el retraso de replicación)
+  marca réplicas sanas o caídas sin esperar a que falle una petición.
+- Con READ_YOUR_WRITES_SECONDS > 0, una petición que escribe (POST, PUT,
+  PATCH, DELETE con respuesta < 400) deja una cookie y las lecturas de ese
+  cliente van al primario durante ese tiempo, para que vea lo que acaba de
+  escribir aunque la réplica vaya retrasada.
+
+Sin READ_DATABASE_URL todas las lecturas van al primario como antes.
+"""
+import itertools
+import logging
+import math
+import threading
+import time
+from typing import List, Optional
+
+from fastapi import Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from .config import settings
+from .database import AsyncSessionLocal, SessionLocal, engine_options, normalize_url, to_async_url
+
+logger = logging.getLogger(__name__)
+
+READ_YOUR_WRITES_COOKIE = "last_write"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Segundos desde la última transacción aplicada en una réplica de PostgreSQL (NULL en el primario)
+REPLICATION_LAG_SQL = text(
+    "SELECT CASE WHEN pg_is_in_recovery() "
+    "THEN EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class Replica:
+    """Engine (y engine async con DB_MODE=async) de una réplica y su estado de salud."""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = create_engine(url, **engine_options(url))
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.async_engine = None
+        self.AsyncSessionLocal = None
+        if settings.DB_MODE == "async":
+            async_url = to_async_url(url)
+            self.async_engine = create_async_engine(async_url, **engine_options(async_url, is_async=True))
+            self.AsyncSessionLocal = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+        self.healthy = True
+        self.retry_at = 0.0
+        self.error: Optional[str] = None
+        self.lag_seconds: Optional[float] = None
+        self.sessions = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy or now >= self.retry_at
+
+
+class ReadRouter:
+    """Elige la réplica de cada sesión de lectura y recurre al primario si fallan todas."""
+
+    def __init__(self, urls: List[str], retry_seconds: float = 10.0, max_lag_seconds: float = 0.0):
+        self.replicas = [Replica(f"read-{index}", url) for index, url in enumerate(urls)]
+        self.retry_seconds = retry_seconds
+        self.max_lag_seconds = max_lag_seconds
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self.primary_reads = 0
+        self.fallbacks = 0
+
+    def candidates(self) -> List[Replica]:
+        """Réplicas disponibles, empezando por la siguiente en el turno."""
+        now = time.monotonic()
+        available = [replica for replica in self.replicas if replica.available(now)]
+        if not available:
+            return []
+        start = next(self._turn) % len(available)
+        return available[start:] + available[:start]
+
+    def mark_failed(self, replica: Replica, error: str) -> None:
+        with self._lock:
+            if replica.healthy:
+                logger.warning("Read replica %s unavailable: %s", replica.name, error)
+            replica.healthy = False
+            replica.error = error
+            replica.retry_at = time.monotonic() + self.retry_seconds
+            replica.failures += 1
+
+    def mark_healthy(self, replica: Replica) -> None:
+        with self._lock:
+            if not replica.healthy:
+                logger.info("Read replica %s is back", replica.name)
+            replica.healthy = True
+            replica.error = None
+
+    def session(self, prefer_primary: bool = False):
+        """Sesión de lectura con la conexión ya abierta en una réplica sana, o en el primario."""
+        if not prefer_primary:
+            for replica in self.candidates():
+                db = replica.SessionLocal()
+                try:
+                    db.connection()
+                except Exception as e:
+                    db.close()
+                    self.mark_failed(replica, str(e))
+                    continue
+                self.mark_healthy(replica)
+                replica.sessions += 1
+                return db
+            if self.replicas:
+                self.fallbacks += 1
+        self.primary_reads += 1
+        return SessionLocal()
+
+    async def async_session(self, prefer_primary: bool = False):
+        if not prefer_primary:
+            for replica in self.candidates():
+                db = replica.AsyncSessionLocal()
+                try:
+                    await db.connection()
+                except Exception as e:
+                    await db.close()
+                    self.mark_failed(replica, str(e))
+                    continue
+                self.mark_healthy(replica)
+                replica.sessions += 1
+                return db
+            if self.replicas:
+                self.fallbacks += 1
+        self.primary_reads += 1
+        return AsyncSessionLocal()
+
+    def check(self) -> None:
+        """Chequeo de salud de todas las réplicas (SELECT 1 y retraso de replicación en PostgreSQL)."""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    if conn.dialect.name == "postgresql":
+                        lag = conn.execute(REPLICATION_LAG_SQL).scalar()
+                        replica.lag_seconds = float(lag) if lag is not None else None
+                    else:
+                        conn.exec_driver_sql("SELECT 1")
+            except Exception as e:
+                self.mark_failed(replica, str(e))
+                continue
+            if self.max_lag_seconds > 0 and replica.lag_seconds is not None and replica.lag_seconds > self.max_lag_seconds:
+                self.mark_failed(replica, f"replication lag {replica.lag_seconds:.1f}s")
+            else:
+                self.mark_healthy(replica)
+
+    def engines(self) -> dict:
+        """Engines de las réplicas por nombre (métricas del pool)."""
+        engines = {}
+        for replica in self.replicas:
+            engines[replica.name] = replica.engine
+            if replica.async_engine is not None:
+                engines[f"{replica.name}-async"] = replica.async_engine
+        return engines
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            replica.engine.dispose()
+            if replica.async_engine is not None:
+                await replica.async_engine.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "error": replica.error,
+                    "lag_seconds": replica.lag_seconds,
+                    "sessions": replica.sessions,
+                    "failures": replica.failures,
+                }
+                for replica in self.replicas
+            ],
+            "primary_reads": self.primary_reads,
+            "fallbacks": self.fallbacks,
+        }
+
+
+def wrote_recently(request: Request) -> bool:
+    """True si el cliente escribió hace menos de READ_YOUR_WRITES_SECONDS (cookie last_write)."""
+    if settings.READ_YOUR_WRITES_SECONDS <= 0:
+        return False
+    try:
+        last_write = float(request.cookies[READ_YOUR_WRITES_COOKIE])
+    except (KeyError, ValueError):
+        return False
+    return time.time() - last_write < settings.READ_YOUR_WRITES_SECONDS
+
+
+class ReadYourWritesMiddleware:
+    """Middleware ASGI que marca con una cookie a los clientes que acaban de escribir."""
+
+    def __init__(self, app, window_seconds: float):
+        self.app = app
+        self.max_age = math.ceil(window_seconds)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (
+                    f"{READ_YOUR_WRITES_COOKIE}={time.time():.3f}; Max-Age={self.max_age}; "
+                    f"Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+read_router = ReadRouter(
+    [normalize_url(url.strip()) for url in settings.READ_DATABASE_URL.split(",") if url.strip()],
+    retry_seconds=settings.READ_REPLICA_HEALTH_SECONDS,
+    max_lag_seconds=settings.READ_REPLICA_MAX_LAG_SECONDS,
+)
+
+
+def get_read_db(request: Request):
+    db = read_router.session(prefer_primary=wrote_recently(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    db = await read_router.async_session(prefer_primary=wrote_recently(request))
+    try:
+        yield db
+    finally:
+        await db.close()
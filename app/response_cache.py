@@ -0,0 +1,182 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+
+from . import schemas
+from .config import settings
+
+# Serializadores de los modelos de respuesta (mismo JSON que genera FastAPI)
+STATION_DATA_LIST = TypeAdapter(List[schemas.StationData])
+USER_STATION_LIST = TypeAdapter(List[schemas.UserStation])
+USER = TypeAdapter(schemas.User)
+
+# Ámbitos de versión: cada escritura incrementa los suyos
+STATION_DATA = ("station_data",)          # cualquier lectura nueva
+STATION_DATA_PURGE = ("station_data_purge",)  # borrados por retención
+USER_STATIONS = ("user_stations",)
+
+
+def station_scope(station_id: str) -> tuple:
+    return ("station", station_id)
+
+
+def user_scope(user_id: int) -> tuple:
+    return ("user", user_id)
+
+
+def station_data_scopes(station_id: Optional[str] = None) -> Tuple[tuple, ...]:
+    """Ámbitos de las consultas de station_data: la estación filtrada o todas."""
+    return (station_scope(station_id) if station_id else STATION_DATA, STATION_DATA_PURGE)
+
+
+class VersionCounters:
+    """Contadores por ámbito (estación, usuario...) que incrementan las escrituras."""
+
+    def __init__(self):
+        self._versions: Dict[tuple, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def bump(self, *scopes: tuple) -> None:
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] += 1
+
+    def get(self, scope: tuple) -> int:
+        return self._versions.get(scope, 0)
+
+
+class CacheLookup:
+    """Resultado de ResponseCache.lookup: la respuesta cacheada, o lo necesario para guardarla."""
+
+    __slots__ = ("cache", "key", "etag", "response")
+
+    def __init__(self, cache: "ResponseCache", key: tuple, etag: str, response: Optional[Response] = None):
+        self.cache = cache
+        self.key = key
+        self.etag = etag
+        self.response = response
+
+    def store(self, adapter: TypeAdapter, content: Any, response: Optional[Response] = None) -> Response:
+        """Serializa el contenido, lo guarda en el LRU y lo devuelve con su ETag."""
+        # Igual que FastAPI con response_model: validar (from_attributes) y luego serializar
+        return self.store_encoded(adapter.dump_json(adapter.validate_python(content, from_attributes=True)), response)
+
+    def store_encoded(self, body: bytes, response: Optional[Response] = None) -> Response:
+        """Como store(), para un cuerpo JSON ya codificado (p. ej. con orjson)."""
+        # Cabeceras puestas por el endpoint en su Response (p. ej. X-Next-Cursor)
+        headers = dict(response.headers) if response is not None else {}
+        self.cache.put(self.key, self.etag, body, headers)
+        return self.cache.build_response(body, self.etag, headers)
+
+
+class ResponseCache:
+    """
+    Cache de respuestas GET con ETag. El ETag se calcula solo con los
+    contadores de versión de los ámbitos de la ruta, así que un
+    If-None-Match vigente se responde con 304 sin tocar la DB, y una URL
+    repetida se sirve desde el LRU de cuerpos ya serializados.
+    Con `ttl` > 0 los ETag caducan cada `ttl` segundos: acota cuánto puede
+    tardar un worker en ver las escrituras hechas por otro.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 5.0, max_body_bytes: int = 1 << 20):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_body_bytes = max_body_bytes
+        self.versions = VersionCounters()
+        # Distingue los ETag de cada proceso: los contadores son locales
+        self._epoch = os.urandom(4).hex()
+        self._entries: "OrderedDict[tuple, Tuple[str, bytes, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.not_modified = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _etag(self, key: tuple, scopes: Tuple[tuple, ...]) -> str:
+        parts = [self._epoch, *(str(self.versions.get(scope)) for scope in scopes)]
+        if self.ttl > 0:
+            parts.append(str(int(time.monotonic() // self.ttl)))
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=6).hexdigest()
+        return f'W/"{"-".join(parts)}-{digest}"'
+
+    def lookup(self, request: Request, scopes: Tuple[tuple, ...]) -> CacheLookup:
+        # La versión se lee antes de consultar: una escritura concurrente solo deja una entrada obsoleta inalcanzable
+        key = (request.url.path, request.url.query)
+        etag = self._etag(key, scopes)
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+            with self._lock:
+                self.not_modified += 1
+            return CacheLookup(self, key, etag, Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "no-cache"}
+            ))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == etag:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return CacheLookup(self, key, etag, self.build_response(entry[1], etag, entry[2]))
+            self.misses += 1
+        return CacheLookup(self, key, etag)
+
+    def put(self, key: tuple, etag: str, body: bytes, headers: dict) -> None:
+        if len(body) > self.max_body_bytes:
+            return
+        with self._lock:
+            self._entries[key] = (etag, body, headers)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def build_response(body: bytes, etag: str, headers: dict) -> Response:
+        return Response(
+            content=body, media_type="application/json",
+            headers={**headers, "ETag": etag, "Cache-Control": "no-cache"}
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.not_modified + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "not_modified": self.not_modified,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.not_modified) / lookups if lookups else 0.0,
+            }
+
+
+response_cache = ResponseCache(
+    maxsize=settings.RESPONSE_CACHE_SIZE,
+    ttl=settings.RESPONSE_CACHE_TTL,
+)
+
+
+def bump_station_data(station_ids) -> None:
+    response_cache.versions.bump(STATION_DATA, *(station_scope(station_id) for station_id in set(station_ids)))
+
+
+def bump_station_data_purge() -> None:
+    response_cache.versions.bump(STATION_DATA_PURGE)
+
+
+def bump_user_station(user_id: int) -> None:
+    # La estación nueva cambia el listado y el has_station del usuario
+    response_cache.versions.bump(USER_STATIONS, user_scope(user_id))
@@ -0,0 +1,333 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select, delete, update, func, and_, tuple_
+from sqlalchemy.orm import Session
+
+from . import models, crud, partitions, archive
+from .config import settings
+from .database import SessionLocal
+from .snapshot import latest_snapshot
+from .response_cache import bump_station_data_purge
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_METRICS = ("temperatura", "humedad", "presion", "indice_uv", "voltaje_mq135")
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _rollup_batch(db: Session, condition) -> int:
+    """
+    Agrega por (estación, hora) las lecturas que cumplen `condition` y las
+    combina con las filas ya existentes de station_data_hourly.
+    Devuelve el número de buckets horarios escritos.
+    """
+    data = models.StationData
+    bucket = crud.bucket_epoch_expression(db.bind.dialect.name, 3600).label("bucket")
+    columns = [data.station_id, bucket, func.count().label("readings")]
+    for metric in ROLLUP_METRICS:
+        column = getattr(data, metric)
+        columns += [
+            func.min(column).label(f"{metric}_min"),
+            func.max(column).label(f"{metric}_max"),
+            func.avg(column).label(f"{metric}_avg"),
+            func.count(column).label(f"{metric}_count"),
+        ]
+    rows = db.execute(select(*columns).where(condition).group_by(data.station_id, bucket)).mappings().all()
+    return _merge_hourly(db, rows)
+
+
+def _merge_hourly(db: Session, rows) -> int:
+    """
+    Combina buckets horarios (station_id, bucket en segundos epoch, readings y
+    {métrica}_min/_max/_avg/_count) con las filas de station_data_hourly.
+    """
+    if not rows:
+        return 0
+
+    def bucket_start(row):
+        return datetime.fromtimestamp(int(row["bucket"]), tz=timezone.utc).replace(tzinfo=None)
+
+    keys = [(row["station_id"], bucket_start(row)) for row in rows]
+    hourly = models.StationDataHourly
+    existing = {
+        (summary.station_id, summary.bucket_start): summary
+        for summary in db.scalars(select(hourly).where(tuple_(hourly.station_id, hourly.bucket_start).in_(keys)))
+    }
+
+    for key, row in zip(keys, rows):
+        summary = existing.get(key)
+        if summary is None:
+            summary = hourly(station_id=key[0], bucket_start=key[1], readings=0)
+            for metric in ROLLUP_METRICS:
+                setattr(summary, f"{metric}_count", 0)
+            db.add(summary)
+        summary.readings += row["readings"]
+        for metric in ROLLUP_METRICS:
+            count = row[f"{metric}_count"]
+            if not count:
+                continue
+            previous = getattr(summary, f"{metric}_count")
+            if previous:
+                setattr(summary, f"{metric}_min", min(getattr(summary, f"{metric}_min"), row[f"{metric}_min"]))
+                setattr(summary, f"{metric}_max", max(getattr(summary, f"{metric}_max"), row[f"{metric}_max"]))
+                setattr(summary, f"{metric}_avg", (
+                    getattr(summary, f"{metric}_avg") * previous + row[f"{metric}_avg"] * count
+                ) / (previous + count))
+            else:
+                setattr(summary, f"{metric}_min", row[f"{metric}_min"])
+                setattr(summary, f"{metric}_max", row[f"{metric}_max"])
+                setattr(summary, f"{metric}_avg", row[f"{metric}_avg"])
+            setattr(summary, f"{metric}_count", previous + count)
+    return len(rows)
+
+
+def create_job(db: Session, days: int, rollup: bool = True, batch_size: Optional[int] = None) -> models.RetentionJob:
+    """Registra un trabajo de retención con el rango de ids a procesar."""
+    cutoff = _utcnow() - timedelta(days=days)
+    min_id, max_id = _id_range(db, cutoff)
+    job = models.RetentionJob(
+        status="pending",
+        cutoff=cutoff,
+        rollup=rollup,
+        batch_size=batch_size or settings.RETENTION_BATCH_SIZE,
+        start_id=min_id,
+        next_id=min_id,
+        max_id=max_id,
+        deleted=0,
+        rolled_up=0,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: int) -> Optional[models.RetentionJob]:
+    return db.get(models.RetentionJob, job_id)
+
+
+def get_active_job(db: Session) -> Optional[models.RetentionJob]:
+    return db.scalar(
+        select(models.RetentionJob).where(models.RetentionJob.status.in_(("pending", "running")))
+        .order_by(models.RetentionJob.job_id)
+    )
+
+
+def _id_range(db: Session, cutoff: datetime):
+    data = models.StationData
+    return db.execute(select(func.min(data.id), func.max(data.id)).where(data.timestamp < cutoff)).one()
+
+
+def _heartbeat(db: Session, job: models.RetentionJob) -> None:
+    """Confirma updated_at: otro worker solo reclama el trabajo tras RETENTION_STALE_SECONDS sin progreso."""
+    job.updated_at = _utcnow()
+    db.commit()
+
+
+def drop_expired_partitions(db: Session, job: models.RetentionJob) -> int:
+    """
+    Con station_data particionada, elimina con DROP TABLE las particiones que
+    quedan enteras antes del corte (tras escribir sus resúmenes horarios) y
+    recalcula el rango de ids: los lotes solo recorren la partición del corte.
+    """
+    data = models.StationData
+    conn = db.connection()
+    if not partitions.is_partitioned(conn):
+        return 0
+    dropped = 0
+    for partition in partitions.expired_partitions(conn, job.cutoff):
+        # Latido antes de cada partición: el resumen y el DROP pueden tardar
+        _heartbeat(db, job)
+        conn = db.connection()
+        if job.rollup:
+            job.rolled_up += _rollup_batch(
+                db, and_(data.timestamp >= partition.lower, data.timestamp < partition.upper)
+            )
+            db.flush()
+        # El resumen, el DROP y el progreso se confirman juntos
+        partitions.drop_partition(conn, partition)
+        job.dropped_partitions += 1
+        job.updated_at = _utcnow()
+        db.commit()
+        conn = db.connection()
+        dropped += 1
+        logger.info("Retention job %s dropped partition %s", job.job_id, partition.name)
+    if dropped:
+        bump_station_data_purge()
+        job.start_id, job.max_id = _id_range(db, job.cutoff)
+        job.next_id = job.start_id
+        db.commit()
+    return dropped
+
+
+def purge_archive(db: Session, job: models.RetentionJob) -> int:
+    """
+    Con ARCHIVE_ENABLED, borra también del archivo Parquet las lecturas
+    anteriores al corte, tras guardar sus resúmenes horarios. Los resúmenes
+    se confirman antes de tocar cada archivo: una interrupción entre ambos
+    puede contar ese mes dos veces, pero no pierde los resúmenes.
+    """
+    if not archive.is_enabled():
+        return 0
+
+    def rollup(station_id: str, table) -> None:
+        buckets = archive.aggregate_table(table, 3600, ROLLUP_METRICS)
+        rows = []
+        for bucket, (readings, metrics) in buckets.items():
+            row = {"station_id": station_id, "bucket": bucket, "readings": readings}
+            for metric, (minimum, maximum, average, count) in metrics.items():
+                row.update({
+                    f"{metric}_min": minimum, f"{metric}_max": maximum,
+                    f"{metric}_avg": average, f"{metric}_count": count,
+                })
+            rows.append(row)
+        job.rolled_up += _merge_hourly(db, rows)
+        _heartbeat(db, job)
+
+    # Latido por archivo con o sin resúmenes: un purgado largo no debe parecer abandonado
+    removed = archive.purge_expired(
+        job.cutoff, on_expired=rollup if job.rollup else None, on_file=lambda: _heartbeat(db, job)
+    )
+    if removed:
+        job.deleted += removed
+        job.updated_at = _utcnow()
+        db.commit()
+        logger.info("Retention job %s removed %s archived readings", job.job_id, removed)
+    return removed
+
+
+def run_batch(db: Session, job: models.RetentionJob) -> bool:
+    """Procesa un lote [next_id, next_id + batch_size). Devuelve True al terminar."""
+    if job.next_id is None or job.max_id is None or job.next_id > job.max_id:
+        return True
+
+    data = models.StationData
+    upper = job.next_id + job.batch_size
+    condition = and_(data.id >= job.next_id, data.id < upper, data.timestamp < job.cutoff)
+
+    # Resumen y borrado del lote en la misma transacción que el avance del progreso
+    rolled_up = _rollup_batch(db, condition) if job.rollup else 0
+    deleted = db.execute(delete(data).where(condition)).rowcount
+
+    job.next_id = upper
+    job.deleted += deleted
+    job.rolled_up += rolled_up
+    job.updated_at = _utcnow()
+    db.commit()
+    if deleted:
+        bump_station_data_purge()
+    return job.next_id > job.max_id
+
+
+class RetentionRunner:
+    """
+    Ejecuta los trabajos de retención en un hilo de fondo, un lote cada vez,
+    con una pausa entre lotes para no competir con la ingesta.
+    """
+
+    def __init__(self, pause_seconds: float = 0.5, stale_seconds: float = 120.0):
+        self.pause_seconds = pause_seconds
+        self.stale_seconds = stale_seconds
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, job_id: int) -> bool:
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(job_id,), name=f"retention-job-{job_id}", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Detiene el hilo tras el lote actual. El trabajo vuelve a 'pending' sin
+        reclamar (updated_at ya vencido) y cualquier worker lo reanuda en su
+        siguiente comprobación.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def resume_interrupted(self) -> Optional[int]:
+        """
+        Reanuda un trabajo pendiente o interrumpido (sin progreso reciente de otro
+        worker). Se llama al arrancar y periódicamente desde el lifespan, así que
+        también recoge los trabajos de un worker que se cayó.
+        """
+        db = SessionLocal()
+        try:
+            job = get_active_job(db)
+            if job is None:
+                return None
+            job_id, seen = job.job_id, job.updated_at
+            if _utcnow() - seen < timedelta(seconds=self.stale_seconds):
+                return None
+            # Reclamar el trabajo: solo un worker gana la actualización condicional
+            claimed = db.execute(
+                update(models.RetentionJob)
+                .where(models.RetentionJob.job_id == job_id, models.RetentionJob.updated_at == seen)
+                .values(updated_at=_utcnow())
+            ).rowcount
+            db.commit()
+        finally:
+            db.close()
+        if claimed == 1 and self.start(job_id):
+            return job_id
+        return None
+
+    def _run(self, job_id: int) -> None:
+        db = SessionLocal()
+        try:
+            job = get_job(db, job_id)
+            job.status = "running"
+            job.updated_at = _utcnow()
+            db.commit()
+            drop_expired_partitions(db, job)
+            purge_archive(db, job)
+            while not self._stop.is_set():
+                if run_batch(db, job):
+                    job.status = "completed"
+                    job.finished_at = _utcnow()
+                    db.commit()
+                    latest_snapshot.discard_older_than(job.cutoff)
+                    logger.info("Retention job %s completed: %s rows deleted", job_id, job.deleted)
+                    break
+                self._stop.wait(self.pause_seconds)
+            else:
+                # Apagado: liberar el trabajo para que otro worker lo continúe sin esperar
+                job.status = "pending"
+                job.updated_at = _utcnow() - timedelta(seconds=self.stale_seconds)
+                db.commit()
+                logger.info("Retention job %s paused at id %s", job_id, job.next_id)
+        except Exception as e:
+            db.rollback()
+            logger.exception("Retention job %s failed", job_id)
+            job = get_job(db, job_id)
+            if job is not None:
+                job.status = "failed"
+                job.error = str(e)
+                job.finished_at = _utcnow()
+                db.commit()
+        finally:
+            db.close()
+
+
+retention_runner = RetentionRunner(
+    pause_seconds=settings.RETENTION_PAUSE_SECONDS,
+    stale_seconds=settings.RETENTION_STALE_SECONDS,
+)
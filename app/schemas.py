@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, Field, EmailStr, ConfigDict, computed_field, model_validator
+from typing import Dict, List, Literal, Optional
 from datetime import datetime
 
 # User schemas
@@ -17,6 +17,11 @@ class User(UserBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+# Esquema para login de usuarios
+class UserLogin(BaseModel):
+    email: str
+    password: str
+
 # UserStation schemas
 class UserStationBase(BaseModel):
     location: str = Field(..., max_length=100)
@@ -31,6 +36,22 @@ class UserStation(UserStationBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+# DeviceKey schemas
+class DeviceKeyCreate(BaseModel):
+    label: Optional[str] = Field(None, max_length=100)
+
+class DeviceKey(BaseModel):
+    key_id: int
+    station_id: str
+    label: Optional[str] = None
+    created_at: datetime
+    revoked_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class DeviceKeyCreated(DeviceKey):
+    api_key: str = Field(..., description="Clave en claro; solo se muestra al crearla")
+
 # StationData schemas (NUEVA ESTRUCTURA)
 class StationDataBase(BaseModel):
     # Datos de ambiente
@@ -56,6 +77,129 @@ class StationData(StationDataBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+# Batch ingestion schemas
+class StationDataBatchItemResult(BaseModel):
+    index: int
+    station_id: str
+    accepted: bool
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class StationDataBatchResult(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[StationDataBatchItemResult]
+
+# Formato de los listados: modelos validados (por defecto), o tuplas codificadas con orjson por filas o por columnas
+StationDataLayout = Literal["model", "rows", "columns"]
+
+# Aggregation schemas
+AggregateBucket = Literal["1m", "5m", "1h", "1d"]
+AggregateMetric = Literal["temperatura", "humedad", "presion", "indice_uv", "voltaje_mq135"]
+
+class MetricAggregate(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+    avg: Optional[float] = None
+
+class StationDataBucket(BaseModel):
+    bucket_start: datetime
+    count: int
+    metrics: Dict[str, MetricAggregate]
+
+class StationDataAggregate(BaseModel):
+    station_id: Optional[str] = None
+    bucket: AggregateBucket
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    buckets: List[StationDataBucket]
+
+# Downsampled series (LTTB)
+class MetricSeries(BaseModel):
+    timestamps: List[datetime]
+    values: List[float]
+
+class StationDataSeries(BaseModel):
+    station_id: str
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    points: int
+    rows: int  # lecturas leídas antes de reducir
+    series: Dict[str, MetricSeries]
+
+# Retention schemas
+class RetentionJob(BaseModel):
+    job_id: int
+    status: str
+    cutoff: datetime
+    rollup: bool
+    batch_size: int
+    start_id: Optional[int] = None
+    next_id: Optional[int] = None
+    max_id: Optional[int] = None
+    deleted: int
+    rolled_up: int
+    dropped_partitions: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @computed_field
+    @property
+    def progress(self) -> float:
+        """Fracción del rango de ids ya procesada (0.0 - 1.0)."""
+        if self.status == "completed" or self.max_id is None or self.start_id is None:
+            return 1.0 if self.status == "completed" else 0.0
+        total = self.max_id - self.start_id + 1
+        return min(1.0, max(0.0, (self.next_id - self.start_id) / total))
+
+# Alert schemas
+AlertRuleKind = Literal["threshold", "rate", "count"]
+AlertMetric = Literal["temperatura", "humedad", "presion", "gas_detectado", "voltaje_mq135", "indice_uv"]
+AlertOperator = Literal[">", ">=", "<", "<=", "==", "!="]
+
+class AlertRuleBase(BaseModel):
+    name: Optional[str] = Field(None, max_length=100)
+    metric: AlertMetric
+    kind: AlertRuleKind = Field("threshold", description="threshold: valor; rate: cambio por minuto; count: N de las últimas M lecturas")
+    operator: AlertOperator = ">"
+    value: float = Field(..., description="Umbral (gas_detectado: 1 = True)")
+    window: Optional[int] = Field(None, ge=1, le=1000, description="count: últimas M lecturas")
+    min_count: Optional[int] = Field(None, ge=1, description="count: lecturas que deben cumplir la condición")
+
+class AlertRuleCreate(AlertRuleBase):
+    @model_validator(mode="after")
+    def check_count_window(self):
+        if self.kind == "count" and (self.window is None or self.min_count is None or self.min_count > self.window):
+            raise ValueError("count rules need window and min_count, with min_count <= window")
+        return self
+
+class AlertRule(AlertRuleBase):
+    rule_id: int
+    station_id: str
+    created_at: datetime
+    deleted_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class Alert(BaseModel):
+    alert_id: int
+    rule_id: int
+    station_id: str
+    metric: str
+    kind: str
+    observed: Optional[float] = None
+    threshold: float
+    detail: Optional[str] = None
+    reading_id: Optional[int] = None
+    triggered_at: datetime
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
 # Token schemas
 class Token(BaseModel):
     access_token: str
@@ -1,27 +1,68 @@
+import asyncio
+import hmac
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Header, Depends
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from .config import settings
 from .database import get_db
-from . import crud
-
-# Contexto para el hashing de contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from . import crud, hashing, schemas
+from .cache import token_cache
 
 ## Funciones para el Hashing de Contraseñas
 def hash_password(password: str) -> str:
     """Hashea una contraseña para almacenarla de forma segura."""
-    return pwd_context.hash(password)
+    return hashing.hash_password(password, settings.BCRYPT_ROUNDS)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica una contraseña en texto plano con su versión hasheada."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing.verify_password(plain_password, hashed_password, settings.BCRYPT_ROUNDS)
+
+## Pool dedicado para bcrypt (~250 ms de CPU por llamada), fuera del event loop
+_password_executor: Optional[Executor] = None
+
+def get_password_executor() -> Executor:
+    global _password_executor
+    if _password_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _password_executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            _password_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+            )
+    return _password_executor
+
+def shutdown_password_executor() -> None:
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=True, cancel_futures=True)
+        _password_executor = None
+
+async def hash_password_async(password: str) -> str:
+    """Versión async de hash_password: se ejecuta en el pool dedicado."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_password_executor(), hashing.hash_password, password, settings.BCRYPT_ROUNDS
+    )
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica la contraseña en el pool dedicado. Si es correcta pero el hash
+    se generó con otro coste, devuelve también el hash actualizado.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_password_executor(), hashing.verify_and_update, plain_password, hashed_password, settings.BCRYPT_ROUNDS
+    )
 
 ## Funciones para JWT y Autenticación
+# Claim 'typ' de los tokens emitidos por /auth/login; get_current_user solo acepta estos
+# (los de POST /token llevan un device_id cualquiera en 'sub', sin autenticar)
+USER_TOKEN_TYPE = "user"
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -33,67 +74,100 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str):
+def decode_token(token: str) -> dict:
+    """Verifica firma y expiración del JWT (única llamada a python-jose por token)."""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        device_id: str = payload.get("sub")
-        if device_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-            )
-        return device_id
     except JWTError:
+        payload = None
+    if not payload or payload.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
+    return payload
+
+def verify_token(token: str):
+    return decode_token(token)["sub"]
+
+def get_bearer_token(authorization: str = Header(None)) -> str:
+    """Extrae el JWT del header 'Authorization: Bearer <token>'."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
         )
+    return token
 
 # Función para verificar API Key desde header Authorization
-def verify_api_key(authorization: str = Header(None)):
+def verify_api_key(authorization: str = Header(None), db: Session = Depends(get_db)) -> Optional[str]:
     """
     Verifica la API key enviada en el header Authorization.
     El ESP32 envía el token directamente sin el prefijo "Bearer".
+    Con una clave de dispositivo devuelve el station_id asociado (lookup en
+    memoria por hash); con la API key global devuelve None.
     """
+    require_authorization(authorization)
+    return resolve_api_key(authorization, crud.lookup_device_key(db, authorization))
+
+def require_authorization(authorization: Optional[str]) -> None:
     if not authorization:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Authorization header missing"
         )
-    
-    # Verificar si la API key coincide
-    if authorization != settings.API_KEY:
+
+def resolve_api_key(authorization: str, device_station_id: Optional[str]) -> Optional[str]:
+    """Resultado de verify_api_key según la estación de la clave de dispositivo (None si no lo es)."""
+    if device_station_id is not None:
+        return device_station_id
+
+    # API key global compartida (comparación en tiempo constante)
+    if settings.SHARED_API_KEY_ENABLED and hmac.compare_digest(authorization.encode(), settings.API_KEY.encode()):
+        return None
+
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid API Key"
+    )
+
+def check_device_station(device_station_id: Optional[str], station_id: str) -> None:
+    """Una clave de dispositivo solo puede enviar lecturas de su propia estación."""
+    if device_station_id is not None and device_station_id != station_id:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid API Key"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Device key is not valid for station {station_id}"
         )
-    
-    return authorization
 
 # Función de Dependencia para obtener el usuario actual
-def get_current_user(token: str = Depends(verify_token), db: Session = Depends(get_db)):
+def get_current_user(token: str = Depends(get_bearer_token), db: Session = Depends(get_db)) -> schemas.User:
     """
     Obtiene el usuario actual basado en el token JWT.
-    Requiere que el token tenga el email del usuario en 'sub'
+    Requiere un token de /auth/login (typ=user) con el email del usuario en 'sub'.
+    Los tokens ya verificados se sirven desde token_cache, sin decodificar
+    de nuevo ni consultar la DB; la entrada caduca con el 'exp' del token.
     """
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-            )
-        
-        user = crud.get_user_by_email(db, email=email)
-        if not user:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-        return user
-    except JWTError:
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached[1]
+
+    payload = decode_token(token)
+    if payload.get("typ") != USER_TOKEN_TYPE:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
         )
+    email: str = payload["sub"]
+    user = crud.get_user_by_email(db, email=email)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    # Proyección sin estado: no depende de la sesión que la cargó
+    current_user = schemas.User.model_validate(user)
+    token_cache.set(token, payload, current_user, subject=email)
+    return current_user
 
 ## Función para verificar credenciales de usuario
 def authenticate_user(email: str, password: str, db: Session):
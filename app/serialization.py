@@ -0,0 +1,42 @@
+"""
+Serialización rápida de los listados de station_data (`?layout=rows|columns`).
+
+La ruta por defecto carga objetos ORM, los valida con schemas.StationData
+(from_attributes) y luego los codifica. Aquí la consulta devuelve solo las
+columnas como tuplas y orjson las codifica directamente, sin modelos de
+pydantic por fila:
+
+    rows     [{"id": 1, "station_id": "a1", "timestamp": "...", ...}, ...]
+    columns  {"id": [1, 2], "station_id": ["a1", "a1"], "timestamp": [...], ...}
+
+El layout por columnas repite cada nombre de campo una sola vez y es el que
+esperan las librerías de gráficas del dashboard.
+"""
+from typing import Callable, Dict, Sequence
+
+import orjson
+
+from .crud import STATION_DATA_COLUMNS
+
+# Fechas con "Z" para UTC, como las serializa pydantic
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+def encode_rows(rows: Sequence[tuple]) -> bytes:
+    return orjson.dumps([dict(zip(STATION_DATA_COLUMNS, row)) for row in rows], option=ORJSON_OPTIONS)
+
+
+def encode_columns(rows: Sequence[tuple]) -> bytes:
+    # zip(*rows) traspone las filas; sin filas, cada columna es una lista vacía
+    columns = list(zip(*rows)) or [()] * len(STATION_DATA_COLUMNS)
+    return orjson.dumps(dict(zip(STATION_DATA_COLUMNS, columns)), option=ORJSON_OPTIONS)
+
+
+ENCODERS: Dict[str, Callable[[Sequence[tuple]], bytes]] = {
+    "rows": encode_rows,
+    "columns": encode_columns,
+}
+
+
+def encode_station_data(layout: str, rows: Sequence[tuple]) -> bytes:
+    return ENCODERS[layout](rows)
@@ -0,0 +1,107 @@
+"""
+Lanzador de producción: varios workers de uvicorn sobre los núcleos disponibles.
+
+    python -m app.server --workers 4 --port 8000
+
+1. Prepara el esquema una sola vez (migraciones o RECREATE_TABLES) antes de
+   arrancar los workers, que lo encuentran ya al día.
+2. Exporta WEB_CONCURRENCY para que cada worker reparta DB_MAX_CONNECTIONS
+   entre todos al dimensionar su pool (app/database.py).
+3. Arranca uvicorn con N procesos. Cada worker llena su pool y carga los
+   caches en el lifespan antes de aceptar conexiones; GET /health/ready
+   responde 200 a partir de entonces.
+
+Por defecto arranca un worker (WEB_CONCURRENCY si está definida; --workers 0
+usa uno por núcleo disponible) y el puerto de PORT. Con más de un worker
+exige LIVE_BROKER=postgres (feed en vivo, reglas de alerta y /stations/latest
+ven las lecturas de todos) y, con las métricas activas, PROMETHEUS_MULTIPROC_DIR
+(/metrics suma todos los workers).
+"""
+import argparse
+import os
+import shutil
+
+
+def available_cores() -> int:
+    # sched_getaffinity respeta los núcleos asignados al contenedor/proceso
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def multi_worker_problems(settings) -> list:
+    """Configuración que no funciona repartida entre varios procesos."""
+    problems = []
+    if settings.LIVE_BROKER != "postgres":
+        problems.append(
+            "LIVE_BROKER=postgres (with the memory broker each worker only sees its own readings: "
+            "live feeds miss readings, alert rules see part of them and /stations/latest goes stale)"
+        )
+    if settings.METRICS_ENABLED and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        problems.append("PROMETHEUS_MULTIPROC_DIR (otherwise each /metrics scrape covers a single worker)")
+    return problems
+
+
+def prepare_multiprocess_dir() -> None:
+    """Vacía PROMETHEUS_MULTIPROC_DIR: los archivos de una ejecución anterior sumarían contadores viejos."""
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        return
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lanzador multi-worker de la API")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 1)),
+                        help="Procesos de uvicorn (0 = uno por núcleo disponible)")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--graceful-shutdown", type=float, default=30.0,
+                        help="Segundos para terminar las peticiones en curso al apagar")
+    args = parser.parse_args()
+    workers = args.workers or available_cores()
+
+    # Antes de importar app: la configuración de los workers se lee de estas variables
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+
+    from .config import settings
+
+    if workers > 1:
+        problems = multi_worker_problems(settings)
+        if problems:
+            parser.error(f"{workers} workers need " + " and ".join(problems))
+        prepare_multiprocess_dir()
+        print(
+            f"Starting {workers} workers: alert rules are evaluated by one worker at a time "
+            f"(the others take over within ALERT_LEADER_POLL_SECONDS={settings.ALERT_LEADER_POLL_SECONDS:g}); "
+            f"rules created through another worker apply after up to "
+            f"ALERT_RULE_REFRESH_SECONDS={settings.ALERT_RULE_REFRESH_SECONDS:g}"
+        )
+
+    from .database import engine
+    from .migrations import setup_schema
+
+    setup_schema(allow_reset=True)
+    # Los workers abren sus propias conexiones: no dejar la del lanzador abierta
+    engine.dispose()
+    # El esquema ya está listo: los workers no repiten las migraciones
+    os.environ["RUN_MIGRATIONS_ON_STARTUP"] = "false"
+    os.environ["RECREATE_TABLES"] = "false"
+
+    import uvicorn
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        log_level=args.log_level,
+        proxy_headers=True,
+        timeout_graceful_shutdown=args.graceful_shutdown,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from .config import settings
+
+
+def _reading_key(reading: dict):
+    timestamp = reading["timestamp"]
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp, reading["id"]
+
+
+class LatestReadingSnapshot:
+    """
+    Última lectura de cada estación, mantenida en memoria.
+    La ruta de ingesta la actualiza en cada escritura; se carga con una sola
+    consulta al arrancar y una tarea de fondo la refresca cada
+    refresh_seconds (lo escrito por otros workers), nunca una petición.
+    Leerla es O(estaciones), sin recorrer la tabla.
+    """
+
+    def __init__(self, refresh_seconds: float = 60.0):
+        self.refresh_seconds = refresh_seconds
+        self._readings: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+
+    def is_cold(self) -> bool:
+        return self._loaded_at is None
+
+    def load(self, readings: Iterable[dict]) -> None:
+        """
+        Combina una consulta completa con el snapshot: por estación gana la
+        lectura más nueva (las que llegaron mientras se consultaba la DB) y las
+        estaciones que no vienen en la consulta se conservan; solo las quita
+        discard_older_than, tras la retención.
+        """
+        with self._lock:
+            self._merge(readings)
+            self._loaded_at = time.monotonic()
+
+    def update(self, readings: Iterable[dict]) -> None:
+        with self._lock:
+            self._merge(readings)
+
+    def _merge(self, readings: Iterable[dict]) -> None:
+        for reading in readings:
+            current = self._readings.get(reading["station_id"])
+            if current is None or _reading_key(reading) > _reading_key(current):
+                self._readings[reading["station_id"]] = reading
+
+    def discard_older_than(self, cutoff: datetime) -> None:
+        cutoff_key = _reading_key({"timestamp": cutoff, "id": 0})
+        with self._lock:
+            self._readings = {
+                station_id: reading for station_id, reading in self._readings.items()
+                if _reading_key(reading) >= cutoff_key
+            }
+
+    def get(self, station_ids: Optional[List[str]] = None) -> List[dict]:
+        with self._lock:
+            if station_ids is None:
+                return list(self._readings.values())
+            return [self._readings[station_id] for station_id in station_ids if station_id in self._readings]
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._readings = {}
+            self._loaded_at = None
+
+
+latest_snapshot = LatestReadingSnapshot(refresh_seconds=settings.LATEST_SNAPSHOT_REFRESH_SECONDS)
@@ -0,0 +1,132 @@
+"""
+Coste del motor de reglas de alerta (app/alerts.py) en la ingesta: lecturas y
+evaluaciones de reglas por segundo con decenas de miles de reglas cargadas, y
+latencia de crud.create_station_data_batch sin reglas frente a con reglas.
+
+    python -m benchmarks.bench_alerts --stations 1000 --rules-per-station 20 --readings 200000
+
+Las reglas se reparten entre los tres tipos (threshold, rate y count) sobre
+temperatura, humedad y presion. La parte de ingesta usa un archivo SQLite
+temporal (o --database-url, con la base vacía) y el hilo que guarda las
+alertas en marcha, como en la app. Las lecturas aleatorias son independientes
+entre sí, así que las reglas se disparan mucho más que con datos reales: el
+coste de guardar las alertas es el del peor caso.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from .common import configure_environment, random_reading, seed_database, station_ids, time_call, write_results
+
+METRICS = ["temperatura", "humedad", "presion"]
+BOUNDS = {"temperatura": (-5, 40), "humedad": (10, 95), "presion": (950, 1050)}
+
+
+def make_rules(stations, per_station, rng):
+    """Filas con la forma de models.AlertRule (sin base de datos)."""
+    now = datetime(2026, 1, 1)
+    rules = []
+    for station_id in stations:
+        for index in range(per_station):
+            metric = METRICS[index % len(METRICS)]
+            low, high = BOUNDS[metric]
+            kind = ("threshold", "rate", "count")[index % 3]
+            rules.append(SimpleNamespace(
+                rule_id=len(rules) + 1,
+                station_id=station_id,
+                metric=metric,
+                kind=kind,
+                operator=rng.choice([">", "<"]),
+                value=rng.uniform(-2, 2) if kind == "rate" else rng.uniform(low, high),
+                window=10 if kind == "count" else None,
+                min_count=5 if kind == "count" else None,
+                deleted_at=None,
+                updated_at=now,
+            ))
+    return rules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--stations", type=int, default=1000)
+    parser.add_argument("--rules-per-station", type=int, default=20)
+    parser.add_argument("--readings", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=100, help="Lecturas por lote en la parte de ingesta")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        workdir = tempfile.mkdtemp(prefix="bench_alerts_")
+        database_url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    configure_environment(database_url, ALERT_RULE_REFRESH_SECONDS="0", ALERT_QUEUE_SIZE="1000000")
+
+    from alembic import command
+    from sqlalchemy import insert
+    from app import crud, models
+    from app.alerts import AlertEngine, alert_engine, alert_worker
+    from app.database import SessionLocal, engine
+    from app.migrations import alembic_config
+
+    rng = random.Random(42)
+    stations = station_ids(args.stations)
+    rules = make_rules(stations, args.rules_per_station, rng)
+
+    # Motor aislado: lecturas con timestamps crecientes, repartidas entre las estaciones
+    started_at = datetime(2026, 1, 1)
+    readings = []
+    for index in range(args.readings):
+        reading = random_reading(rng)
+        reading.update(id=index + 1, station_id=rng.choice(stations), timestamp=started_at + timedelta(seconds=index))
+        readings.append(reading)
+    rule_engine = AlertEngine(refresh_seconds=0)
+    started = time.perf_counter()
+    rule_engine.apply(rules)
+    load_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    fired = rule_engine.evaluate(readings)
+    elapsed = time.perf_counter() - started
+    results = {
+        "rules": len(rules),
+        "stations": args.stations,
+        "engine": {
+            "load_ms": load_seconds * 1000,
+            "readings_per_second": args.readings / elapsed,
+            "rule_evaluations_per_second": rule_engine.evaluated / elapsed,
+            "us_per_reading": elapsed / args.readings * 1e6,
+            "alerts_fired": len(fired),
+        },
+    }
+
+    # Ingesta por lotes contra la base, sin reglas y con todas las reglas cargadas
+    command.upgrade(alembic_config(), "head")
+    seed_database(engine, users=10, stations=args.stations, readings=0)
+
+    def insert_batch():
+        batch = [{**random_reading(rng), "station_id": rng.choice(stations)} for _ in range(args.batch_size)]
+        with SessionLocal() as db:
+            crud.create_station_data_batch(db, batch)
+
+    alert_worker.start()
+    results["ingest"] = {"batch_size": args.batch_size, "without_rules": time_call(insert_batch, repeat=args.repeat)}
+    # rule_id de las filas en memoria: el FK de alerts exige guardar las reglas
+    with engine.begin() as conn:
+        conn.execute(insert(models.AlertRule), [
+            {**vars(rule), "created_at": rule.updated_at} for rule in rules
+        ])
+    alert_engine.apply(rules)
+    results["ingest"]["with_rules"] = time_call(insert_batch, repeat=args.repeat)
+    alert_worker.stop()
+    results["ingest"]["alerts"] = alert_worker.stats()
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Coste de decodificar y validar lecturas en POST /station-data: cuerpo JSON
+(una lectura, StationDataCreate.model_validate_json) frente al formato
+binario de app/payloads.py con 1, 10 o 100 registros por cuerpo.
+
+    python -m benchmarks.bench_binary_ingest --records 20000 --per-body 1 10 100
+
+Se mide el parseo y la validación hasta obtener la fila a insertar (sin
+HTTP ni base de datos), en microsegundos por lectura, junto con los bytes
+por lectura de cada formato.
+"""
+import argparse
+import json
+import random
+import time
+
+from .common import random_reading, write_results
+
+
+def per_record(fn, bodies, records, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for body in bodies:
+            fn(body)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "us_per_record": best / records * 1e6,
+        "records_per_second": records / best,
+        "bytes_per_record": sum(len(body) for body in bodies) / records,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--per-body", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=5, help="Se reporta la mejor de N pasadas")
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    from app import schemas
+    from app.payloads import decode_readings, encode_readings
+
+    rng = random.Random(42)
+    station_id = "a1b2c3d4e5f6"
+    readings = [random_reading(rng) for _ in range(args.records)]
+
+    def decode_json(body):
+        # Ruta JSON: validación de pydantic y model_dump() en partition_batch
+        return schemas.StationDataCreate.model_validate_json(body).model_dump()
+
+    json_bodies = [json.dumps({**reading, "station_id": station_id}).encode() for reading in readings]
+    results = {
+        "records": args.records,
+        "json": per_record(decode_json, json_bodies, args.records, args.repeat),
+        "binary": {},
+    }
+    for size in args.per_body:
+        bodies = [encode_readings(station_id, readings[start:start + size]) for start in range(0, args.records, size)]
+        results["binary"][str(size)] = per_record(decode_readings, bodies, args.records, args.repeat)
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
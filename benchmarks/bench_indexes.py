@@ -0,0 +1,102 @@
+"""
+Planes de ejecución y latencia de las consultas de station_data antes y
+después de los índices de la migración 0002.
+
+    python -m benchmarks.bench_indexes --rows 10000000 --output indexes.json
+
+Con --database-url apunta a PostgreSQL (la base debe estar vacía); por
+defecto usa un archivo SQLite temporal.
+"""
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from .common import configure_environment, explain, seed_database, station_ids, time_call, write_results
+
+
+def hot_queries(station_id, now):
+    """Las consultas de crud.py que dependen de los nuevos índices."""
+    from sqlalchemy import select, delete
+    from app import models, crud
+
+    return {
+        # GET /station-data?station_id=...  y  /station-data/latest?station_id=...
+        "latest_by_station": crud.filter_station_data(
+            select(models.StationData), station_id=station_id
+        ).limit(100),
+        # GET /station-data?station_id=...&start_time=...&end_time=...
+        "range_by_station": crud.filter_station_data(
+            select(models.StationData), station_id=station_id,
+            start_time=now - timedelta(days=7), end_time=now - timedelta(days=6)
+        ).limit(100),
+        # GET /station-data?start_time=... (todas las estaciones)
+        "recent_all_stations": crud.filter_station_data(
+            select(models.StationData), start_time=now - timedelta(hours=1)
+        ).limit(100),
+        # DELETE /station-data/cleanup (solo se mide el plan, no se ejecuta)
+        "cleanup_older_than_30d": delete(models.StationData).where(
+            models.StationData.timestamp < now - timedelta(days=30)
+        ),
+    }
+
+
+def measure(engine, queries, repeat):
+    results = {}
+    with engine.connect() as conn:
+        for name, statement in queries.items():
+            entry = {"plan": explain(conn, statement)}
+            if statement.is_select:
+                entry["latency"] = time_call(lambda: conn.execute(statement).all(), repeat=repeat)
+            results[name] = entry
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--stations", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    workdir = None
+    database_url = args.database_url
+    if database_url is None:
+        workdir = tempfile.mkdtemp(prefix="bench_indexes_")
+        database_url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    configure_environment(database_url)
+
+    from alembic import command
+    from app.database import engine
+    from app.migrations import alembic_config
+
+    config = alembic_config()
+    command.upgrade(config, "0001")
+    seed_database(engine, users=args.users, stations=args.stations, readings=args.rows)
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    queries = hot_queries(station_ids(args.stations)[0], now)
+
+    results = {
+        "database": engine.dialect.name,
+        "rows": args.rows,
+        "stations": args.stations,
+        "before": measure(engine, queries, args.repeat),
+    }
+    command.upgrade(config, "0002")
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("ANALYZE station_data")
+    else:
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+    results["after"] = measure(engine, queries, args.repeat)
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Prueba de carga de las rutas de ingesta y consulta con muchos clientes
+simulados (ESP32 que envían lecturas y dashboards que consultan).
+
+    python -m benchmarks.bench_load --readings 1000000 --clients 50 --duration 20 --output load.json
+
+Siembra una base SQLite temporal (o --database-url, que debe estar vacía)
+con --users/--stations/--readings y lanza cada escenario durante --duration
+segundos con --clients clientes concurrentes. Por defecto la app corre en el
+mismo proceso (httpx.ASGITransport, con su lifespan); con --base-url se ataca
+un servidor ya arrancado contra la misma base (--skip-seed si ya está sembrada).
+
+Los resultados (p50/p95/p99, peticiones/s, códigos de estado y el commit
+medido) se escriben en JSON. Para comparar dos ejecuciones:
+
+    python -m benchmarks.bench_load --compare before.json after.json --threshold 0.1
+
+que termina con código 1 si algún escenario empeora más que el umbral en
+throughput o en p95.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from .common import configure_environment, random_reading, seed_database, station_ids, summarize, write_results
+
+SCENARIOS = (
+    "ingest_json", "ingest_root", "ingest_binary",
+    "query_recent", "query_deep_page", "query_time_range", "latest", "login",
+)
+LOGIN_EMAIL = "load-test@bench.local"
+LOGIN_PASSWORD = "load-test-password"
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def seed_login_user(engine, user_id: int, rounds: int) -> None:
+    """Usuario con contraseña real: el escenario de login mide bcrypt con BCRYPT_ROUNDS."""
+    from sqlalchemy import insert
+    from app import hashing, models
+
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [{
+            "user_id": user_id, "email": LOGIN_EMAIL, "username": "load-test", "full_name": "Load Test",
+            "password": hashing.hash_password(LOGIN_PASSWORD, rounds), "has_station": False,
+        }])
+
+
+def build_request(scenario: str, rng: random.Random, ids, args, api_key: str):
+    """(método, url, kwargs de httpx) de una petición del escenario, con parámetros aleatorios."""
+    from app.payloads import BINARY_MEDIA_TYPE, encode_readings
+
+    station_id = rng.choice(ids)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    headers = {"Authorization": api_key}
+    if scenario == "ingest_json":
+        return "POST", "/station-data", {"json": {**random_reading(rng), "station_id": station_id}, "headers": headers}
+    if scenario == "ingest_root":
+        return "POST", "/", {"json": {**random_reading(rng), "station_id": station_id}, "headers": headers}
+    if scenario == "ingest_binary":
+        body = encode_readings(station_id, [random_reading(rng) for _ in range(args.binary_records)])
+        return "POST", "/station-data", {
+            "content": body, "headers": {**headers, "Content-Type": BINARY_MEDIA_TYPE}
+        }
+    if scenario == "query_recent":
+        return "GET", "/station-data", {"params": {"station_id": station_id, "limit": args.page_size}}
+    if scenario == "query_deep_page":
+        skip = rng.randint(args.deep_offset // 2, args.deep_offset)
+        return "GET", "/station-data", {"params": {"station_id": station_id, "skip": skip, "limit": args.page_size}}
+    if scenario == "query_time_range":
+        end = now - timedelta(days=rng.uniform(0, args.days - 1))
+        return "GET", "/station-data", {"params": {
+            "station_id": station_id, "limit": args.page_size,
+            "start_time": (end - timedelta(days=1)).isoformat(), "end_time": end.isoformat(),
+        }}
+    if scenario == "latest":
+        return "GET", "/station-data/latest", {"params": {"station_id": station_id, "limit": 10}}
+    if scenario == "login":
+        return "POST", "/auth/login", {"json": {"email": LOGIN_EMAIL, "password": LOGIN_PASSWORD}}
+    raise ValueError(f"Unknown scenario {scenario}")
+
+
+async def run_scenario(client, scenario: str, ids, args, api_key: str) -> dict:
+    latencies = []
+    statuses = Counter()
+    deadline = time.perf_counter() + args.duration
+
+    async def simulated_client(index: int):
+        rng = random.Random(f"{scenario}-{index}")
+        while time.perf_counter() < deadline:
+            method, url, kwargs = build_request(scenario, rng, ids, args, api_key)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                statuses[str(response.status_code)] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(simulated_client(index) for index in range(args.clients)))
+    elapsed = time.perf_counter() - started
+    errors = sum(count for code, count in statuses.items() if not code.startswith("2"))
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": len(latencies) / elapsed,
+        "status_codes": dict(statuses),
+        "latency": summarize(latencies),
+    }
+
+
+async def run_all(args, ids, api_key: str) -> dict:
+    import httpx
+
+    if args.base_url:
+        transport, lifespan, base_url = None, None, args.base_url
+    else:
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        lifespan = app.router.lifespan_context(app)
+        base_url = "http://bench"
+
+    results = {}
+    if lifespan is not None:
+        await lifespan.__aenter__()
+    try:
+        limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=60) as client:
+            for scenario in args.scenarios:
+                results[scenario] = await run_scenario(client, scenario, ids, args, api_key)
+                print(f"{scenario}: {results[scenario]['requests_per_second']:.1f} req/s, "
+                      f"p95 {results[scenario]['latency']['p95_ms']:.1f} ms", file=sys.stderr)
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+    return results
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> dict:
+    """Cambio relativo de throughput y p95 por escenario; regresión si empeora más que `threshold`."""
+    report = {}
+    for scenario, after in current["scenarios"].items():
+        before = baseline["scenarios"].get(scenario)
+        if before is None:
+            continue
+        throughput = after["requests_per_second"] / before["requests_per_second"] - 1
+        p95 = after["latency"]["p95_ms"] / before["latency"]["p95_ms"] - 1 if before["latency"]["p95_ms"] else 0.0
+        report[scenario] = {
+            "throughput_change": throughput,
+            "p95_change": p95,
+            "regression": throughput < -threshold or p95 > threshold,
+        }
+    return {
+        "baseline_commit": baseline.get("commit"),
+        "current_commit": current.get("commit"),
+        "threshold": threshold,
+        "scenarios": report,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--base-url", default=None, help="Servidor ya arrancado (por defecto la app en proceso)")
+    parser.add_argument("--api-key", default=None, help="Clave de ingesta (por defecto API_KEY del benchmark)")
+    parser.add_argument("--skip-seed", action="store_true", help="Reutilizar una base ya sembrada")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--stations", type=int, default=200)
+    parser.add_argument("--readings", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=30, help="Días que cubren las lecturas sembradas")
+    parser.add_argument("--clients", type=int, default=50, help="Clientes concurrentes por escenario")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por escenario")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--deep-offset", type=int, default=500, help="skip máximo de query_deep_page")
+    parser.add_argument("--binary-records", type=int, default=10, help="Lecturas por cuerpo en ingest_binary")
+    parser.add_argument("--bcrypt-rounds", type=int, default=None)
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="Comparar dos resultados")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as baseline, open(args.compare[1]) as current:
+            report = compare(json.load(baseline), json.load(current), args.threshold)
+        write_results(report, args.output)
+        sys.exit(1 if any(entry["regression"] for entry in report["scenarios"].values()) else 0)
+
+    database_url = args.database_url
+    if database_url is None:
+        workdir = tempfile.mkdtemp(prefix="bench_load_")
+        database_url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    overrides = {"BCRYPT_ROUNDS": args.bcrypt_rounds} if args.bcrypt_rounds is not None else {}
+    configure_environment(database_url, **overrides)
+
+    from alembic import command
+    from app.config import settings
+    from app.database import engine
+    from app.migrations import alembic_config
+
+    if not args.skip_seed:
+        command.upgrade(alembic_config(), "head")
+        seed_database(engine, users=args.users, stations=args.stations, readings=args.readings, days=args.days)
+        seed_login_user(engine, user_id=args.users + 1, rounds=settings.BCRYPT_ROUNDS)
+
+    results = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "database": engine.dialect.name,
+        "target": args.base_url or "in-process",
+        "config": {
+            key: getattr(args, key) for key in (
+                "users", "stations", "readings", "days", "clients", "duration",
+                "page_size", "deep_offset", "binary_records",
+            )
+        },
+        "scenarios": asyncio.run(run_all(args, station_ids(args.stations), args.api_key or settings.API_KEY)),
+    }
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Throughput de verificación de contraseñas (POST /auth/login) y retraso del
+event loop según dónde se ejecute bcrypt: en el propio loop, en el
+threadpool o en un pool de procesos de distinto tamaño.
+
+    python -m benchmarks.bench_password_hashing --logins 64 --rounds 12 --workers 1 2 4 8
+
+El retraso del loop se mide con una corrutina que duerme 10 ms en bucle;
+cualquier exceso sobre esos 10 ms es tiempo en el que el loop no pudo
+atender otras peticiones.
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .common import summarize, write_results
+
+PROBE_INTERVAL = 0.01
+
+
+async def probe_loop_lag(samples, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append(max(0.0, (time.perf_counter() - started - PROBE_INTERVAL) * 1000))
+
+
+async def run_logins(logins: int, password: str, hashed: str, rounds: int, executor=None):
+    from app import hashing
+
+    loop = asyncio.get_running_loop()
+    lag, latencies = [], []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop_lag(lag, stop))
+    await asyncio.sleep(0)
+
+    async def login():
+        started = time.perf_counter()
+        if executor is None:
+            # Verificación directamente en el event loop (comportamiento anterior)
+            hashing.verify_and_update(password, hashed, rounds)
+        else:
+            await loop.run_in_executor(executor, hashing.verify_and_update, password, hashed, rounds)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    return {
+        "logins_per_second": logins / elapsed,
+        "login_latency": summarize(latencies),
+        "event_loop_lag": summarize(lag),
+    }
+
+
+def measure(logins, password, hashed, rounds, mode, workers=None):
+    executor = None
+    if mode == "process":
+        executor = ProcessPoolExecutor(max_workers=workers)
+    elif mode == "thread":
+        executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        if executor is not None:
+            # Arrancar los procesos antes de medir
+            list(executor.map(abs, range(workers)))
+        return asyncio.run(run_logins(logins, password, hashed, rounds, executor))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64, help="Logins concurrentes por escenario")
+    parser.add_argument("--rounds", type=int, default=12, help="Coste de bcrypt (BCRYPT_ROUNDS)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    from app import hashing
+
+    password = "benchmark-password"
+    hashed = hashing.hash_password(password, args.rounds)
+
+    results = {
+        "rounds": args.rounds,
+        "logins": args.logins,
+        "inline": measure(args.logins, password, hashed, args.rounds, "inline"),
+    }
+    for mode in ("thread", "process"):
+        results[mode] = {
+            str(workers): measure(args.logins, password, hashed, args.rounds, mode, workers)
+            for workers in args.workers
+        }
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Filas por segundo de GET /station-data según el layout: la ruta por defecto
+(objetos ORM validados con schemas.StationData y codificados por pydantic)
+frente a las tuplas de columnas codificadas con orjson (layout=rows y
+layout=columns, ver app/serialization.py).
+
+    python -m benchmarks.bench_serialization --rows 200000 --limits 100 1000 10000
+
+Se mide la consulta y la serialización, con una sesión nueva por llamada
+como en get_db (sin HTTP). Con --database-url apunta a PostgreSQL (la base
+debe estar vacía); por defecto usa un archivo SQLite temporal.
+"""
+import argparse
+import os
+import tempfile
+
+from .common import configure_environment, seed_database, time_call, write_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--stations", type=int, default=50)
+    parser.add_argument("--limits", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        workdir = tempfile.mkdtemp(prefix="bench_serialization_")
+        database_url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    configure_environment(database_url)
+
+    from alembic import command
+    from app import crud
+    from app.database import SessionLocal, engine
+    from app.migrations import alembic_config
+    from app.response_cache import STATION_DATA_LIST
+    from app.serialization import encode_station_data
+
+    command.upgrade(alembic_config(), "head")
+    seed_database(engine, users=10, stations=args.stations, readings=args.rows)
+
+    def model_path(limit):
+        with SessionLocal() as db:
+            rows = crud.get_station_data(db, limit=limit)
+            return STATION_DATA_LIST.dump_json(STATION_DATA_LIST.validate_python(rows, from_attributes=True))
+
+    def fast_path(layout):
+        def run(limit):
+            with SessionLocal() as db:
+                return encode_station_data(layout, crud.get_station_data(db, limit=limit, as_tuples=True))
+        return run
+
+    paths = {"model": model_path, "rows": fast_path("rows"), "columns": fast_path("columns")}
+    results = {"database": engine.dialect.name, "rows": args.rows, "limits": {}}
+    for limit in args.limits:
+        entry = {}
+        for name, path in paths.items():
+            latency = time_call(lambda: path(limit), repeat=args.repeat)
+            entry[name] = {
+                "latency": latency,
+                "rows_per_second": limit / (latency["p50_ms"] / 1000),
+                "bytes": len(path(limit)),
+            }
+        results["limits"][str(limit)] = entry
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
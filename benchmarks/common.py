@@ -0,0 +1,133 @@
+"""
+Utilidades compartidas por los benchmarks.
+
+Los módulos de ``app`` leen la configuración al importarse, así que cada
+benchmark llama a ``configure_environment`` antes de importar nada de ``app``.
+"""
+import json
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+
+def configure_environment(database_url: str, **overrides: str) -> None:
+    """Variables mínimas para importar la app contra una base de benchmark."""
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("API_KEY", "benchmark-api-key")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    os.environ.setdefault("RUN_MIGRATIONS_ON_STARTUP", "false")
+    for key, value in overrides.items():
+        os.environ[key] = str(value)
+
+
+def station_ids(count: int) -> List[str]:
+    return [f"{index:08x}" for index in range(1, count + 1)]
+
+
+def random_reading(rng: random.Random) -> Dict:
+    return {
+        "temperatura": round(rng.uniform(-5, 40), 2),
+        "humedad": round(rng.uniform(10, 95), 2),
+        "presion": round(rng.uniform(950, 1050), 2),
+        "gas_detectado": rng.random() < 0.05,
+        "voltaje_mq135": round(rng.uniform(0, 5), 3),
+        "indice_uv": round(rng.uniform(0, 11), 2),
+        "nivel_uv": rng.choice(["Bajo", "Moderado", "Alto"]),
+    }
+
+
+def seed_database(engine, users: int, stations: int, readings: int,
+                  days: int = 365, chunk_size: int = 50000, seed: int = 42,
+                  password_hash: str = "not-a-real-hash") -> None:
+    """
+    Inserta usuarios, estaciones y lecturas repartidas uniformemente en los
+    últimos ``days`` días, en bloques de ``chunk_size`` filas.
+    """
+    from sqlalchemy import insert
+    from app import models
+
+    rng = random.Random(seed)
+    ids = station_ids(stations)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    span = timedelta(days=days).total_seconds()
+
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {
+                "user_id": index,
+                "email": f"user{index}@bench.local",
+                "username": f"user{index}",
+                "password": password_hash,
+                "full_name": f"Bench User {index}",
+                "has_station": True,
+            }
+            for index in range(1, users + 1)
+        ])
+        conn.execute(insert(models.UserStation), [
+            {"station_id": station_id, "location": f"loc-{index}", "user_id": index % users + 1}
+            for index, station_id in enumerate(ids)
+        ])
+
+    remaining = readings
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        rows = []
+        for _ in range(size):
+            row = random_reading(rng)
+            row["station_id"] = rng.choice(ids)
+            row["timestamp"] = now - timedelta(seconds=rng.uniform(0, span))
+            rows.append(row)
+        with engine.begin() as conn:
+            conn.execute(insert(models.StationData), rows)
+        remaining -= size
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+
+    def percentile(p: float) -> float:
+        if not ordered:
+            return 0.0
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) if ordered else 0.0,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1] if ordered else 0.0,
+    }
+
+
+def time_call(fn: Callable[[], object], repeat: int = 20, warmup: int = 2) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def explain(conn, statement) -> List[str]:
+    """Plan de ejecución de una sentencia SQLAlchemy (SQLite o PostgreSQL)."""
+    from sqlalchemy import text
+
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    return [row[0] for row in conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"))]
+
+
+def write_results(results: Dict, output: Optional[str]) -> None:
+    payload = json.dumps(results, indent=2, default=str)
+    if output:
+        with open(output, "w") as handle:
+            handle.write(payload + "\n")
+    print(payload)
@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+# La configuración se lee al importar app: base SQLite temporal y claves de prueba
+_workdir = tempfile.mkdtemp(prefix="soltech_tests_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_workdir, 'test.db')}")
+os.environ.setdefault("API_KEY", "test-api-key")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="session")
+def client():
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def owner(client):
+    """Usuario dueño de la estación 'abc001' y su token de /auth/login."""
+    user = {"email": "owner@example.com", "username": "owner", "full_name": "Owner", "password": "secret12"}
+    user_id = client.post("/users", json=user).json()["user_id"]
+    client.post("/user-stations", json={"station_id": "abc001", "location": "Test", "user_id": user_id})
+    token = client.post("/auth/login", json={"email": user["email"], "password": user["password"]}).json()["access_token"]
+    return {
+        "user_id": user_id, "email": user["email"], "station_id": "abc001",
+        "headers": {"Authorization": f"Bearer {token}"},
+    }
+
+
+API_KEY_HEADERS = {"Authorization": "test-api-key"}
+
+
+@pytest.fixture(scope="session")
+def make_station(client, owner):
+    """Registra una estación del dueño (ids hexadecimales distintos por módulo para aislar los datos)."""
+    def make(station_id: str) -> str:
+        client.post("/user-stations", json={"station_id": station_id, "location": "Test", "user_id": owner["user_id"]})
+        return station_id
+    return make
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+START = datetime(2025, 1, 10, 12)
+
+
+@pytest.fixture(scope="module")
+def readings(make_station):
+    from app import models
+    from app.database import SessionLocal
+
+    station_id = make_station("a5a001")
+    values = [(0, 10.0, 40.0), (20, 20.0, None), (50, 30.0, 60.0), (70, 5.0, 50.0), (130, 7.0, None)]
+    with SessionLocal() as db:
+        db.execute(insert(models.StationData), [
+            {"station_id": station_id, "timestamp": START + timedelta(minutes=minutes),
+             "temperatura": temperatura, "humedad": humedad}
+            for minutes, temperatura, humedad in values
+        ])
+        db.commit()
+    return station_id
+
+
+def test_hourly_buckets(client, readings):
+    response = client.get("/station-data/aggregate", params={
+        "station_id": readings, "bucket": "1h", "metrics": ["temperatura", "humedad"],
+        "start_time": START.isoformat(), "end_time": (START + timedelta(hours=3)).isoformat(),
+    })
+    assert response.status_code == 200
+    buckets = {bucket["bucket_start"][:16]: bucket for bucket in response.json()["buckets"]}
+    assert sorted(buckets) == ["2025-01-10T12:00", "2025-01-10T13:00", "2025-01-10T14:00"]
+
+    first = buckets["2025-01-10T12:00"]
+    assert first["count"] == 3
+    assert first["metrics"]["temperatura"] == {"min": 10.0, "max": 30.0, "avg": 20.0}
+    # Los NULL no cuentan para la media
+    assert first["metrics"]["humedad"] == {"min": 40.0, "max": 60.0, "avg": 50.0}
+    assert buckets["2025-01-10T14:00"]["metrics"]["humedad"] == {"min": None, "max": None, "avg": None}
+
+
+def test_time_range_limits_the_buckets(client, readings):
+    response = client.get("/station-data/aggregate", params={
+        "station_id": readings, "bucket": "1d", "metrics": ["temperatura"],
+        "start_time": (START + timedelta(minutes=60)).isoformat(),
+    })
+    [bucket] = response.json()["buckets"]
+    assert bucket["count"] == 2
+    assert bucket["metrics"]["temperatura"]["max"] == 7.0
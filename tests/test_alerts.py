@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+
+def test_restart_does_not_repeat_active_alerts(client, owner):
+    from app import models
+    from app.alerts import AlertEngine, insert_alerts, prime_rules, refresh_rules
+    from app.database import SessionLocal
+
+    station_id = owner["station_id"]
+    rule = client.post(f"/user-stations/{station_id}/alert-rules",
+                       json={"metric": "humedad", "operator": ">", "value": 90}, headers=owner["headers"]).json()
+    started = datetime.utcnow()
+    with SessionLocal() as db:
+        db.execute(insert(models.StationData), [
+            {"station_id": station_id, "humedad": humedad, "timestamp": started + timedelta(seconds=i)}
+            for i, humedad in enumerate((50.0, 95.0, 96.0))
+        ])
+        db.commit()
+
+        # Motor recién arrancado: la condición ya estaba activa en la última lectura guardada
+        engine = AlertEngine(refresh_seconds=0)
+        refresh_rules(db, engine)
+        primed = prime_rules(db, engine)
+        last_id = db.scalar(select(func.max(models.StationData.id)))
+        assert primed[station_id] == last_id
+
+        reading = {"id": last_id + 1, "station_id": station_id, "humedad": 97.0,
+                   "timestamp": started + timedelta(seconds=3)}
+        assert [alert for alert in engine.evaluate([reading]) if alert["rule_id"] == rule["rule_id"]] == []
+        reading.update(id=last_id + 2, humedad=50.0, timestamp=started + timedelta(seconds=4))
+        engine.evaluate([reading])
+        reading.update(id=last_id + 3, humedad=98.0, timestamp=started + timedelta(seconds=5))
+        fired = [alert for alert in engine.evaluate([reading]) if alert["rule_id"] == rule["rule_id"]]
+        assert len(fired) == 1
+
+        # La misma alerta evaluada por dos workers se guarda una vez
+        insert_alerts(db, fired)
+        insert_alerts(db, fired)
+        db.commit()
+        stored = db.scalar(select(func.count()).select_from(models.Alert).where(
+            models.Alert.rule_id == rule["rule_id"], models.Alert.reading_id == last_id + 3
+        ))
+        assert stored == 1
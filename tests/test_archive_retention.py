@@ -0,0 +1,158 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select
+
+STATION_ID = "abc002"
+
+
+@pytest.fixture
+def archive_settings(monkeypatch, tmp_path):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "ARCHIVE_ENABLED", True)
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(settings, "ARCHIVE_AFTER_DAYS", 30)
+    return settings
+
+
+def test_cleanup_keeps_readings_not_yet_archived(client, archive_settings):
+    response = client.delete("/station-data/cleanup", params={"days": 7})
+    assert response.status_code == 202
+    job = response.json()
+    expected = datetime.utcnow() - timedelta(days=archive_settings.ARCHIVE_AFTER_DAYS)
+    assert abs(datetime.fromisoformat(job["cutoff"]).replace(tzinfo=None) - expected) < timedelta(minutes=1)
+    assert _wait_for_job(client, job["job_id"]) == "completed"
+
+
+def _wait_for_job(client, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job_status = client.get(f"/station-data/cleanup/{job_id}").json()["status"]
+        if job_status in ("completed", "failed"):
+            return job_status
+        time.sleep(0.05)
+    return job_status
+
+
+def test_retention_purges_expired_archive(client, owner, archive_settings):
+    from app import archive, models, retention
+    from app.database import SessionLocal
+
+    client.post("/user-stations", json={"station_id": STATION_ID, "location": "Test", "user_id": 1})
+    now = datetime.utcnow()
+    ages = [200, 199, 120, 119, 45]
+    with SessionLocal() as db:
+        db.execute(insert(models.StationData), [
+            {"station_id": STATION_ID, "temperatura": float(days), "timestamp": now - timedelta(days=days)}
+            for days in ages
+        ])
+        db.commit()
+    archive.run()
+    assert sum(pq_rows(path) for _, path in archive.archive_files(STATION_ID)) == len(ages)
+
+    with SessionLocal() as db:
+        job = retention.create_job(db, days=150, rollup=True)
+        job_id = job.job_id
+    retention.RetentionRunner(pause_seconds=0)._run(job_id)
+
+    remaining = [
+        row.temperatura for row in archive.read_station_data(STATION_ID, limit=100)
+    ]
+    assert sorted(remaining) == [45.0, 119.0, 120.0]
+    with SessionLocal() as db:
+        assert retention.get_job(db, job_id).status == "completed"
+        hourly = models.StationDataHourly
+        rolled_up = db.scalar(select(func.sum(hourly.readings)).where(hourly.station_id == STATION_ID))
+    assert rolled_up == 2
+
+
+def pq_rows(path):
+    import pyarrow.parquet as pq
+
+    return pq.read_metadata(path).num_rows
+
+
+def test_purge_rewrites_the_cutoff_month(archive_settings):
+    from app import archive
+
+    month = datetime(2025, 3, 1)
+    rows = [
+        (index, "abc003", month + timedelta(days=day), 20.0, None, None, None, None, None, None)
+        for index, day in enumerate((2, 10, 20), start=1)
+    ]
+    archive.write_month("abc003", month, archive.rows_to_table(rows))
+    expired = []
+
+    removed = archive.purge_expired(datetime(2025, 3, 15), on_expired=lambda station_id, table: expired.append(table))
+    assert removed == 2
+    assert sum(table.num_rows for table in expired) == 2
+    assert [row.id for row in archive.read_station_data("abc003", limit=10)] == [3]
+
+
+def test_latest_per_station_falls_back_to_archive(archive_settings):
+    from app import archive, crud
+    from app.database import SessionLocal
+
+    month = datetime(2025, 5, 1)
+    rows = [
+        (index, "abc004", month + timedelta(days=day), float(day), None, None, None, None, None, None)
+        for index, day in enumerate((1, 5, 3), start=1)
+    ]
+    archive.write_month("abc004", month, archive.rows_to_table(rows))
+    archive.write_month("abc004", datetime(2025, 4, 1), archive.rows_to_table([
+        (9, "abc004", datetime(2025, 4, 20), 99.0, None, None, None, None, None, None)
+    ]))
+
+    with SessionLocal() as db:
+        latest = {reading["station_id"]: reading for reading in crud.get_latest_per_station(db)}
+        assert latest["abc004"]["temperatura"] == 5.0
+        assert [reading["id"] for reading in crud.get_latest_per_station(db, ["abc004"])] == [2]
+
+
+def test_archive_purge_heartbeats_per_file_without_rollup(archive_settings, monkeypatch):
+    from app import archive, retention
+    from app.database import SessionLocal
+
+    for month in (datetime(2024, 1, 1), datetime(2024, 2, 1)):
+        archive.write_month("abc005", month, archive.rows_to_table([
+            (1, "abc005", month + timedelta(days=3), 20.0, None, None, None, None, None, None)
+        ]))
+    beats = []
+    heartbeat = retention._heartbeat
+    monkeypatch.setattr(retention, "_heartbeat", lambda db, job: (beats.append(job.job_id), heartbeat(db, job)))
+
+    with SessionLocal() as db:
+        job = retention.create_job(db, days=1, rollup=False)
+        job.cutoff = datetime(2024, 6, 1)
+        db.commit()
+        assert retention.purge_archive(db, job) == 2
+        db.delete(job)
+        db.commit()
+    assert len(beats) == 2
+
+
+def test_archive_page_reads_only_the_newest_row_groups(archive_settings, monkeypatch):
+    import pyarrow.parquet as pq
+    from app import archive
+
+    monkeypatch.setattr(archive_settings, "ARCHIVE_ROW_GROUP_SIZE", 10)
+    month = datetime(2025, 6, 1)
+    archive.write_month("abc006", month, archive.rows_to_table([
+        (index, "abc006", month + timedelta(minutes=index), float(index), None, None, None, None, None, None)
+        for index in range(1, 101)
+    ]))
+    read = []
+    read_row_group = pq.ParquetFile.read_row_group
+    monkeypatch.setattr(pq.ParquetFile, "read_row_group",
+                        lambda self, index, **kwargs: (read.append(index), read_row_group(self, index, **kwargs))[1])
+
+    page = archive.read_station_data("abc006", limit=5)
+    assert [row.id for row in page] == [100, 99, 98, 97, 96]
+    assert read == [9]
+
+    read.clear()
+    after = (page[-1].timestamp, page[-1].id)
+    assert [row.id for row in archive.read_station_data("abc006", after=after, skip=3, limit=10)] == list(range(92, 82, -1))
+    assert read == [9, 8]
@@ -0,0 +1,50 @@
+import pytest
+
+
+@pytest.fixture
+def device_token_headers(client, owner):
+    """JWT de POST /token con el email del dueño como device_id (sin autenticar)."""
+    token = client.post("/token", params={"device_id": owner["email"]}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_login_token_manages_device_keys(client, owner):
+    url = f"/user-stations/{owner['station_id']}/keys"
+    created = client.post(url, json={"label": "esp32"}, headers=owner["headers"])
+    assert created.status_code == 201
+    assert client.get(url, headers=owner["headers"]).status_code == 200
+
+
+@pytest.mark.parametrize("method, path, body", [
+    ("post", "/user-stations/abc001/keys", {"label": "stolen"}),
+    ("get", "/user-stations/abc001/keys", None),
+    ("delete", "/user-stations/abc001/keys/1", None),
+])
+def test_device_token_rejected_on_key_routes(client, device_token_headers, method, path, body):
+    kwargs = {"json": body} if body is not None else {}
+    response = client.request(method, path, headers=device_token_headers, **kwargs)
+    assert response.status_code in (401, 403)
+
+
+@pytest.mark.parametrize("method, path, body", [
+    ("post", "/user-stations/abc001/alert-rules", {"metric": "temperatura", "value": 30}),
+    ("get", "/user-stations/abc001/alert-rules", None),
+    ("delete", "/user-stations/abc001/alert-rules/1", None),
+    ("get", "/user-stations/abc001/alerts", None),
+])
+def test_device_token_rejected_on_alert_routes(client, device_token_headers, method, path, body):
+    kwargs = {"json": body} if body is not None else {}
+    response = client.request(method, path, headers=device_token_headers, **kwargs)
+    assert response.status_code in (401, 403)
+
+
+def test_login_token_manages_alert_rules(client, owner):
+    url = f"/user-stations/{owner['station_id']}/alert-rules"
+    created = client.post(url, json={"metric": "temperatura", "value": 30}, headers=owner["headers"])
+    assert created.status_code == 201
+    assert client.get(f"/user-stations/{owner['station_id']}/alerts", headers=owner["headers"]).status_code == 200
+
+
+def test_auth_me_requires_login_token(client, owner, device_token_headers):
+    assert client.get("/auth/me", headers=owner["headers"]).json()["email"] == owner["email"]
+    assert client.get("/auth/me", headers=device_token_headers).status_code == 401
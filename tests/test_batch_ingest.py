@@ -0,0 +1,29 @@
+from conftest import API_KEY_HEADERS
+
+
+def test_batch_reports_each_item(client, make_station):
+    station_id = make_station("b1a001")
+    batch = [
+        {"station_id": station_id, "temperatura": 20.0},
+        {"station_id": "b1aff0", "temperatura": 21.0},
+        {"station_id": station_id, "humedad": 55.0},
+    ]
+    response = client.post("/station-data/batch", json=batch, headers=API_KEY_HEADERS)
+    assert response.status_code == 201
+    result = response.json()
+    assert (result["accepted"], result["rejected"]) == (2, 1)
+    assert [item["accepted"] for item in result["results"]] == [True, False, True]
+    assert result["results"][1]["detail"] == "Station with ID b1aff0 not found"
+    assert result["results"][1]["id"] is None
+
+    stored = client.get(f"/station-data/{result['results'][2]['id']}").json()
+    assert (stored["station_id"], stored["humedad"]) == (station_id, 55.0)
+
+
+def test_batch_over_the_limit_is_rejected(client, make_station, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "BATCH_MAX_ITEMS", 2)
+    station_id = make_station("b1a002")
+    batch = [{"station_id": station_id, "temperatura": 20.0}] * 3
+    assert client.post("/station-data/batch", json=batch, headers=API_KEY_HEADERS).status_code == 413
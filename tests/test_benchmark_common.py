@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, func, select
+
+
+def test_seed_database(tmp_path):
+    from app import models
+    from app.database import Base
+    from benchmarks.common import seed_database, station_ids
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'bench.db'}")
+    Base.metadata.create_all(engine)
+    # chunk_size menor que readings: varios bloques de inserción
+    seed_database(engine, users=3, stations=5, readings=120, days=2, chunk_size=50)
+
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(models.User)) == 3
+        stations = conn.scalars(select(models.UserStation.station_id)).all()
+        assert sorted(stations) == station_ids(5)
+        assert all(int(station_id, 16) for station_id in stations)
+        assert conn.scalar(select(func.count()).select_from(models.StationData)) == 120
+        oldest, newest = conn.execute(
+            select(func.min(models.StationData.timestamp), func.max(models.StationData.timestamp))
+        ).one()
+    engine.dispose()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    assert now - timedelta(days=2, minutes=1) <= oldest <= newest <= now
+
+
+def test_summarize_percentiles():
+    from benchmarks.common import summarize
+
+    summary = summarize([float(value) for value in range(100, 0, -1)])
+    assert (summary["count"], summary["p50_ms"], summary["p95_ms"], summary["p99_ms"], summary["max_ms"]) == \
+        (100, 50.0, 95.0, 99.0, 100.0)
+    assert summary["mean_ms"] == 50.5
+    assert summarize([])["p99_ms"] == 0.0
@@ -0,0 +1,15 @@
+def test_device_key_ingest_and_revocation(client, owner):
+    url = f"/user-stations/{owner['station_id']}/keys"
+    created = client.post(url, json={"label": "esp32"}, headers=owner["headers"]).json()
+    headers = {"Authorization": created["api_key"]}
+    reading = {"station_id": owner["station_id"], "temperatura": 21.0}
+
+    assert client.post("/station-data", json=reading, headers=headers).status_code == 201
+    # Una clave de dispositivo solo vale para su estación
+    other = client.post("/station-data", json={**reading, "station_id": "fff000"}, headers=headers)
+    assert other.status_code == 403
+
+    revoked = client.delete(f"{url}/{created['key_id']}", headers=owner["headers"])
+    assert revoked.json()["revoked_at"] is not None
+    assert client.post("/station-data", json=reading, headers=headers).status_code == 401
+    assert client.post("/station-data", json=reading, headers={}).status_code == 401
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import insert
+
+START = datetime(2025, 5, 1)
+
+
+def test_lttb_keeps_size_endpoints_and_peaks():
+    from app.downsampling import lttb_indices
+
+    x = np.arange(1000, dtype=np.float64)
+    y = np.sin(x / 50)
+    y[437] = 25.0
+    indices = lttb_indices(x, y, 50)
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+    assert 437 in indices
+
+    # Series más cortas que `points` se devuelven enteras
+    assert list(lttb_indices(x[:10], y[:10], 50)) == list(range(10))
+
+
+def test_series_endpoint(client, make_station):
+    from app import models
+    from app.database import SessionLocal
+
+    station_id = make_station("c0a001")
+    readings = [
+        {"station_id": station_id, "timestamp": START + timedelta(minutes=i),
+         "temperatura": 40.0 if i == 120 else float(i % 7), "humedad": None if i % 3 else 50.0}
+        for i in range(300)
+    ]
+    with SessionLocal() as db:
+        db.execute(insert(models.StationData), readings)
+        db.commit()
+
+    response = client.get("/station-data/series", params={
+        "station_id": station_id, "metrics": ["temperatura", "humedad"], "points": 20,
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["rows"], body["points"]) == (300, 20)
+
+    temperatura = body["series"]["temperatura"]
+    assert len(temperatura["timestamps"]) == len(temperatura["values"]) == 20
+    assert temperatura["timestamps"][0].startswith("2025-05-01T00:00:00")
+    assert temperatura["timestamps"][-1].startswith("2025-05-01T04:59:00")
+    assert 40.0 in temperatura["values"]
+    # Los NULL se descartan antes de reducir
+    assert len(body["series"]["humedad"]["values"]) == 20
+    assert set(body["series"]["humedad"]["values"]) == {50.0}
@@ -0,0 +1,60 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+START = datetime(2025, 3, 1, 6)
+READINGS = 25
+
+
+@pytest.fixture(scope="module")
+def station(make_station):
+    from app import models
+    from app.database import SessionLocal
+
+    station_id = make_station("a8a001")
+    with SessionLocal() as db:
+        db.execute(insert(models.StationData), [
+            {"station_id": station_id, "timestamp": START + timedelta(minutes=i), "temperatura": float(i)}
+            for i in range(READINGS)
+        ])
+        db.commit()
+    return station_id
+
+
+def test_csv_export(client, station):
+    response = client.get("/station-data/export", params={"station_id": station},
+                          headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "content-encoding" not in response.headers
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == READINGS
+    assert {float(row["temperatura"]) for row in rows} == {float(i) for i in range(READINGS)}
+
+
+def test_gzip_ndjson_export(client, station):
+    plain = client.get("/station-data/export", params={"station_id": station, "format": "ndjson"},
+                       headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/station-data/export", params={"station_id": station, "format": "ndjson"},
+                            headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    # httpx descomprime el cuerpo: debe coincidir con el export sin comprimir
+    assert compressed.content == plain.content
+    lines = [json.loads(line) for line in plain.text.splitlines()]
+    assert len(lines) == READINGS
+    assert all(line["station_id"] == station for line in lines)
+
+
+def test_export_is_generated_in_batches(client, station):
+    from app import export
+
+    chunks = list(export.export_station_data("ndjson", station_id=station, batch_size=10))
+    # Un bloque por lote de filas en vez de todo el resultado de una vez
+    assert len(chunks) == 3
+    compressed = b"".join(export.export_station_data("ndjson", station_id=station, batch_size=10, compress=True))
+    assert gzip.decompress(compressed) == b"".join(chunks)
@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+from sqlalchemy import exc
+
+
+def _buffer(write):
+    from app.ingest import IngestBuffer
+
+    buffer = IngestBuffer(flush_retries=2, retry_backoff=0.01)
+    buffer._write = write
+    return buffer
+
+
+def test_flush_retries_connection_errors():
+    attempts = []
+
+    def write(batch):
+        attempts.append(len(batch))
+        if len(attempts) < 3:
+            raise exc.OperationalError("INSERT", {}, Exception("connection refused"))
+        return SimpleNamespace(accepted=len(batch), rejected=0)
+
+    buffer = _buffer(write)
+    asyncio.run(buffer._flush([{"station_id": "abc001"}] * 4))
+    assert attempts == [4, 4, 4]
+    assert (buffer.flushed_rows, buffer.failed_rows, buffer.retries) == (4, 0, 2)
+
+
+def test_flush_isolates_failing_row():
+    def write(batch):
+        if any(row.get("bad") for row in batch):
+            raise exc.IntegrityError("INSERT", {}, Exception("constraint"))
+        return SimpleNamespace(accepted=len(batch), rejected=0)
+
+    buffer = _buffer(write)
+    batch = [{"station_id": "abc001"} for _ in range(8)]
+    batch[5]["bad"] = True
+    asyncio.run(buffer._flush(batch))
+    assert (buffer.flushed_rows, buffer.failed_rows, buffer.retries) == (7, 1, 0)
+    assert buffer.splits == 3
+
+
+def test_write_behind_rejects_unknown_station(client, owner, monkeypatch):
+    from app.config import settings
+    from app.ingest import ingest_buffer
+
+    monkeypatch.setattr(settings, "INGEST_WRITE_BEHIND", True)
+    # El lifespan solo arranca el buffer con INGEST_WRITE_BEHIND: arrancarlo en el loop del cliente
+    client.portal.call(ingest_buffer.start)
+    try:
+        headers = {"Authorization": "test-api-key"}
+        response = client.post("/station-data", json={"station_id": "fff999", "temperatura": 20.0}, headers=headers)
+        assert response.status_code == 404
+        response = client.post("/station-data", json={"station_id": owner["station_id"], "temperatura": 20.0},
+                               headers=headers)
+        assert response.status_code == 202
+    finally:
+        client.portal.call(ingest_buffer.stop)
+    assert ingest_buffer.flushed_rows == 1
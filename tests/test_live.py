@@ -0,0 +1,57 @@
+import asyncio
+
+
+def test_live_stats(client):
+    response = client.get("/live/stats")
+    assert response.status_code == 200
+    assert response.json()["broker"] == "InMemoryBroker"
+
+
+def test_postgres_outbox_is_bounded():
+    from app.live import PostgresBroker
+
+    async def fill():
+        broker = PostgresBroker("postgresql://unused", outbox_size=2)
+        # Sin conectar: solo la cola de salida, como la deja start()
+        broker._outbox = asyncio.Queue(maxsize=broker.outbox_size)
+        for _ in range(4):
+            broker._deliver([("abc001", "{}"), ("abc001", "{}")])
+        return broker.stats()
+
+    stats = asyncio.run(fill())
+    assert stats["outbox_queued"] == 2
+    assert stats["outbox_dropped"] == 4
+
+
+def test_alert_leader_campaigns_again_after_broker_disconnect(monkeypatch):
+    from app.alerts import AlertEngine, AlertLeader
+
+    class FakeBroker:
+        def __init__(self):
+            self.locks = 0
+            self.on_disconnect = None
+
+        def add_reader(self, callback):
+            pass
+
+        def add_disconnect_listener(self, callback):
+            self.on_disconnect = callback
+
+        async def try_advisory_lock(self, key):
+            self.locks += 1
+            return True
+
+    async def run():
+        broker = FakeBroker()
+        leader = AlertLeader(AlertEngine(refresh_seconds=0), worker=None, enabled=True, poll_seconds=0.01)
+        monkeypatch.setattr(leader, "_prime", lambda: {})
+        await leader.start(broker)
+        await asyncio.sleep(0.05)
+        assert leader.leader and broker.locks == 1
+        broker.on_disconnect()
+        assert not leader.leader
+        await asyncio.sleep(0.05)
+        assert leader.leader and broker.locks == 2
+        await leader.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,38 @@
+from sqlalchemy import create_engine, inspect, text
+
+HEAD_INDEXES = {"ix_station_data_station_id_timestamp", "ix_station_data_timestamp"}
+
+
+def _index_names(connection, table="station_data"):
+    return {index["name"] for index in inspect(connection).get_indexes(table)}
+
+
+def test_startup_migrates_to_head_with_station_data_indexes(client):
+    from alembic.script import ScriptDirectory
+    from app.database import engine
+    from app.migrations import alembic_config
+
+    head = ScriptDirectory.from_config(alembic_config()).get_current_head()
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT version_num FROM alembic_version")).scalar() == head
+        assert HEAD_INDEXES <= _index_names(conn)
+
+
+def test_indexes_follow_upgrade_and_downgrade(tmp_path):
+    from alembic import command
+    from app.migrations import alembic_config, run_migrations
+
+    scratch = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    with scratch.connect() as conn:
+        run_migrations(conn)
+        assert HEAD_INDEXES <= _index_names(conn)
+        # Como run_migrations: Alembic abre su propia transacción (0002 usa autocommit_block)
+        conn.commit()
+
+        command.downgrade(alembic_config(conn), "0001")
+        assert not HEAD_INDEXES & _index_names(conn)
+        conn.commit()
+
+        command.upgrade(alembic_config(conn), "head")
+        assert HEAD_INDEXES <= _index_names(conn)
+    scratch.dispose()
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+SAME_TIME = datetime(2025, 2, 1, 8)
+
+
+def _page_through(client, params):
+    ids, cursor = [], None
+    while True:
+        response = client.get("/station-data", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        ids += [row["id"] for row in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids
+
+
+def test_cursor_pages_across_equal_timestamps(client, make_station):
+    from app import models
+    from app.database import SessionLocal
+
+    station_id = make_station("a6a001")
+    timestamps = [SAME_TIME - timedelta(minutes=1)] + [SAME_TIME] * 5 + [SAME_TIME + timedelta(minutes=1)]
+    with SessionLocal() as db:
+        db.execute(insert(models.StationData), [
+            {"station_id": station_id, "timestamp": timestamp, "temperatura": 20.0}
+            for timestamp in timestamps
+        ])
+        db.commit()
+
+    everything = client.get("/station-data", params={"station_id": station_id}).json()
+    paged = _page_through(client, {"station_id": station_id, "limit": 2})
+
+    # Ni duplicados ni huecos aunque varias filas compartan timestamp
+    assert paged == [row["id"] for row in everything]
+    assert len(paged) == len(timestamps)
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get("/station-data", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+
+def test_monthly_and_weekly_periods():
+    from app.partitions import next_period, partition_name, period_start
+
+    moment = datetime(2024, 12, 18, 15, 30)
+    assert period_start(moment, "monthly") == datetime(2024, 12, 1)
+    assert next_period(datetime(2024, 12, 1), "monthly") == datetime(2025, 1, 1)
+    assert partition_name(datetime(2024, 12, 1), "monthly") == "station_data_y2024m12"
+
+    monday = period_start(moment, "weekly")
+    assert monday == datetime(2024, 12, 16) and monday.weekday() == 0
+    assert next_period(monday, "weekly") == datetime(2024, 12, 23)
+    # Semana ISO: el lunes 30/12/2024 pertenece a la semana 1 de 2025
+    assert partition_name(datetime(2024, 12, 30), "weekly") == "station_data_y2025w01"
+
+
+def test_ranges_are_contiguous_and_cover_the_lookahead():
+    from app.partitions import _ranges
+
+    ranges = list(_ranges(datetime(2025, 1, 1), datetime(2025, 2, 10), "monthly", ahead=2))
+    assert ranges[0][0] == datetime(2025, 1, 1)
+    assert all(upper == next_lower for (_, upper), (next_lower, _) in zip(ranges, ranges[1:]))
+    # Febrero (actual) + 2 meses por delante
+    assert ranges[-1][1] == datetime(2025, 5, 1)
+    assert list(_ranges(datetime(2025, 5, 1), datetime(2025, 2, 10), "monthly", ahead=2)) == []
+
+
+def test_sqlite_uses_the_single_table_fallback(client, monkeypatch):
+    from app import partitions
+    from app.config import settings
+    from app.database import engine
+
+    monkeypatch.setattr(settings, "STATION_DATA_PARTITIONING", "monthly")
+    with engine.connect() as conn:
+        assert not partitions.is_partitioned(conn)
+        assert partitions.drop_expired_partitions(conn, datetime(2100, 1, 1)) == []
+    assert partitions.maintain(engine) == []
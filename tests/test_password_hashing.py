@@ -0,0 +1,37 @@
+def _stored_hash(email):
+    from app import crud
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        return crud.get_user_by_email(db, email=email).password
+
+
+def test_login_rehashes_when_the_cost_changes(client, monkeypatch):
+    from app.config import settings
+
+    user = {"email": "rehash@example.com", "username": "rehash", "full_name": "Rehash", "password": "secret12"}
+    assert client.post("/users", json=user).status_code == 201
+    credentials = {"email": user["email"], "password": user["password"]}
+    assert _stored_hash(user["email"]).startswith("$2b$04$")
+
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+    assert client.post("/auth/login", json=credentials).status_code == 200
+    upgraded = _stored_hash(user["email"])
+    assert upgraded.startswith("$2b$05$")
+
+    # Con el coste ya al día el hash no se vuelve a escribir
+    assert client.post("/auth/login", json=credentials).status_code == 200
+    assert _stored_hash(user["email"]) == upgraded
+
+
+def test_wrong_password_keeps_the_hash(client, monkeypatch):
+    from app.config import settings
+
+    user = {"email": "wrongpass@example.com", "username": "wrongpass", "full_name": "Wrong", "password": "secret12"}
+    client.post("/users", json=user)
+    original = _stored_hash(user["email"])
+
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+    response = client.post("/auth/login", json={"email": user["email"], "password": "not-the-password"})
+    assert response.status_code == 401
+    assert _stored_hash(user["email"]) == original
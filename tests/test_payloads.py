@@ -0,0 +1,11 @@
+import pytest
+from fastapi import HTTPException
+
+
+def test_binary_station_id_must_be_fully_hexadecimal():
+    from app.payloads import decode_readings, encode_readings
+
+    reading = {"temperatura": 21.5}
+    assert decode_readings(encode_readings("abc001", [reading]))[0]["station_id"] == "abc001"
+    with pytest.raises(HTTPException):
+        decode_readings(encode_readings("abc001\n", [reading]))
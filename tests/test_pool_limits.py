@@ -0,0 +1,34 @@
+import pytest
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    from app.config import settings
+    from app.database import pool_limits
+
+    def configure(**values):
+        defaults = {"DB_POOL_SIZE": 10, "DB_MAX_OVERFLOW": 20, "DB_MAX_CONNECTIONS": 0,
+                    "WEB_CONCURRENCY": 1, "LIVE_BROKER": "memory", "DB_MODE": "sync"}
+        for name, value in {**defaults, **values}.items():
+            monkeypatch.setattr(settings, name, value)
+        return pool_limits()
+
+    return configure
+
+
+def test_without_a_budget_the_pool_settings_are_used(limits):
+    assert limits() == {"pool_size": 10, "max_overflow": 20}
+
+
+def test_budget_is_split_between_workers_and_engines(limits):
+    # 40 conexiones / 4 workers = 10 por worker
+    assert limits(DB_MAX_CONNECTIONS=40, WEB_CONCURRENCY=4) == {"pool_size": 10, "max_overflow": 0}
+    assert limits(DB_MAX_CONNECTIONS=100, WEB_CONCURRENCY=4) == {"pool_size": 10, "max_overflow": 15}
+    # Engine sync y async; el broker postgres reserva su conexión LISTEN
+    assert limits(DB_MAX_CONNECTIONS=40, WEB_CONCURRENCY=4, DB_MODE="async") == {"pool_size": 5, "max_overflow": 0}
+    assert limits(DB_MAX_CONNECTIONS=40, WEB_CONCURRENCY=4, DB_MODE="async", LIVE_BROKER="postgres") == \
+        {"pool_size": 4, "max_overflow": 0}
+
+
+def test_budget_too_low_keeps_one_connection_per_engine(limits):
+    assert limits(DB_MAX_CONNECTIONS=4, WEB_CONCURRENCY=8) == {"pool_size": 1, "max_overflow": 0}
@@ -0,0 +1,73 @@
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+
+def _router(tmp_path, *names):
+    from app.replicas import ReadRouter
+
+    # Una réplica en un directorio inexistente no puede abrir conexión
+    urls = [f"sqlite:///{tmp_path / name}" for name in names]
+    return ReadRouter(urls, retry_seconds=60)
+
+
+def _replica_of(router, db):
+    return next((replica for replica in router.replicas if db.get_bind() is replica.engine), None)
+
+
+def test_failed_replica_is_skipped_and_primary_is_the_last_resort(tmp_path):
+    from app.database import engine
+
+    router = _router(tmp_path, "replica.db", "missing/replica.db")
+    healthy, broken = router.replicas
+    for _ in range(4):
+        db = router.session()
+        assert _replica_of(router, db) is healthy
+        db.close()
+    assert not broken.healthy and broken.failures == 1
+    assert healthy.sessions == 4 and router.fallbacks == 0
+
+    router.mark_failed(healthy, "down for maintenance")
+    db = router.session()
+    assert db.get_bind() is engine
+    db.close()
+    assert (router.fallbacks, router.primary_reads) == (1, 1)
+
+
+def test_prefer_primary_skips_the_replicas(tmp_path):
+    router = _router(tmp_path, "replica.db")
+    db = router.session(prefer_primary=True)
+    assert _replica_of(router, db) is None
+    db.close()
+    assert router.replicas[0].sessions == 0 and router.fallbacks == 0
+
+
+def test_read_your_writes_cookie(monkeypatch):
+    from app.config import settings
+    from app.replicas import READ_YOUR_WRITES_COOKIE, ReadYourWritesMiddleware, wrote_recently
+
+    monkeypatch.setattr(settings, "READ_YOUR_WRITES_SECONDS", 5.0)
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware, window_seconds=5.0)
+
+    @app.post("/write")
+    def write(fail: bool = False):
+        if fail:
+            raise HTTPException(status_code=422)
+        return {}
+
+    @app.get("/read")
+    def read(request: Request):
+        return {"primary": wrote_recently(request)}
+
+    client = TestClient(app)
+    assert client.get("/read").json() == {"primary": False}
+    client.post("/write", params={"fail": True})
+    assert READ_YOUR_WRITES_COOKIE not in client.cookies
+
+    client.post("/write")
+    assert client.get("/read").json() == {"primary": True}
+    # Fuera de la ventana el cliente vuelve a las réplicas
+    client.cookies.set(READ_YOUR_WRITES_COOKIE, f"{time.time() - 10:.3f}")
+    assert client.get("/read").json() == {"primary": False}
@@ -0,0 +1,41 @@
+import pytest
+
+from conftest import API_KEY_HEADERS
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    from app.response_cache import response_cache
+
+    # Sin caducidad por tiempo: el ETag solo cambia con las escrituras
+    monkeypatch.setattr(response_cache, "ttl", 0)
+    return response_cache
+
+
+def test_conditional_get_and_invalidation(client, make_station, cache):
+    station_id = make_station("b6a001")
+    other_id = make_station("b6a002")
+    params = {"station_id": station_id}
+
+    first = client.get("/station-data", params=params)
+    etag = first.headers["ETag"]
+    assert first.json() == []
+
+    hits = cache.stats()["hits"]
+    repeated = client.get("/station-data", params=params)
+    assert repeated.headers["ETag"] == etag and repeated.content == first.content
+    assert cache.stats()["hits"] == hits + 1
+
+    not_modified = client.get("/station-data", params=params, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    # Una lectura de otra estación no invalida esta
+    client.post("/station-data", json={"station_id": other_id, "temperatura": 18.0}, headers=API_KEY_HEADERS)
+    assert client.get("/station-data", params=params, headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/station-data", json={"station_id": station_id, "temperatura": 19.5}, headers=API_KEY_HEADERS)
+    changed = client.get("/station-data", params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert [row["temperatura"] for row in changed.json()] == [19.5]
@@ -0,0 +1,45 @@
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_stopped_job_is_released_and_resumed(client, owner):
+    from app import models, retention
+    from app.database import SessionLocal
+
+    old = datetime.utcnow() - timedelta(days=30)
+    with SessionLocal() as db:
+        db.execute(insert(models.StationData), [
+            {"station_id": owner["station_id"], "temperatura": 20.0, "timestamp": old + timedelta(minutes=i)}
+            for i in range(20)
+        ])
+        db.commit()
+        job = retention.create_job(db, days=7, rollup=False, batch_size=1)
+        job_id = job.job_id
+
+    def job_status():
+        with SessionLocal() as db:
+            return retention.get_job(db, job_id).status
+
+    runner = retention.RetentionRunner(pause_seconds=0.1, stale_seconds=60)
+    assert runner.start(job_id)
+    assert _wait_for(lambda: job_status() == "running")
+    runner.stop()
+    # Apagado a mitad: el trabajo queda libre y no bloquea nuevas limpiezas para siempre
+    assert job_status() == "pending"
+
+    other_worker = retention.RetentionRunner(pause_seconds=0, stale_seconds=60)
+    assert other_worker.resume_interrupted() == job_id
+    assert _wait_for(lambda: job_status() == "completed")
+    with SessionLocal() as db:
+        assert retention.get_active_job(db) is None
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+START = datetime(2025, 4, 1, 9, 30, 15, 250000)
+
+
+@pytest.fixture(scope="module")
+def station(make_station):
+    from app import models
+    from app.database import SessionLocal
+
+    station_id = make_station("b7a001")
+    with SessionLocal() as db:
+        db.execute(insert(models.StationData), [
+            {"station_id": station_id, "timestamp": START + timedelta(minutes=i),
+             "temperatura": 20.0 + i, "humedad": None if i % 2 else 55.0}
+            for i in range(4)
+        ])
+        db.commit()
+    return station_id
+
+
+@pytest.mark.parametrize("path", ["/station-data", "/station-data/latest"])
+def test_rows_layout_matches_the_model_layout(client, station, path):
+    params = {"station_id": station}
+    model = client.get(path, params=params).json()
+    rows = client.get(path, params={**params, "layout": "rows"})
+    assert rows.headers["content-type"].startswith("application/json")
+    assert rows.json() == model
+
+
+def test_columns_layout_transposes_the_rows(client, station, make_station):
+    model = client.get("/station-data", params={"station_id": station}).json()
+    columns = client.get("/station-data", params={"station_id": station, "layout": "columns"}).json()
+    assert set(columns) == set(model[0])
+    for field, values in columns.items():
+        assert values == [row[field] for row in model]
+
+    empty = client.get("/station-data", params={"station_id": make_station("b7a002"), "layout": "columns"}).json()
+    assert set(empty) == set(model[0]) and not any(empty.values())
@@ -0,0 +1,24 @@
+from datetime import datetime, timedelta
+
+
+def _reading(station_id, timestamp, reading_id):
+    return {"id": reading_id, "station_id": station_id, "timestamp": timestamp, "temperatura": 20.0}
+
+
+def test_refresh_keeps_stations_missing_from_the_query():
+    from app.snapshot import LatestReadingSnapshot
+
+    now = datetime(2026, 1, 1, 12)
+    snapshot = LatestReadingSnapshot(refresh_seconds=60)
+    assert snapshot.is_cold()
+    snapshot.load([_reading("aa01", now, 1), _reading("bb02", now, 2)])
+    # Lectura más nueva llegada por la ingesta mientras se consultaba la DB
+    snapshot.update([_reading("aa01", now + timedelta(minutes=5), 3)])
+    snapshot.load([_reading("aa01", now, 1)])
+
+    latest = {reading["station_id"]: reading["id"] for reading in snapshot.get()}
+    assert latest == {"aa01": 3, "bb02": 2}
+    assert not snapshot.is_cold()
+
+    snapshot.discard_older_than(now + timedelta(minutes=1))
+    assert [reading["station_id"] for reading in snapshot.get()] == ["aa01"]
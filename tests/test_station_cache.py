@@ -0,0 +1,27 @@
+from conftest import API_KEY_HEADERS
+
+
+def test_cache_evicts_least_recently_used_and_expires_negatives(monkeypatch):
+    from app import cache
+
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    registry = cache.StationRegistryCache(maxsize=2, ttl=300, negative_ttl=5)
+    registry.set("aa", True)
+    registry.set("bb", False)
+    assert registry.get("aa") is True  # "bb" pasa a ser el menos usado
+    registry.set("cc", True)
+    assert registry.get("bb") is None and registry.evictions == 1
+
+    registry.set("dd", False)
+    now[0] += 6
+    assert registry.get("dd") is None
+    assert registry.get("cc") is True
+
+
+def test_new_station_replaces_a_cached_miss(client, make_station):
+    reading = {"station_id": "c2a001", "temperatura": 20.0}
+    assert client.post("/station-data", json=reading, headers=API_KEY_HEADERS).status_code == 404
+    make_station("c2a001")
+    # La ingesta no espera al TTL negativo: crear la estación actualiza el cache
+    assert client.post("/station-data", json=reading, headers=API_KEY_HEADERS).status_code == 201